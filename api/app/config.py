@@ -13,20 +13,64 @@ class Settings(BaseSettings):
     jwt_private_key_path: str = Field(default="/run/secrets/jwt_private.pem")
     jwt_public_key_path: str = Field(default="/run/secrets/jwt_public.pem")
     access_token_expires_min: int = Field(default=60)
+    jwt_jwks: str = Field(default="")  # JWKS file path or URL with extra / rotated verification keys (by kid)
+    jwt_keys_retry_seconds: float = Field(default=30.0)  # min gap between key reloads (missing files, unknown kid)
+    jwt_cache_size: int = Field(default=10000)  # verified tokens remembered until exp; 0 disables
+    admin_clients: str = Field(default="")  # client ids that may request the "admin" scope (profiling endpoints)
 
     db_url: str = Field(default="sqlite:///./data/app.db")
+    db_pool_size: int = Field(default=10)
+    db_max_overflow: int = Field(default=10)
+    db_pool_timeout: float = Field(default=10.0)
+    db_pool_recycle: int = Field(default=1800)  # seconds; below typical server/proxy idle timeouts
+    db_pool_pre_ping: bool = Field(default=True)
+    migrate_on_startup: bool = Field(default=True)
+    db_async_url: str | None = Field(default=None)  # request-path async engine; derived from db_url when unset
     redis_url: str = Field(default="redis://localhost:6379/0")
+    redis_timeout: float = Field(default=0.1)  # seconds; a slow cache is worse than a miss
+    query_cache_size: int = Field(default=10000)  # in-process entries per worker; 0 disables the cache
+    query_cache_ttl: float = Field(default=300.0)
+    query_cache_redis: bool = Field(default=True)  # shared tier; off = in-process LRU only
 
     es_url: str = Field(default="http://localhost:9200")
-    es_index_icd: str = Field(default="icd_tm")
+    es_max_connections: int = Field(default=64)  # per ES node; the client default (10) caps in-flight searches
+    es_index_icd: str = Field(default="icd_tm")  # alias over versioned icd_tm-<ts> indices (scripts/es_index.py)
+    search_backend: str = Field(default="es")  # es | memory (in-process index only)
+    index_refresh_seconds: float = Field(default=5.0)  # how often workers check for a new ingest
+    snapshot_dir: str = Field(default="data/snapshots")  # mmapped index snapshots shared by workers and ingest; "" = per-worker build
+    snapshot_keep: int = Field(default=3)  # versions kept per snapshot name
+    autocode_batch_max: int = Field(default=1000)
+    validate_batch_max: int = Field(default=10000)
+    translate_batch_max: int = Field(default=1000)
+    export_batch_size: int = Field(default=200)  # streamed autocode export: queries per suggest_many round
+    import_code_batch: int = Field(default=5000)  # FHIR import: ICD Coding usages validated per batch
+    import_max_errors: int = Field(default=1000)  # errors listed in an import report (all are counted)
+    codeset_bloom_fp_rate: float = Field(default=0.01)  # 0 disables the bloom pre-check
+    profile_dir: str = Field(default="data/profiles")  # /admin/profile and /admin/tracemalloc output
+    profile_max_seconds: float = Field(default=600.0)  # longest sampling / request-profiling window
+
+    log_level: str = Field(default="INFO")
+    log_queue_size: int = Field(default=10000)  # records waiting for the writer thread; beyond that they are dropped
+    log_access: bool = Field(default=True)
+    log_slow_ms: float = Field(default=1000.0)  # slower requests (and 5xx) are always access-logged
+    # "[METHOD ]path=rate" per route (paths without API_PREFIX): share of requests access-logged; others 1.0
+    log_access_sample: str = Field(default="/coding/autocode=0.01,/coding/validate=0.01,/coding/autocode/batch=0.1,"
+                                           "/coding/validate/batch=0.1")
 
     icd_api_base: str = Field(default="https://id.who.int/icd/release/11")
     icd_api_token: str | None = None
     icd_release_id: str = Field(default="2025-01")
+    icd_checkpoint_file: str = Field(default="data/ingest_checkpoint.json")  # shared with the ingest worker, for /metrics
     icd_linearization: str = Field(default="mms")  # ✅ ADD THIS LINE
 
 
-    rate_limit_rps: int = Field(default=20)
+    rate_limit_rps: int = Field(default=20)  # sustained units/s per client (JWT sub, else IP); 0 disables
+    rate_limit_burst: int = Field(default=40)
+    rate_limit_redis: bool = Field(default=True)  # shared limits; off = per-worker buckets only
+    # "[METHOD ]path=units" per route (paths without API_PREFIX); everything else costs 1
+    rate_limit_costs: str = Field(default="/coding/autocode/batch=10,/coding/validate/batch=10,"
+                                          "POST /terminology/conceptmaps/namaste-to-icd11/$translate=10,"
+                                          "/fhir/import/bundle=5,/fhir/import/ndjson=10,/fhir/export/stream=10,/coding/autocode/export=20")
 
     class Config:
         env_file = ".env"
@@ -1,28 +1,141 @@
 # dependency injection
-from elasticsearch import Elasticsearch
+from elasticsearch import AsyncElasticsearch, Elasticsearch
+from redis.asyncio import Redis
 from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from app.config import settings
-from app.services.search import SearchService
-from app.services.icd_repo import ICDRepo
+from app.services.search import AsyncSearchService, SearchService
+from app.services.icd_repo import AsyncICDRepo, ICDRepo
+from app.services.corpus import Corpus
+from app.services.valueset_index import ValueSetRegistry
+from app.services.namaste_repo import NamasteRepo
+from app.services.query_cache import LRUTTLCache, QueryCache
+from app.services.profiling import Profiling
+from app.services.rate_limit import RateLimiter
 from functools import lru_cache
 
+# process-wide singletons, built on first use or during warm-up
+
 @lru_cache(maxsize=1)
 def get_engine() -> Engine:
-    return create_engine(settings.db_url, future=True)
+    return create_engine(
+        settings.db_url,
+        future=True,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+
+ASYNC_DRIVERS = [("postgresql+psycopg2://", "postgresql+asyncpg://"), ("postgresql://", "postgresql+asyncpg://"),
+                 ("sqlite:///", "sqlite+aiosqlite:///")]
+
+def async_db_url(url: str) -> str:
+    for sync, aio in ASYNC_DRIVERS:
+        if url.startswith(sync):
+            return aio + url[len(sync):]
+    return url
+
+@lru_cache(maxsize=1)
+def get_async_engine() -> AsyncEngine:
+    url = settings.db_async_url or async_db_url(settings.db_url)
+    # aiosqlite uses NullPool (a connection per checkout), which takes no sizing arguments
+    sizing = {} if url.startswith("sqlite") else dict(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+    )
+    return create_async_engine(
+        url,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        **sizing,
+    )
 
 @lru_cache(maxsize=1)
 def get_es() -> Elasticsearch | None:
     try:
-        es = Elasticsearch(settings.es_url)
+        es = Elasticsearch(settings.es_url, connections_per_node=settings.es_max_connections)
         if not es.ping():
             return None
         return es
     except Exception:
         return None
 
-def get_search() -> SearchService:
-    return SearchService(get_es(), settings.es_index_icd, get_engine())
+@lru_cache(maxsize=1)
+def get_async_es() -> AsyncElasticsearch | None:
+    # reachability is decided once, by the sync ping in get_es() during warm-up
+    if settings.search_backend != "es" or get_es() is None:
+        return None
+    return AsyncElasticsearch(settings.es_url, connections_per_node=settings.es_max_connections)  # aiohttp node
 
+@lru_cache(maxsize=1)
 def get_icd_repo() -> ICDRepo:
     return ICDRepo(get_engine())
+
+@lru_cache(maxsize=1)
+def get_async_icd_repo() -> AsyncICDRepo:
+    return AsyncICDRepo(get_async_engine())
+
+@lru_cache(maxsize=1)
+def get_corpus() -> Corpus:
+    return Corpus(get_icd_repo(), settings.index_refresh_seconds, settings.codeset_bloom_fp_rate or None,
+                  settings.snapshot_dir, settings.snapshot_keep)
+
+@lru_cache(maxsize=1)
+def get_namaste_repo() -> NamasteRepo:
+    return NamasteRepo(get_engine(), settings.index_refresh_seconds, settings.snapshot_dir, settings.snapshot_keep)
+
+@lru_cache(maxsize=1)
+def get_valuesets() -> ValueSetRegistry:
+    return ValueSetRegistry()
+
+@lru_cache(maxsize=1)
+def get_search() -> SearchService:
+    es = get_es() if settings.search_backend == "es" else None
+    return SearchService(es, settings.es_index_icd, get_engine(), get_corpus(), get_valuesets())
+
+@lru_cache(maxsize=1)
+def get_redis() -> Redis | None:
+    if not settings.redis_url:
+        return None
+    return Redis.from_url(settings.redis_url, socket_timeout=settings.redis_timeout,
+                          socket_connect_timeout=settings.redis_timeout)
+
+@lru_cache(maxsize=1)
+def get_query_cache() -> QueryCache | None:
+    if settings.query_cache_size <= 0:
+        return None
+    redis = get_redis() if settings.query_cache_redis else None
+    return QueryCache(LRUTTLCache(settings.query_cache_size, settings.query_cache_ttl), redis, settings.query_cache_ttl)
+
+@lru_cache(maxsize=1)
+def get_rate_limiter() -> RateLimiter | None:
+    if settings.rate_limit_rps <= 0:
+        return None
+    redis = get_redis() if settings.rate_limit_redis else None
+    return RateLimiter(settings.rate_limit_rps, max(settings.rate_limit_burst, 1), redis)
+
+@lru_cache(maxsize=1)
+def get_profiling() -> Profiling:
+    return Profiling(settings.profile_dir)
+
+@lru_cache(maxsize=1)
+def get_async_search() -> AsyncSearchService:
+    return AsyncSearchService(get_async_es(), settings.es_index_icd, get_async_icd_repo(), get_corpus(), get_valuesets(),
+                              get_query_cache())
+
+# async dependencies: a plain `def` one would cost a threadpool hop per request
+async def use_async_search() -> AsyncSearchService:
+    return get_async_search()
+
+async def use_async_icd_repo() -> AsyncICDRepo:
+    return get_async_icd_repo()
+
+async def use_corpus() -> Corpus:
+    return get_corpus()
+
+async def use_query_cache() -> QueryCache | None:
+    return get_query_cache()
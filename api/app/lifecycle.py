@@ -0,0 +1,51 @@
+# application startup/shutdown
+import logging, threading, time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from app.config import settings
+from app.deps import get_engine, get_async_engine, get_async_es, get_async_search, get_corpus, get_search, get_namaste_repo
+from app.migrations import migrate
+
+log = logging.getLogger(__name__)
+
+def warm_pool(n: int) -> None:
+    # open the steady-state connections now instead of on the first n requests
+    conns = [get_engine().connect() for _ in range(n)]
+    for cx in conns:
+        cx.exec_driver_sql("SELECT 1")
+    for cx in conns:
+        cx.close()
+
+def warm_up(app: FastAPI, retry_delay: float = 2.0) -> None:
+    t0 = time.perf_counter()
+    while True:
+        try:
+            if settings.migrate_on_startup:
+                migrate(get_engine())
+            warm_pool(settings.db_pool_size)
+            get_corpus().refresh(force=True)
+            get_namaste_repo().refresh(force=True)
+            break
+        except Exception:
+            log.exception("warm-up failed; retrying in %.0fs", retry_delay)
+            time.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, 30.0)
+    get_search()  # resolves the ES client once
+    get_async_search()
+    get_corpus().start_watcher()
+    get_namaste_repo().start_watcher()
+    app.state.ready = True
+    log.info("ready in %.0f ms", (time.perf_counter() - t0) * 1000)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.ready = False
+    # warm-up runs in the background; the readiness gate answers 503 until it is done
+    threading.Thread(target=warm_up, args=(app,), name="warm-up", daemon=True).start()
+    yield
+    get_corpus().stop_watcher()
+    get_namaste_repo().stop_watcher()
+    get_engine().dispose()
+    await get_async_engine().dispose()
+    if get_async_es.cache_info().currsize and get_async_es() is not None:
+        await get_async_es().close()
@@ -1,22 +1,80 @@
-# structured logging setup
-import logging, sys, json, time
+# structured logging setup: JSON lines written off the request path by a queue listener thread
+import atexit, logging, queue, sys
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+import orjson
+from app.config import settings
+
+request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+# LogRecord attributes; anything else on a record came in through `extra=` and is logged as a field
+RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id",
+                                                                       "color_message"}  # uvicorn's ANSI copy of msg
 
 class JsonFormatter(logging.Formatter):
     def format(self, record):
         payload = {
-            "ts": round(time.time(),3),
+            "ts": round(record.created, 3),
             "level": record.levelname,
             "logger": record.name,
             "msg": record.getMessage(),
         }
+        if getattr(record, "request_id", None):
+            payload["request_id"] = record.request_id
+        for k, v in record.__dict__.items():
+            if k not in RESERVED:
+                payload[k] = v
         if record.exc_info:
             payload["exc_info"] = self.formatException(record.exc_info)
-        return json.dumps(payload)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return orjson.dumps(payload, default=str).decode()
+
+class ContextHandler(QueueHandler):
+    """Enqueues without formatting: only the message args and a traceback are resolved here,
+    since they may reference objects that change after the call."""
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record.request_id = request_id.get()
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_handler: ContextHandler | None = None
+_listener: QueueListener | None = None
+
+def dropped() -> int:
+    """Records lost to a full queue since start (exported by app/metrics.py)."""
+    return _handler.dropped if _handler is not None else 0
 
 def configure_logging():
-    handler = logging.StreamHandler(sys.stdout)
-    handler.setFormatter(JsonFormatter())
+    global _handler, _listener
+    if _listener is not None:
+        _listener.stop()
+    out = logging.StreamHandler(sys.stdout)
+    out.setFormatter(JsonFormatter())
+    q: queue.Queue = queue.Queue(maxsize=settings.log_queue_size)
+    _handler = ContextHandler(q)
+    _listener = QueueListener(q, out)
+    _listener.start()
+    atexit.register(_listener.stop)  # flushes what is still queued
     root = logging.getLogger()
     root.handlers.clear()
-    root.addHandler(handler)
-    root.setLevel(logging.INFO)
+    root.addHandler(_handler)
+    root.setLevel(settings.log_level.upper())
+    # route uvicorn through the queue too; its access log is replaced by main.py's
+    for name in ("uvicorn", "uvicorn.error"):
+        logging.getLogger(name).handlers.clear()
+        logging.getLogger(name).propagate = True
+    logging.getLogger("uvicorn.access").disabled = True
@@ -1,45 +1,153 @@
 # main app entry (to be completed)
-import os
+import cProfile, logging, os, random, re, time, uuid
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from starlette.routing import Match
 from app.config import settings
-from app.logging import configure_logging
-from app.routers import auth, coding, terminology, fhirio, health
+from app.deps import get_profiling, get_rate_limiter
+from app.metrics import IN_FLIGHT, REQUESTS
+from app.security import ADMIN_SCOPE, cached_claims, has_scope, request_claims
+from app.logging import configure_logging, request_id
+from app.lifecycle import lifespan
+from app.routers import admin, auth, coding, terminology, fhirio, health
 
 configure_logging()
 
-app = FastAPI(title="SAARTHI (minimal)")
+app = FastAPI(title="SAARTHI (minimal)", lifespan=lifespan)
 
 @app.get("/ping")
 def ping():
     return {"ok": True}
 
-# CORS
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+# probes, metrics and docs: never rate limited, served while warming up
+UNGATED = ("/ping", "/metrics", f"{settings.api_prefix}/health", "/docs", "/openapi.json")
+
+# Per-request cProfile (innermost middleware)
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    prof = get_profiling().requests
+    forced = "x-debug-profile" in request.headers and has_scope(request_claims(request) or {}, ADMIN_SCOPE)
+    if not prof.acquire(forced):
+        return await call_next(request)
+    profiler, t0 = cProfile.Profile(), time.perf_counter()
+    profiler.enable()
+    try:
+        response = await call_next(request)
+    finally:
+        profiler.disable()
+        label = f"{request.method}_{route_label(request)}_{(time.perf_counter() - t0) * 1000:.0f}ms"
+        path = get_profiling().path("request", "prof", label)
+        prof.release(profiler, path)
+    response.headers["X-Profile-File"] = os.path.basename(path)
+    return response
+
+def parse_routes(spec: str, value=int) -> dict:
+    """"[METHOD ]path=value,..." with paths below API_PREFIX -> {"[METHOD ]/v1/path": value}"""
+    out = {}
+    for item in filter(None, spec.split(",")):
+        route, v = item.rsplit("=", 1)
+        method, _, path = route.strip().rpartition(" ")
+        out[f"{method} {settings.api_prefix}{path}".lstrip()] = value(v)
+    return out
+
+# Rate limiting
+COSTS = parse_routes(settings.rate_limit_costs)
+
+def client_key(request: Request) -> str:
+    # only already verified tokens count as a client; anything else is limited by address
+    claims = cached_claims(request)
+    if claims is not None:
+        return f"sub:{claims['sub']}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+@app.middleware("http")
+async def rate_limit(request: Request, call_next):
+    limiter = get_rate_limiter()
+    path = request.url.path
+    if limiter is None or request.method == "OPTIONS" or path.startswith(UNGATED):
+        return await call_next(request)
+    cost = COSTS.get(f"{request.method} {path}") or COSTS.get(path, 1)
+    decision = await limiter.hit(client_key(request), cost)
+    if not decision.allowed:
+        return JSONResponse({"detail": "rate limit exceeded"}, status_code=429, headers=decision.headers())
+    response = await call_next(request)
+    response.headers.update(decision.headers())
+    return response
+
+# Readiness gate: 503 until warm-up is done (preflights pass)
+
+@app.middleware("http")
+async def readiness_gate(request: Request, call_next):
+    if (not getattr(request.app.state, "ready", False) and request.method != "OPTIONS"
+            and not request.url.path.startswith(UNGATED)):
+        return JSONResponse({"detail": "warming up"}, status_code=503, headers={"Retry-After": "1"})
+    return await call_next(request)
+
+# Metrics, access log and request id (outside the gates, so 429/503 answers are counted too)
+
+def route_label(request: Request) -> str:
+    route = request.scope.get("route")  # set by the router once it has matched
+    if route is None:  # answered before routing (rate limit, readiness gate)
+        route = next((r for r in request.app.router.routes if r.matches(request.scope)[0] == Match.FULL), None)
+    return getattr(route, "path", "unmatched")
+
+REQUEST_ID = re.compile(r"^[A-Za-z0-9._\-]{1,64}$")
+SAMPLE = parse_routes(settings.log_access_sample, float)
+access_log = logging.getLogger("saarthi.access")
+
+def log_access(request: Request, route: str, status: int, seconds: float) -> None:
+    rate = SAMPLE.get(f"{request.method} {route}", SAMPLE.get(route, 1.0))
+    if rate < 1.0 and status < 500 and seconds * 1000 < settings.log_slow_ms and random.random() >= rate:
+        return
+    claims = getattr(request.state, "claims", None)  # left by require_token
+    access_log.info("%s %s %d", request.method, request.url.path, status, extra={
+        "method": request.method, "route": route, "status": status, "ms": round(seconds * 1000, 2),
+        "client": request.client.host if request.client else None, "sub": claims.get("sub") if claims else None,
+        "sample": rate})
+
+@app.middleware("http")
+async def observe(request: Request, call_next):
+    rid = request.headers.get("x-request-id", "")
+    token = request_id.set(rid if REQUEST_ID.match(rid) else uuid.uuid4().hex)
+    IN_FLIGHT.inc()
+    t0, status = time.perf_counter(), 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = request_id.get()
+        return response
+    finally:
+        IN_FLIGHT.dec()
+        elapsed, route = time.perf_counter() - t0, route_label(request)
+        REQUESTS.labels(request.method, route, str(status)).observe(elapsed)
+        if settings.log_access:
+            log_access(request, route, status, elapsed)
+        request_id.reset(token)
+
+# CORS (outermost, so 429/503 answers carry its headers too)
 origins = [o for o in settings.cors_allowed_origins.split(",") if o]
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["GET","POST","OPTIONS"],
-    allow_headers=["Authorization","Content-Type"]
+    allow_headers=["Authorization","Content-Type"],
+    expose_headers=["X-RateLimit-Limit","X-RateLimit-Remaining","X-RateLimit-Reset","Retry-After","X-Request-ID"]
 )
 
-# Rate limiting
-limiter = Limiter(key_func=get_remote_address, default_limits=[f"{settings.rate_limit_rps}/second"])  # type: ignore
-app.state.limiter = limiter
-
-@app.middleware("http")
-async def add_rate_headers(request: Request, call_next):
-    response = await call_next(request)
-    return response
-
 # Routers
 app.include_router(auth.router, prefix=settings.api_prefix)
 app.include_router(coding.router, prefix=settings.api_prefix)
 app.include_router(terminology.router, prefix=settings.api_prefix)
 app.include_router(fhirio.router, prefix=settings.api_prefix)
 app.include_router(health.router, prefix=settings.api_prefix)
+app.include_router(admin.router, prefix=settings.api_prefix)
 
 
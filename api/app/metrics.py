@@ -0,0 +1,106 @@
+# Prometheus metrics, served at GET /metrics (outside API_PREFIX, so nginx doesn't expose it)
+import json, os, time
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from app.config import settings
+
+# autocode stages run in microseconds on the in-process index; HTTP requests in milliseconds
+FAST_BUCKETS = (.0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5)
+HTTP_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5, 5.0, 10.0)
+
+REQUESTS = Histogram("saarthi_http_request_duration_seconds", "HTTP request latency by route template",
+                     ["method", "route", "status"], buckets=HTTP_BUCKETS)
+IN_FLIGHT = Gauge("saarthi_http_requests_in_flight", "HTTP requests being handled")
+STAGE = Histogram("saarthi_stage_duration_seconds", "Time spent in one internal step of a request",
+                  ["stage"], buckets=FAST_BUCKETS)
+ES_FALLBACK = Counter("saarthi_es_fallback_total", "Searches answered without ES after trying it",
+                      ["op", "reason"])  # reason: error | empty | valueset_size
+
+def stage(name: str):
+    """`with stage("search.es"): ...` observes the block's duration under that stage label."""
+    return STAGE.labels(name).time()
+
+def _gauge(name: str, doc: str, value, labels: dict | None = None) -> GaugeMetricFamily:
+    g = GaugeMetricFamily(name, doc, labels=list(labels or {}))
+    g.add_metric(list((labels or {}).values()), value)
+    return g
+
+class StateCollector:
+    """Scrape-time view of process state. Only reads deps that are already built."""
+
+    def __init__(self):
+        self._ckpt: tuple[float, dict] = (0.0, {})  # (mtime, parsed checkpoint)
+
+    def describe(self):
+        return []  # otherwise REGISTRY.register() calls collect() at import time, mid `app.deps` import
+
+    def collect(self):
+        from app import deps, security, logging as app_logging  # imported here: deps imports the services that import this module
+        yield from self._pools(deps)
+        if deps.get_query_cache.cache_info().currsize and deps.get_query_cache() is not None:
+            snap = deps.get_query_cache().snapshot()
+            hits = CounterMetricFamily("saarthi_query_cache_hits", "Query cache hits by tier", labels=["tier"])
+            hits.add_metric(["local"], snap["local_hits"])
+            hits.add_metric(["redis"], snap["redis_hits"])
+            yield hits
+            yield CounterMetricFamily("saarthi_query_cache_misses", "Query cache misses", value=snap["misses"])
+            yield CounterMetricFamily("saarthi_query_cache_redis_errors", "Redis errors seen by the query cache",
+                                      value=snap["redis_errors"])
+            yield _gauge("saarthi_query_cache_hit_ratio", "Hits / lookups since start", snap["hit_ratio"])
+            yield _gauge("saarthi_query_cache_entries", "Entries in the in-process tier", snap["local_size"])
+        if deps.get_rate_limiter.cache_info().currsize and deps.get_rate_limiter() is not None:
+            rl = deps.get_rate_limiter().stats
+            dec = CounterMetricFamily("saarthi_rate_limit_decisions", "Rate limiter decisions", labels=["result"])
+            dec.add_metric(["allowed"], rl["allowed"])
+            dec.add_metric(["limited"], rl["limited"])
+            yield dec
+        yield _gauge("saarthi_token_cache_entries", "Verified tokens cached", len(security.verified))
+        yield CounterMetricFamily("saarthi_log_records_dropped", "Log records dropped on a full log queue",
+                                  value=app_logging.dropped())
+        if deps.get_corpus.cache_info().currsize:
+            corpus = deps.get_corpus()
+            yield _gauge("saarthi_corpus_version", "corpus_version of the loaded indexes", corpus.version)
+            yield _gauge("saarthi_corpus_concepts", "Concepts in the in-process index", len(corpus.term))
+            yield _gauge("saarthi_corpus_loaded_timestamp_seconds", "When the loaded corpus was built", corpus.loaded_at)
+            yield _gauge("saarthi_corpus_snapshot_bytes", "Size of the mapped corpus snapshot (0: private in-process build)",
+                         corpus.snapshot.size if corpus.snapshot is not None else 0)
+        yield from self._ingest()
+
+    def _pools(self, deps):
+        size = GaugeMetricFamily("saarthi_db_pool_size", "Connections the pool keeps", labels=["engine"])
+        out = GaugeMetricFamily("saarthi_db_pool_checked_out", "Connections in use", labels=["engine"])
+        over = GaugeMetricFamily("saarthi_db_pool_overflow", "Connections beyond pool_size", labels=["engine"])
+        engines = []
+        if deps.get_engine.cache_info().currsize:
+            engines.append(("sync", deps.get_engine().pool))
+        if deps.get_async_engine.cache_info().currsize:
+            engines.append(("async", deps.get_async_engine().sync_engine.pool))
+        for name, pool in engines:
+            if hasattr(pool, "checkedout"):  # QueuePool/AsyncAdaptedQueuePool; NullPool keeps nothing
+                size.add_metric([name], pool.size())
+                out.add_metric([name], pool.checkedout())
+                over.add_metric([name], max(pool.overflow(), 0))
+        return size, out, over
+
+    def _ingest(self):
+        # the worker's checkpoint (scripts/ingest_checkpoint.py) exists only while an ingest is in progress
+        path = settings.icd_checkpoint_file
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            yield _gauge("saarthi_ingest_in_progress", "An ingest checkpoint exists", 0)
+            return
+        if mtime != self._ckpt[0]:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self._ckpt = (mtime, json.load(f))
+            except (OSError, ValueError):
+                return  # mid-replace; next scrape
+        saved = self._ckpt[1]
+        state = saved.get("state") or {}
+        yield _gauge("saarthi_ingest_in_progress", "An ingest checkpoint exists", 1)
+        yield _gauge("saarthi_ingest_entities_fetched", "Entities fetched by the running ingest", saved.get("entities", 0))
+        yield _gauge("saarthi_ingest_stage", "Stage of the running ingest", 1, {"stage": str(state.get("stage"))})
+        yield _gauge("saarthi_ingest_checkpoint_age_seconds", "Seconds since the last checkpoint", time.time() - mtime)
+
+REGISTRY.register(StateCollector())
@@ -0,0 +1,54 @@
+# schema migrations: run once at startup (MIGRATE_ON_STARTUP) or via scripts/migrate.py
+import logging
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger(__name__)
+
+STATEMENTS = [
+    """CREATE TABLE IF NOT EXISTS icd_concept(
+      id TEXT PRIMARY KEY,
+      code TEXT,
+      title TEXT,
+      definition TEXT,
+      linearization TEXT,
+      last_updated TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS icd_synonym(
+      concept_id TEXT,
+      term TEXT,
+      lang TEXT,
+      weight REAL DEFAULT 1.0,
+      linearization TEXT
+    )""",
+    "CREATE TABLE IF NOT EXISTS corpus_version(name TEXT PRIMARY KEY, version INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS namaste_map(namaste_term TEXT, icd_code TEXT, confidence REAL, notes TEXT)",
+    "CREATE INDEX IF NOT EXISTS ix_icd_concept_code ON icd_concept(code)",
+    "CREATE INDEX IF NOT EXISTS ix_icd_synonym_concept ON icd_synonym(concept_id)",
+]
+
+# columns added after the first release; CREATE TABLE IF NOT EXISTS won't add them to old tables
+COLUMNS = [
+    ("icd_synonym", "linearization", "TEXT"),
+    ("namaste_map", "namaste_code", "TEXT"),
+    ("icd_concept", "content_hash", "TEXT"),
+    ("corpus_version", "generation", "TEXT"),
+]
+
+# indexes on columns that COLUMNS may have just added
+POST_STATEMENTS = [
+    "CREATE INDEX IF NOT EXISTS ix_namaste_map_term ON namaste_map(namaste_term)",
+    "CREATE INDEX IF NOT EXISTS ix_namaste_map_code ON namaste_map(namaste_code)",
+]
+
+def migrate(engine: Engine) -> None:
+    with engine.begin() as cx:
+        for stmt in STATEMENTS:
+            cx.exec_driver_sql(stmt)
+        insp = inspect(cx)
+        for table, column, ddl in COLUMNS:
+            if column not in {c["name"] for c in insp.get_columns(table)}:
+                cx.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+        for stmt in POST_STATEMENTS:
+            cx.exec_driver_sql(stmt)
+    log.info("schema migrations applied")
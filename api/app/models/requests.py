@@ -6,12 +6,27 @@ class AutoCodeReq(BaseModel):
     text: str
     valueSet: Optional[str] = None
     topK: int = 10
-    lang: str = "en"
+    lang: str = "en"  # boosts synonyms in this language on ES (synonyms_<lang>); the in-process index has none
+    fuzzy: bool = False  # tolerate typos and transliteration variants
+
+class AutoCodeBatchReq(BaseModel):
+    items: List[AutoCodeReq]
 
 class ValidateReq(BaseModel):
     code: str
     system: str = "http://id.who.int/icd/release/11"
 
+class ValidateBatchReq(BaseModel):
+    codes: List[str]
+    system: str = "http://id.who.int/icd/release/11"
+
+class TranslateReq(BaseModel):
+    code: str | None = None  # NAMASTE code
+    term: str | None = None  # NAMASTE term, matched after normalization
+
+class TranslateBatchReq(BaseModel):
+    items: List[TranslateReq]
+
 class PatientIn(BaseModel):
     id: str | None = None
     name: str
@@ -13,7 +13,40 @@ class AutoCodeResp(BaseModel):
     query: str
     suggestions: list[Suggestion]
 
+class AutoCodeBatchItem(BaseModel):
+    query: str
+    suggestions: list[Suggestion] = []
+    error: str | None = None
+
+class AutoCodeBatchResp(BaseModel):
+    results: list[AutoCodeBatchItem]
+
 class ValidateResp(BaseModel):
     valid: bool
     title: str | None = None
     linearization: str | None = None
+
+class ValidateBatchItem(BaseModel):
+    code: str
+    valid: bool
+    title: str | None = None
+    linearization: str | None = None
+
+class ValidateBatchResp(BaseModel):
+    results: list[ValidateBatchItem]
+
+class TranslateMatch(BaseModel):
+    code: str
+    display: str | None = None
+    system: str = "http://id.who.int/icd/release/11"
+    confidence: float
+    notes: str | None = None
+
+class TranslateResp(BaseModel):
+    code: str | None = None
+    term: str | None = None
+    result: bool
+    matches: list[TranslateMatch]
+
+class TranslateBatchResp(BaseModel):
+    results: list[TranslateResp]
@@ -0,0 +1,65 @@
+# admin endpoints: on-demand profiling of the worker that answers (admin scope)
+import os
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.config import settings
+from app.deps import get_profiling
+from app.security import require_admin
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+def _seconds(default: float):
+    return Query(default, gt=0, le=settings.profile_max_seconds)
+
+@router.get("/profile")
+def profile_status():
+    return get_profiling().status()
+
+@router.post("/profile/sample", status_code=202)
+def profile_sample(seconds: float = _seconds(30.0), interval_ms: float = Query(5.0, ge=1, le=1000),
+                   format: Literal["speedscope", "folded"] = "speedscope", idle: bool = False):
+    """Sample every thread's stack for `seconds`; the file is written when the window ends
+    (or on /profile/stop). `idle=true` keeps samples of threads that are only waiting."""
+    prof = get_profiling()
+    path = prof.path("sample", "speedscope.json" if format == "speedscope" else "folded")
+    try:
+        prof.sampler.start(path, seconds, interval_ms / 1000, format, idle)
+    except RuntimeError as e:
+        raise HTTPException(409, str(e))
+    return {"pid": os.getpid(), "file": os.path.basename(path), "until": round(prof.sampler.until)}
+
+@router.post("/profile/requests", status_code=202)
+def profile_requests(seconds: float = _seconds(60.0), limit: int = Query(20, ge=1, le=1000)):
+    """cProfile the next `limit` requests this worker serves within `seconds`, one .prof each.
+    Outside a window, admin requests with an X-Debug-Profile header are profiled on their own."""
+    prof = get_profiling()
+    prof.requests.start(seconds, limit)
+    return {"pid": os.getpid(), "until": round(prof.requests.until), "limit": limit}
+
+@router.post("/profile/stop")
+def profile_stop():
+    prof = get_profiling()
+    prof.sampler.stop()
+    prof.requests.stop()
+    return prof.status()
+
+@router.post("/tracemalloc/start")
+def tracemalloc_start(frames: int = Query(25, ge=1, le=100)):
+    """Start allocation tracing (slows allocation-heavy code noticeably until stopped)."""
+    get_profiling().alloc.start(frames)
+    return {"pid": os.getpid(), "tracing": True}
+
+@router.post("/tracemalloc/snapshot")
+def tracemalloc_snapshot(top: int = Query(20, ge=1, le=500), key: Literal["lineno", "filename", "traceback"] = "lineno"):
+    """Dump a snapshot (.tracemalloc, loadable with tracemalloc.Snapshot.load) and list the top
+    allocation sites, plus the change since the previous snapshot."""
+    prof = get_profiling()
+    try:
+        return {"pid": os.getpid(), **prof.alloc.snapshot(prof.path("alloc", "tracemalloc"), top, key)}
+    except RuntimeError as e:
+        raise HTTPException(409, str(e))
+
+@router.post("/tracemalloc/stop")
+def tracemalloc_stop():
+    get_profiling().alloc.stop()
+    return {"pid": os.getpid(), "tracing": False}
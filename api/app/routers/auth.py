@@ -1,6 +1,7 @@
 # auth routes
 from fastapi import APIRouter, HTTPException, Form
-from app.security import create_token
+from app.config import settings
+from app.security import ADMIN_SCOPE, create_token
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -11,4 +12,6 @@ CLIENTS = {"demo-client-id": "demo-client-secret"}
 def token(client_id: str = Form(...), client_secret: str = Form(...), scope: str = Form(default="read:codes")):
     if CLIENTS.get(client_id) != client_secret:
         raise HTTPException(status_code=401, detail="invalid client credentials")
-    return {"access_token": create_token(client_id, scope.split()), "token_type": "bearer"}
+    admins = settings.admin_clients.split(",")
+    scopes = [s for s in scope.split() if s != ADMIN_SCOPE or client_id in admins]
+    return {"access_token": create_token(client_id, scopes), "token_type": "bearer"}
@@ -1,24 +1,96 @@
 # coding endpoints
-from fastapi import APIRouter, Security, Depends, HTTPException
-from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from app.security import verify_token
-from app.models.requests import AutoCodeReq, ValidateReq
-from app.models.responses import AutoCodeResp, ValidateResp, Suggestion
-from app.deps import get_search, get_icd_repo
-from app.services.validators import validate_code
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from app.security import require_token
+from app.config import settings
+from app.models.requests import AutoCodeReq, AutoCodeBatchReq, ValidateReq, ValidateBatchReq
+from app.models.responses import AutoCodeResp, AutoCodeBatchResp, ValidateResp, ValidateBatchResp, Suggestion
+from app.deps import use_async_search, use_async_icd_repo, use_corpus, use_query_cache
+from app.services.export import MEDIA, batched, csv_stream, ndjson_stream, read_items
+from app.services.validators import avalidate_code, avalidate_codes
+from app.services.term_index import ICD_SYSTEM
 
-auth = HTTPBearer()
-router = APIRouter(prefix="/coding", tags=["coding"])
+router = APIRouter(prefix="/coding", tags=["coding"], dependencies=[Depends(require_token)])
 
 @router.post("/autocode", response_model=AutoCodeResp)
-def autocode(body: AutoCodeReq, cred: HTTPAuthorizationCredentials = Security(auth), search=Depends(get_search)):
-    verify_token(cred.credentials)
-    suggestions = search.suggest(body.text, body.topK, body.valueSet)
+async def autocode(body: AutoCodeReq, search=Depends(use_async_search)):
+    try:
+        suggestions = await search.suggest(body.text, body.topK, body.valueSet, body.fuzzy, body.lang)
+    except LookupError as e:
+        raise HTTPException(404, str(e))
     typed = [Suggestion(**s) for s in suggestions]
     return {"query": body.text, "suggestions": typed}
 
+@router.post("/autocode/batch", response_model=AutoCodeBatchResp)
+async def autocode_batch(body: AutoCodeBatchReq, search=Depends(use_async_search)):
+    if len(body.items) > settings.autocode_batch_max:
+        raise HTTPException(413, f"at most {settings.autocode_batch_max} items per batch")
+    results = await search.suggest_many([(i.text, i.topK, i.valueSet, i.fuzzy, i.lang) for i in body.items])
+    out = []
+    for item, res in zip(body.items, results):
+        if isinstance(res, Exception):
+            out.append({"query": item.text, "error": str(res) or type(res).__name__})
+        else:
+            out.append({"query": item.text, "suggestions": [Suggestion(**s) for s in res]})
+    return {"results": out}
+
+SUGGESTION_CSV = ["query", "rank", "code", "display", "system", "score", "linearization", "error"]
+
+async def _export_results(items, search):
+    async for batch in batched(items, settings.export_batch_size):
+        reqs = [i for i in batch if not isinstance(i, dict)]
+        results = iter(await search.suggest_many([(i.text, i.topK, i.valueSet, i.fuzzy, i.lang) for i in reqs]))
+        for item in batch:
+            if isinstance(item, dict):  # OperationOutcome for an input line that didn't validate
+                yield item
+                continue
+            res = next(results)
+            if isinstance(res, Exception):
+                yield {"query": item.text, "error": str(res) or type(res).__name__}
+            else:
+                yield {"query": item.text, "suggestions": res}
+
+async def _suggestion_rows(objs):
+    async for r in objs:
+        if "resourceType" in r:
+            yield ["", "", "", "", "", "", "", r["issue"][0]["diagnostics"]]
+        elif "error" in r or not r["suggestions"]:
+            yield [r["query"], "", "", "", "", "", "", r.get("error", "")]
+        else:
+            for rank, s in enumerate(r["suggestions"], 1):
+                yield [r["query"], rank, s["code"], s["display"], s["system"], s["score"], s.get("linearization") or "", ""]
+
+@router.post("/autocode/export")
+async def autocode_export(request: Request, fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+                          search=Depends(use_async_search)):
+    """Streamed autocode for any number of queries. Body: {"items": [AutoCodeReq, ...]} or
+    application/x-ndjson with one AutoCodeReq per line. NDJSON out: one batch-style result per
+    query; CSV: one row per suggestion."""
+    objs = _export_results(await read_items(request, AutoCodeReq), search)
+    body = csv_stream(SUGGESTION_CSV, _suggestion_rows(objs)) if fmt == "csv" else ndjson_stream(objs)
+    media = "application/x-ndjson" if fmt == "ndjson" else MEDIA[fmt]
+    return StreamingResponse(body, media_type=media,
+                             headers={"Content-Disposition": f'attachment; filename="autocode.{fmt}"'})
+
+@router.get("/complete", response_model=AutoCodeResp)
+async def complete(q: str = Query(..., min_length=1), topK: int = Query(10, ge=1, le=50),
+                   search=Depends(use_async_search)):
+    typed = [Suggestion(**s) for s in search.complete(q, topK)]
+    return {"query": q, "suggestions": typed}
+
 @router.post("/validate", response_model=ValidateResp)
-def validate(body: ValidateReq, cred: HTTPAuthorizationCredentials = Security(auth), repo=Depends(get_icd_repo)):
-    verify_token(cred.credentials)
-    ok, title = validate_code(repo, body.code)
-    return {"valid": ok, "title": title}
+async def validate(body: ValidateReq, repo=Depends(use_async_icd_repo),
+                   corpus=Depends(use_corpus), cache=Depends(use_query_cache)):
+    ok, title, lin = await avalidate_code(repo, body.code, corpus.codes, cache, corpus.cache_version)
+    return {"valid": ok, "title": title, "linearization": lin}
+
+@router.post("/validate/batch", response_model=ValidateBatchResp)
+async def validate_batch(body: ValidateBatchReq, repo=Depends(use_async_icd_repo), corpus=Depends(use_corpus)):
+    if len(body.codes) > settings.validate_batch_max:
+        raise HTTPException(413, f"at most {settings.validate_batch_max} codes per batch")
+    if body.system != ICD_SYSTEM:
+        raise HTTPException(400, f"unsupported code system: {body.system}")
+    results = await avalidate_codes(repo, body.codes, corpus.codes)
+    return {"results": [{"code": c, "valid": ok, "title": t, "linearization": lin}
+                        for c, (ok, t, lin) in zip(body.codes, results)]}
@@ -1,22 +1,114 @@
 # FHIR export/import endpoints
-from fastapi import APIRouter, Security
-from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from app.security import verify_token
+from typing import Literal
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from app.config import settings
+from app.deps import use_async_icd_repo, use_corpus
+from app.metrics import stage
+from app.security import require_token
 from app.models.requests import ExportFHIRReq
-from app.services.fhir_builders import build_bundle, summarize_bundle
-from fhir.resources.bundle import Bundle
+from app.services.export import MEDIA, csv_stream, is_ndjson, ndjson_stream, read_items, spool_body
+from app.services.fhir_builders import bundle_dict, bundle_resources
+from app.services.fhir_import import BundleImporter
 
-auth = HTTPBearer()
-router = APIRouter(prefix="/fhir", tags=["fhir"])
+router = APIRouter(prefix="/fhir", tags=["fhir"], dependencies=[Depends(require_token)])
+
+FHIR_CSV = ["patient", "resourceType", "id", "system", "code", "display"]
 
 @router.post("/export/bundle")
-def export_bundle(req: ExportFHIRReq, cred: HTTPAuthorizationCredentials = Security(auth)):
-    verify_token(cred.credentials)
-    b = build_bundle(req)
-    return b.dict()
+def export_bundle(req: ExportFHIRReq):
+    with stage("fhir.build"):
+        return ORJSONResponse(bundle_dict(req))
+
+async def _export_objs(items, unit: str, types: set[str] | None):
+    n = 0
+    async for req in items:
+        n += 1
+        if isinstance(req, dict):  # OperationOutcome for an input line that didn't validate
+            yield req
+        elif unit == "bundle":
+            with stage("fhir.build"):
+                bundle = bundle_dict(req, f"pat{n}")
+            yield bundle
+        else:
+            with stage("fhir.build"):
+                resources = bundle_resources(req, f"pat{n}")
+            for r in resources:
+                if types is None or r["resourceType"] in types:
+                    yield r
+
+def _csv_row(r: dict) -> list:
+    if r["resourceType"] == "OperationOutcome":
+        return ["", "OperationOutcome", "", "", "", r["issue"][0]["diagnostics"]]
+    if r["resourceType"] == "Patient":
+        return [r["id"], "Patient", r["id"], "", "", r["name"][0]["text"]]
+    coding = r.get("code", {}).get("coding", [{}])[0]
+    return [r["subject"]["reference"].split("/", 1)[1], r["resourceType"], r["id"],
+            coding.get("system", ""), coding.get("code", ""), coding.get("display", "")]
+
+async def _csv_rows(objs):
+    async for r in objs:
+        yield _csv_row(r)
+
+@router.post("/export/stream")
+async def export_stream(request: Request, fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+                        unit: Literal["resource", "bundle"] = "resource", types: str | None = Query(None, alias="_type")):
+    """Export many patients' bundles as a stream. Body: {"items": [ExportFHIRReq, ...]} or
+    application/x-ndjson with one ExportFHIRReq per line. Output: one resource (or, with
+    unit=bundle, one Bundle) per NDJSON line, or one resource per CSV row; `_type` filters
+    resource types. Patients without an id get pat<n> (n = input position)."""
+    if fmt == "csv" and unit == "bundle":
+        raise HTTPException(400, "unit=bundle is only available as NDJSON")
+    items = await read_items(request, ExportFHIRReq)
+    objs = _export_objs(items, unit, {t.strip() for t in types.split(",")} if types else None)
+    body = csv_stream(FHIR_CSV, _csv_rows(objs)) if fmt == "csv" else ndjson_stream(objs)
+    return StreamingResponse(body, media_type=MEDIA[fmt],
+                             headers={"Content-Disposition": f'attachment; filename="export.{fmt}"'})
+
+def _importer(full: bool, repo, corpus) -> BundleImporter:
+    return BundleImporter(repo, corpus.codes, full, settings.import_code_batch, settings.import_max_errors)
 
 @router.post("/import/bundle")
-def import_bundle(bundle: dict, cred: HTTPAuthorizationCredentials = Security(auth)):
-    verify_token(cred.credentials)
-    b = Bundle.parse_obj(bundle)
-    return {"valid": True, "summary": summarize_bundle(b)}
+async def import_bundle(request: Request, full: bool = False, repo=Depends(use_async_icd_repo), corpus=Depends(use_corpus)):
+    """Check a Bundle (raw JSON body): structure, references and every ICD-11 Coding against the
+    code set. `full=true` adds fhir.resources model validation. Errors are listed per entry."""
+    body = await request.body()
+    try:
+        with stage("fhir.parse"):
+            bundle = orjson.loads(body)
+    except orjson.JSONDecodeError as e:
+        raise HTTPException(400, f"invalid JSON: {e}")
+    imp = _importer(full, repo, corpus)
+    with stage("fhir.import"):
+        await imp.add_bundle(bundle)
+        report = await imp.finish()
+    return ORJSONResponse(report)
+
+@router.post("/import/ndjson")
+async def import_ndjson(request: Request, full: bool = False, repo=Depends(use_async_icd_repo), corpus=Depends(use_corpus)):
+    """Same checks for an application/x-ndjson body of resources (Bulk Data style) or Bundles,
+    one per line, parsed line by line; `entry` in errors is the line number."""
+    if not is_ndjson(request):
+        raise HTTPException(415, "expected an application/x-ndjson body")
+    imp = _importer(full, repo, corpus)
+    with await spool_body(request) as spool, stage("fhir.import"):
+        for n, raw in enumerate(spool, 1):
+            if not raw.strip():
+                continue
+            try:
+                with stage("fhir.parse"):
+                    obj = orjson.loads(raw)
+            except orjson.JSONDecodeError as e:
+                imp.report.entries += 1
+                imp.report.error(n, None, "", f"invalid JSON: {e}")
+                continue
+            if isinstance(obj, dict) and obj.get("resourceType") == "Bundle":
+                await imp.add_bundle(obj, n)
+            elif isinstance(obj, dict):
+                await imp.add(obj, n)
+            else:
+                imp.report.entries += 1
+                imp.report.error(n, None, "", "expected a JSON object")
+        report = await imp.finish()
+    return ORJSONResponse(report)
@@ -1,11 +1,13 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import JSONResponse
 from sqlalchemy import text
-from app.deps import get_engine, get_es
+from app.deps import get_engine, get_es, get_corpus, get_query_cache
+from app.security import require_admin
 
 router = APIRouter(prefix="/health", tags=["health"])
 
 @router.get("/ready")
-def ready():
+def ready(request: Request):
     ok_db = True
     try:
         with get_engine().connect() as cx:
@@ -13,4 +15,14 @@ def ready():
     except Exception:
         ok_db = False
     es = get_es()
-    return {"status": "ok" if ok_db else "degraded", "deps": {"db": ok_db, "es": es is not None}}
+    warm = getattr(request.app.state, "ready", False)
+    body = {"status": ("ok" if ok_db else "degraded") if warm else "starting",
+            "deps": {"db": ok_db, "es": es is not None}, "corpusVersion": get_corpus().version}
+    return JSONResponse(body, status_code=200 if warm else 503)
+
+@router.get("/cache", dependencies=[Depends(require_admin)])
+def cache_stats():
+    """Query cache hit/miss counters for this worker."""
+    cache = get_query_cache()
+    return {"enabled": cache is not None, **(cache.snapshot() if cache is not None else {}),
+            "corpusVersion": get_corpus().version}
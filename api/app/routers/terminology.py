@@ -1,22 +1,90 @@
 # terminology routes
-from fastapi import APIRouter, HTTPException
-from pathlib import Path
-import json
+from fastapi import APIRouter, HTTPException, Request, Response, Query, Depends
+from fastapi.responses import ORJSONResponse
+from app.config import settings
+from app.deps import get_valuesets, get_namaste_repo, get_corpus
+from app.models.requests import TranslateBatchReq
+from app.models.responses import TranslateResp, TranslateBatchResp
+from app.services.resource_cache import CachedResource, VALUESET_DIRS, CONCEPTMAP_DIRS, find
+from app.services.valueset_index import FHIR_ID
 
 router = APIRouter(prefix="/terminology", tags=["terminology"])
 
-DATA_DIR = Path(__file__).resolve().parents[3] / "data"
+EMPTY_CONCEPTMAP = CachedResource.from_obj({"resourceType":"ConceptMap","status":"draft","group":[]})
+
+def _etag_matches(header: str, etag: str) -> bool:
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag.strip('"').split("-")[0] == etag:
+            return True
+    return False
+
+def cached_response(request: Request, res: CachedResource) -> Response:
+    accept = request.headers.get("accept-encoding", "")
+    encoding = next((e for e in ("br", "gzip") if e in accept and e in res.variants), None)
+    etag = f'"{res.etag}-{encoding}"' if encoding else f'"{res.etag}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    inm = request.headers.get("if-none-match")
+    if inm and _etag_matches(inm, res.etag):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+        return Response(res.variants[encoding], media_type="application/json", headers=headers)
+    return Response(res.body, media_type="application/json", headers=headers)
 
 @router.get("/valuesets/{vs_id}")
-def get_valueset(vs_id: str):
-    fp = DATA_DIR / "valuesets" / f"{vs_id}.json"
-    if not fp.exists():
+def get_valueset(vs_id: str, request: Request):
+    res = find(VALUESET_DIRS, f"{vs_id}.json") if FHIR_ID.match(vs_id) else None
+    if res is None:
+        raise HTTPException(404, "ValueSet not found")
+    return cached_response(request, res)
+
+@router.get("/valuesets/{vs_id}/$expand")
+def expand_valueset(vs_id: str, filter: str | None = None, offset: int = Query(0, ge=0),
+                    count: int = Query(100, ge=0, le=1000), valuesets=Depends(get_valuesets)):
+    idx = valuesets.get(vs_id)
+    if idx is None:
         raise HTTPException(404, "ValueSet not found")
-    return json.loads(fp.read_text())
+    total, contains = idx.expand(filter, offset, count)
+    vs = idx.resource.data
+    params = [{"name": "offset", "valueInteger": offset}, {"name": "count", "valueInteger": count}]
+    if filter:
+        params.insert(0, {"name": "filter", "valueString": filter})
+    return ORJSONResponse({
+        "resourceType": "ValueSet",
+        "id": vs.get("id", vs_id),
+        "url": vs.get("url"),
+        "status": vs.get("status"),
+        "expansion": {"identifier": f"urn:etag:{idx.resource.etag}", "total": total, "offset": offset,
+                      "parameter": params, "contains": contains},
+    })
 
 @router.get("/conceptmaps/namaste-to-icd11")
-def get_conceptmap():
-    fp = DATA_DIR / "conceptmaps" / "namaste-to-icd11.json"
-    if not fp.exists():
-        return {"resourceType":"ConceptMap","status":"draft","group":[]}
-    return json.loads(fp.read_text())
+def get_conceptmap(request: Request):
+    res = find(CONCEPTMAP_DIRS, "namaste-to-icd11.json") or EMPTY_CONCEPTMAP
+    return cached_response(request, res)
+
+def _translate(repo, corpus, code: str | None, term: str | None) -> dict:
+    matches = []
+    for m in repo.translate(code, term):
+        hit = corpus.codes.lookup(m.icd_code)
+        matches.append({"code": m.icd_code, "display": hit[0] if hit else None,
+                        "confidence": m.confidence, "notes": m.notes})
+    return {"code": code, "term": term, "result": bool(matches), "matches": matches}
+
+@router.get("/conceptmaps/namaste-to-icd11/$translate", response_model=TranslateResp)
+def translate(code: str | None = None, term: str | None = None,
+              repo=Depends(get_namaste_repo), corpus=Depends(get_corpus)):
+    if not code and not term:
+        raise HTTPException(400, "code or term is required")
+    return _translate(repo, corpus, code, term)
+
+@router.post("/conceptmaps/namaste-to-icd11/$translate", response_model=TranslateBatchResp)
+def translate_batch(body: TranslateBatchReq, repo=Depends(get_namaste_repo), corpus=Depends(get_corpus)):
+    if len(body.items) > settings.translate_batch_max:
+        raise HTTPException(413, f"at most {settings.translate_batch_max} items per batch")
+    return {"results": [_translate(repo, corpus, i.code, i.term) for i in body.items]}
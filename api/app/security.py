@@ -1,35 +1,181 @@
 # JWT auth functions here
-import datetime as dt, os, pathlib
-from jose import jwt
-from fastapi import HTTPException, status
+import datetime as dt, hashlib, json, pathlib, threading, time
+from collections import OrderedDict
+import httpx
+from jose import jwk, jwt
+from jose.backends.base import Key
+from cryptography.hazmat.primitives import serialization
+from fastapi import HTTPException, Request, Security, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from app.config import settings
+from app.metrics import stage
 
 ALG = settings.jwt_alg
-PRIVATE = None
-PUBLIC = None
-
-def _load_keys():
-    global PRIVATE, PUBLIC
-    if PRIVATE and PUBLIC:
-        return
-    priv_path = pathlib.Path(settings.jwt_private_key_path)
-    pub_path = pathlib.Path(settings.jwt_public_key_path)
-    PRIVATE = priv_path.read_text() if priv_path.exists() else None
-    PUBLIC  = pub_path.read_text() if pub_path.exists() else None
+
+def _kid(public_pem: bytes) -> str:
+    pub = serialization.load_pem_public_key(public_pem)
+    der = pub.public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+    return hashlib.sha256(der).hexdigest()[:16]
+
+class KeyRing:
+    """Verification keys by kid: the PEM pair plus JWT_JWKS, reloaded on an unknown kid."""
+    def __init__(self):
+        self.private: Key | None = None
+        self.kid: str | None = None  # kid stamped on tokens we sign
+        self.public: dict[str, Key] = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def load(self, force: bool = False) -> None:
+        with self._lock:
+            if not force and self._loaded_at and (
+                    self.public or time.monotonic() - self._loaded_at < settings.jwt_keys_retry_seconds):
+                return
+            self._loaded_at = time.monotonic()
+            public: dict[str, Key] = {}
+            priv_path = pathlib.Path(settings.jwt_private_key_path)
+            pub_path = pathlib.Path(settings.jwt_public_key_path)
+            if priv_path.exists():
+                pem = priv_path.read_bytes()
+                self.private = jwk.construct(pem.decode(), ALG)
+                pub_pem = serialization.load_pem_private_key(pem, password=None).public_key().public_bytes(
+                    serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo)
+                self.kid = _kid(pub_pem)
+            if pub_path.exists():
+                pem = pub_path.read_bytes()
+                public[_kid(pem)] = jwk.construct(pem.decode(), ALG)
+            for k in self._jwks():
+                if k.get("kid") and k.get("kty") in ("RSA", "EC") and k.get("use", "sig") == "sig":
+                    public[k["kid"]] = jwk.construct(k, k.get("alg") or ALG)
+            self.public = public
+
+    def _jwks(self) -> list[dict]:
+        src = settings.jwt_jwks
+        if not src:
+            return []
+        try:
+            if src.startswith(("http://", "https://")):
+                r = httpx.get(src, timeout=5)
+                r.raise_for_status()
+                data = r.json()
+            else:
+                data = json.loads(pathlib.Path(src).read_text())
+        except Exception:
+            return []
+        return data.get("keys", [])
+
+    def lookup(self, kid: str | None) -> list[Key]:
+        self.load()
+        if kid is None:
+            return list(self.public.values())
+        if kid not in self.public:
+            self.load(force=time.monotonic() - self._loaded_at >= settings.jwt_keys_retry_seconds)
+        return [self.public[kid]] if kid in self.public else []
+
+class TokenCache:
+    """Bounded LRU of verified claims keyed by token hash; entries die at the token's exp."""
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict[bytes, dict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, digest: bytes) -> dict | None:
+        with self._lock:
+            claims = self._data.get(digest)
+            if claims is None:
+                return None
+            if claims.get("exp", 0) <= time.time():
+                del self._data[digest]
+                return None
+            self._data.move_to_end(digest)
+            return claims
+
+    def put(self, digest: bytes, claims: dict) -> None:
+        if self.maxsize <= 0 or "exp" not in claims:
+            return
+        with self._lock:
+            self._data[digest] = claims
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+keys = KeyRing()
+verified = TokenCache(settings.jwt_cache_size)
 
 def create_token(sub: str, scopes: list[str]):
-    _load_keys()
-    if not PRIVATE:
+    keys.load()
+    if keys.private is None:
         raise RuntimeError("JWT private key not found")
     now = dt.datetime.utcnow()
     payload = {"sub": sub, "scope":" ".join(scopes), "iat": now, "exp": now + dt.timedelta(minutes=settings.access_token_expires_min)}
-    return jwt.encode(payload, PRIVATE, algorithm=ALG)
+    return jwt.encode(payload, keys.private, algorithm=ALG, headers={"kid": keys.kid})
+
+def _invalid() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
 
 def verify_token(token: str) -> dict:
-    _load_keys()
-    if not PUBLIC:
-        raise RuntimeError("JWT public key not found")
+    with stage("auth.verify"):
+        return _verify(token)
+
+def _verify(token: str) -> dict:
+    digest = hashlib.sha256(token.encode()).digest()
+    claims = verified.get(digest)
+    if claims is not None:
+        return claims
     try:
-        return jwt.decode(token, PUBLIC, algorithms=[ALG])
+        kid = jwt.get_unverified_header(token).get("kid")
     except Exception:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
+        raise _invalid()
+    candidates = keys.lookup(kid)
+    if not candidates:
+        if not keys.public:
+            raise RuntimeError("JWT public key not found")
+        raise _invalid()
+    try:
+        claims = jwt.decode(token, candidates, algorithms=[ALG])
+    except Exception:
+        raise _invalid()
+    verified.put(digest, claims)
+    return claims
+
+ADMIN_SCOPE = "admin"
+
+def has_scope(claims: dict, scope: str) -> bool:
+    return scope in str(claims.get("scope", "")).split()
+
+bearer = HTTPBearer()
+
+def _bearer_token(request: Request) -> str | None:
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    return token if scheme.lower() == "bearer" and token else None
+
+def request_claims(request: Request) -> dict | None:
+    """Claims of a valid bearer token on the request, else None; for middleware, before routing."""
+    token = _bearer_token(request)
+    if token is None:
+        return None
+    try:
+        return verify_token(token)
+    except Exception:
+        return None
+
+def cached_claims(request: Request) -> dict | None:
+    """Claims of an already verified bearer token: a cache lookup, no signature check."""
+    token = _bearer_token(request)
+    if token is None:
+        return None
+    return verified.get(hashlib.sha256(token.encode()).digest())
+
+async def require_token(request: Request, cred: HTTPAuthorizationCredentials = Security(bearer)) -> dict:
+    """The one auth dependency for protected routers; claims are also left on request.state."""
+    claims = verify_token(cred.credentials)
+    request.state.claims = claims
+    return claims
+
+async def require_admin(request: Request, cred: HTTPAuthorizationCredentials = Security(bearer)) -> dict:
+    claims = await require_token(request, cred)
+    if not has_scope(claims, ADMIN_SCOPE):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="admin scope required")
+    return claims
@@ -0,0 +1,59 @@
+# in-memory ICD code set (code -> title, linearization) with a bloom pre-check
+import hashlib, math
+from typing import Iterable
+from app.services.snapshot import Snapshot, SnapshotWriter, Table
+
+class BloomFilter:
+    def __init__(self, capacity: int, fp_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        self.m = max(8, int(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        self.k = max(1, round(self.m / capacity * math.log(2)))
+        self.bits = bytearray((self.m + 7) // 8)
+
+    def _positions(self, key: str):
+        d = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(d[:8], "little"), int.from_bytes(d[8:], "little") | 1
+        return ((h1 + i * h2) % self.m for i in range(self.k))
+
+    def add(self, key: str) -> None:
+        for p in self._positions(key):
+            self.bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+class CodeSet:
+    """Rebuilt with the rest of the corpus on every ingest. The bloom filter
+    answers most unknown codes without touching the map."""
+
+    def __init__(self, entries: dict[str, tuple[str | None, str | None]] | None = None,
+                 bloom_fp_rate: float | None = None):
+        self.entries = entries or {}
+        self.bloom: BloomFilter | None = None
+        if bloom_fp_rate:
+            self.bloom = BloomFilter(len(self.entries), bloom_fp_rate)
+            for code in self.entries:
+                self.bloom.add(code)
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def build(cls, concepts: Iterable[dict], bloom_fp_rate: float | None = 0.01) -> "CodeSet":
+        entries = {c["code"]: (c.get("title"), c.get("linearization")) for c in concepts if c.get("code")}
+        return cls(entries, bloom_fp_rate)
+
+    def write(self, w: SnapshotWriter) -> None:
+        w.strings("codes.code", self.entries.keys(), index=True)
+        w.strings("codes.title", (v[0] for v in self.entries.values()))
+        w.strings("codes.linearization", (v[1] for v in self.entries.values()))
+
+    @classmethod
+    def from_snapshot(cls, snap: Snapshot) -> "CodeSet":
+        # no bloom filter: a miss in the mapped hash table costs about what the filter would
+        return cls(Table((snap.strings("codes.title"), snap.strings("codes.linearization")), snap.strings("codes.code")))
+
+    def lookup(self, code: str) -> tuple[str | None, str | None] | None:
+        if self.bloom is not None and code not in self.bloom:
+            return None
+        return self.entries.get(code)
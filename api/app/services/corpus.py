@@ -0,0 +1,178 @@
+# in-process terminology indexes and their reload-on-ingest lifecycle
+import logging, secrets, threading, time
+from sqlalchemy.engine import Engine
+from app.services import snapshot
+from app.services.icd_repo import ICDRepo
+from app.services.term_index import TermIndex
+from app.services.prefix_index import PrefixIndex
+from app.services.fuzzy_index import FuzzyIndex
+from app.services.codeset import CodeSet
+
+log = logging.getLogger(__name__)
+
+def _ensure_row(cx, name: str) -> str:
+    # one row per database, with a random generation id that tells a recreated database apart
+    cx.exec_driver_sql(
+        "INSERT INTO corpus_version(name, version, generation) VALUES (:n, 0, :g) "
+        "ON CONFLICT(name) DO UPDATE SET generation = COALESCE(corpus_version.generation, excluded.generation)",
+        {"n": name, "g": secrets.token_hex(8)})
+    return cx.exec_driver_sql("SELECT generation FROM corpus_version WHERE name=:n", {"n": name}).scalar_one()
+
+def bump_version(engine: Engine, name: str = "icd") -> None:
+    """Called by ingest after it commits; API workers rebuild their indexes when they see the new value."""
+    with engine.begin() as cx:
+        _ensure_row(cx, name)
+        cx.exec_driver_sql("UPDATE corpus_version SET version = version + 1 WHERE name=:n", {"n": name})
+
+def read_state(engine: Engine, name: str = "icd") -> tuple[int, str]:
+    """(version, generation); creates the row (at v0) when there is none yet."""
+    with engine.begin() as cx:
+        row = cx.exec_driver_sql("SELECT version, generation FROM corpus_version WHERE name=:n", {"n": name}).fetchone()
+        if row is not None and row[1]:
+            return row[0], row[1]
+        return (row[0] if row else 0), _ensure_row(cx, name)
+
+class Reloadable:
+    """In-memory data derived from DB tables, rebuilt (or mapped from a snapshot) when the
+    corpus_version row changes. Subclasses implement _build(), _write() and _map()."""
+
+    version_name = "icd"
+
+    def __init__(self, engine: Engine, check_interval: float = 5.0, snapshot_dir: str = "", snapshot_keep: int = 3):
+        self.engine = engine
+        self.check_interval = check_interval
+        self.snapshot_dir = snapshot_dir
+        self.snapshot_keep = snapshot_keep
+        self.db_tag = snapshot.db_tag(engine.url.render_as_string(hide_password=True))
+        self.snapshot: snapshot.Snapshot | None = None  # the file serving the current generation, if any
+        self.version = -1
+        self.generation = ""
+        self.loaded_at = 0.0  # unix time of the last successful load
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: threading.Thread | None = None
+
+    def _build(self) -> None:
+        raise NotImplementedError
+
+    def _write(self, w: snapshot.SnapshotWriter) -> None:
+        raise NotImplementedError
+
+    def _map(self, snap: snapshot.Snapshot) -> None:
+        raise NotImplementedError
+
+    @property
+    def cache_version(self) -> str:
+        """Version for cache keys, qualified by the database generation."""
+        return f"{self.version}.{self.generation}"
+
+    def _open(self, version: int, generation: str) -> snapshot.Snapshot | None:
+        return snapshot.open_snapshot(self.snapshot_dir, self.version_name, self.db_tag, version, generation)
+
+    def _load(self, version: int, generation: str) -> None:
+        snap = None
+        if self.snapshot_dir:
+            snap = self._open(version, generation)
+        if snap is None:
+            self._build()
+            path = self.publish(version, generation)
+            snap = self._open(version, generation) if path else None
+        if snap is not None:
+            self._map(snap)  # built or not, serve from the shared mapping rather than private copies
+        self.snapshot = snap
+
+    def publish(self, version: int, generation: str) -> str | None:
+        """Write what _build() produced as the snapshot of `version`; None when disabled or failed."""
+        if not self.snapshot_dir:
+            return None
+        w = snapshot.SnapshotWriter()
+        self._write(w)
+        w.meta.update(built_at=time.time(), generation=generation)
+        try:
+            return w.publish(self.snapshot_dir, self.version_name, self.db_tag, version, self.snapshot_keep)
+        except OSError:
+            log.warning("%s v%s: snapshot not written", self.version_name, version, exc_info=True)
+            return None
+
+    def publish_next(self) -> str | None:
+        """For ingest, before bump_version(): publish the next version for workers to map."""
+        if not self.snapshot_dir:
+            return None
+        self._build()
+        version, generation = read_state(self.engine, self.version_name)
+        return self.publish(version + 1, generation)
+
+    def refresh(self, force: bool = False) -> bool:
+        if not self._lock.acquire(blocking=force):
+            return False  # another thread is already rebuilding
+        try:
+            version, generation = read_state(self.engine, self.version_name)
+            if not force and (version, generation) == (self.version, self.generation):
+                return False
+            t0 = time.perf_counter()
+            self._load(version, generation)
+            self.version, self.generation = version, generation
+            self.loaded_at = time.time()
+            log.info("%s v%s loaded in %.0f ms%s", self.version_name, version, (time.perf_counter() - t0) * 1000,
+                     f" (mapped {self.snapshot.path})" if self.snapshot is not None else "")
+            return True
+        finally:
+            self._lock.release()
+
+    def start_watcher(self) -> None:
+        """Poll the version every check_interval seconds and rebuild off the request path."""
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name=f"{self.version_name}-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self) -> None:
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
+            self._watcher = None
+
+    def _watch(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.refresh()
+            except Exception:
+                log.exception("%s refresh failed; keeping v%s", self.version_name, self.version)
+
+class Corpus(Reloadable):
+    """Search, typeahead, fuzzy and code-set indexes over icd_concept/icd_synonym."""
+
+    version_name = "icd"
+
+    def __init__(self, repo: ICDRepo, check_interval: float = 5.0, bloom_fp_rate: float | None = 0.01,
+                 snapshot_dir: str = "", snapshot_keep: int = 3):
+        super().__init__(repo.engine, check_interval, snapshot_dir, snapshot_keep)
+        self.repo = repo
+        self.bloom_fp_rate = bloom_fp_rate
+        self.term = TermIndex()
+        self.prefix = PrefixIndex()
+        self.fuzzy = FuzzyIndex()
+        self.codes = CodeSet()
+
+    def _build(self) -> None:
+        concepts = self.repo.iter_concepts()
+        term, prefix, fuzzy = TermIndex.build(concepts), PrefixIndex.build(concepts), FuzzyIndex.build(concepts)
+        codes = CodeSet.build(concepts, self.bloom_fp_rate)
+        self.term, self.prefix, self.fuzzy, self.codes = term, prefix, fuzzy, codes
+        log.info("corpus: %d concepts", len(term))
+
+    def _write(self, w: snapshot.SnapshotWriter) -> None:
+        # the three search indexes number documents identically (concepts with a code, in order)
+        w.strings("doc.code", (d[0] for d in self.term.docs))
+        w.strings("doc.display", (d[1] for d in self.term.docs))
+        w.strings("doc.linearization", (d[2] for d in self.term.docs))
+        for idx in (self.term, self.prefix, self.fuzzy, self.codes):
+            idx.write(w)
+        w.meta["concepts"] = len(self.term)
+
+    def _map(self, snap: snapshot.Snapshot) -> None:
+        docs = snapshot.Table((snap.strings("doc.code"), snap.strings("doc.display"), snap.strings("doc.linearization")))
+        term, prefix, fuzzy = (TermIndex.from_snapshot(snap, docs), PrefixIndex.from_snapshot(snap, docs),
+                               FuzzyIndex.from_snapshot(snap, docs))
+        self.term, self.prefix, self.fuzzy, self.codes = term, prefix, fuzzy, CodeSet.from_snapshot(snap)
@@ -0,0 +1,97 @@
+# streaming exports: NDJSON (FHIR Bulk Data style, one JSON object per line) or CSV
+import csv, io, tempfile
+from typing import AsyncIterable, AsyncIterator, Iterable, TypeVar
+import orjson
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+
+NDJSON_IN = ("application/x-ndjson", "application/ndjson", "application/fhir+ndjson")
+MEDIA = {"ndjson": "application/fhir+ndjson", "csv": "text/csv; charset=utf-8"}
+CHUNK_BYTES = 64 * 1024
+SPOOL_BYTES = 1024 * 1024
+
+M = TypeVar("M", bound=BaseModel)
+
+def outcome(line: int, err: Exception) -> dict:
+    if isinstance(err, ValidationError):
+        first = err.errors()[0]
+        msg = f'{".".join(map(str, first["loc"])) or "body"}: {first["msg"]}'
+    else:
+        msg = str(err)
+    return {"resourceType": "OperationOutcome",
+            "issue": [{"severity": "error", "code": "invalid", "diagnostics": f"input line {line}: {msg}"}]}
+
+def _parse(model: type[M], line: int, raw) -> M | dict:
+    try:
+        return model.model_validate_json(raw) if isinstance(raw, (bytes, str)) else model.model_validate(raw)
+    except ValueError as e:  # ValidationError included
+        return outcome(line, e)
+
+def is_ndjson(request: Request) -> bool:
+    return request.headers.get("content-type", "").split(";")[0].strip() in NDJSON_IN
+
+async def spool_body(request: Request):
+    """The request body in a SpooledTemporaryFile, rewound; read before the response streams."""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+async def _ndjson_items(spool, model: type[M]) -> AsyncIterator[M | dict]:
+    with spool:
+        for n, raw in enumerate(spool, 1):
+            if raw.strip():
+                yield _parse(model, n, raw)
+
+async def _list_items(items: list, model: type[M]) -> AsyncIterator[M | dict]:
+    for n, raw in enumerate(items, 1):
+        yield _parse(model, n, raw)
+
+async def read_items(request: Request, model: type[M], key: str = "items") -> AsyncIterator[M | dict]:
+    """Request items, one at a time: an NDJSON body line by line, or a JSON body {key: [...]}.
+    Both are read before the response starts, so a malformed JSON body is still a plain 422;
+    NDJSON lines that don't validate come through as OperationOutcome dicts."""
+    if is_ndjson(request):
+        return _ndjson_items(await spool_body(request), model)
+    try:
+        items = orjson.loads(await request.body())[key]
+    except (orjson.JSONDecodeError, KeyError, TypeError):
+        raise HTTPException(422, f'expected {{"{key}": [...]}} or an application/x-ndjson body')
+    if not isinstance(items, list):
+        raise HTTPException(422, f'"{key}" must be a list')
+    return _list_items(items, model)
+
+async def batched(items: AsyncIterable, size: int) -> AsyncIterator[list]:
+    batch = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+async def ndjson_stream(objs: AsyncIterable[dict]) -> AsyncIterator[bytes]:
+    buf = bytearray()
+    async for obj in objs:
+        buf += orjson.dumps(obj)
+        buf += b"\n"
+        if len(buf) >= CHUNK_BYTES:
+            yield bytes(buf)
+            buf.clear()
+    if buf:
+        yield bytes(buf)
+
+async def csv_stream(header: list[str], rows: AsyncIterable[Iterable]) -> AsyncIterator[bytes]:
+    out = io.StringIO()
+    w = csv.writer(out, lineterminator="\n")
+    w.writerow(header)
+    async for row in rows:
+        w.writerow(row)
+        if out.tell() >= CHUNK_BYTES:
+            yield out.getvalue().encode()
+            out.seek(0)
+            out.truncate()
+    if out.tell():
+        yield out.getvalue().encode()
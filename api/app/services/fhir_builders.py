@@ -1,30 +1,30 @@
 # build FHIR bundle here
 from fhir.resources.bundle import Bundle
-from fhir.resources.patient import Patient
-from fhir.resources.encounter import Encounter
-from fhir.resources.condition import Condition
-from fhir.resources.procedure import Procedure
-from fhir.resources.codeableconcept import CodeableConcept
-from fhir.resources.coding import Coding
 
 ICD_SYSTEM = "http://id.who.int/icd/release/11"
 
-def cc(code:str, display:str, system:str=ICD_SYSTEM):
-    return CodeableConcept.construct(coding=[Coding.construct(system=system, code=code, display=display)], text=display)
+# Bundles as plain dicts for the exports; a `scope` (patient id) prefixes resource ids
+def _coded(rtype: str, rid: str, subject: dict, c) -> dict:
+    return {"resourceType": rtype, "id": rid, "code": {"coding": [{"system": ICD_SYSTEM, "code": c.code, "display": c.display}],
+                                                      "text": c.display}, "subject": subject}
 
-def build_bundle(req) -> Bundle:
-    pat = Patient.construct(id=req.patient.id or "pat1", name=[{"text": req.patient.name}], gender=req.patient.gender, birthDate=req.patient.birthDate)
-    enc = Encounter.construct(id="enc1", subject={"reference": f"Patient/{pat.id}"})
+def bundle_resources(req, scope: str = "") -> list[dict]:
+    pid = req.patient.id or (scope or "pat1")
+    pre = f"{pid}-" if scope else ""
+    pat = {"resourceType": "Patient", "id": pid, "name": [{"text": req.patient.name}]}
+    if req.patient.gender is not None:
+        pat["gender"] = req.patient.gender
+    if req.patient.birthDate is not None:
+        pat["birthDate"] = req.patient.birthDate
+    subject = {"reference": f"Patient/{pid}"}
+    out = [pat, {"resourceType": "Encounter", "id": f"{pre}enc1", "subject": subject}]
+    out += [_coded("Condition", f"{pre}cond{i}", subject, c) for i, c in enumerate(req.conditions or [])]
+    out += [_coded("Procedure", f"{pre}proc{j}", subject, p) for j, p in enumerate(req.procedures or [])]
+    return out
 
-    entries = [{"resource": pat}, {"resource": enc}]
-    for i, c in enumerate(getattr(req, "conditions", []) or []):
-        cond = Condition.construct(id=f"cond{i}", subject={"reference": f"Patient/{pat.id}"}, code=cc(c.code, c.display))
-        entries.append({"resource": cond})
-    for j, p in enumerate(getattr(req, "procedures", []) or []):
-        proc = Procedure.construct(id=f"proc{j}", subject={"reference": f"Patient/{pat.id}"}, code=cc(p.code, p.display))
-        entries.append({"resource": proc})
-
-    return Bundle.construct(type="collection", entry=entries)
+def bundle_dict(req, scope: str = "") -> dict:
+    return {"resourceType": "Bundle", "type": "collection",
+            "entry": [{"resource": r} for r in bundle_resources(req, scope)]}
 
 def summarize_bundle(b: Bundle) -> dict:
     counts = {"Patient":0,"Encounter":0,"Condition":0,"Procedure":0}
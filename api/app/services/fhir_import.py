@@ -0,0 +1,159 @@
+# fast-path FHIR import: structural checks + batched ICD-11 Coding validation
+import asyncio, re
+from fhir.resources import get_fhir_model_class
+from app.services.codeset import CodeSet
+from app.services.icd_repo import AsyncICDRepo
+from app.services.term_index import ICD_SYSTEM
+from app.services.validators import avalidate_codes
+
+RESOURCE_TYPE = re.compile(r"^[A-Z][A-Za-z]{1,63}$")
+FHIR_ID = re.compile(r"^[A-Za-z0-9\-.]{1,64}$")
+REFERENCE = re.compile(r"^(?:[A-Z][A-Za-z]+/[A-Za-z0-9\-.]{1,64}(?:/_history/[A-Za-z0-9\-.]{1,64})?"
+                       r"|urn:(?:uuid|oid):\S+|#\S*|https?://\S+)$")
+BUNDLE_TYPES = {"document", "message", "transaction", "transaction-response", "batch", "batch-response",
+                "history", "searchset", "collection", "subscription-notification"}
+
+class ImportReport:
+    def __init__(self, max_errors: int):
+        self.max_errors = max_errors
+        self.summary = {"Patient": 0, "Encounter": 0, "Condition": 0, "Procedure": 0}
+        self.entries = 0
+        self.codings = {"checked": 0, "icd": 0, "invalid": 0}
+        self.errors: list[dict] = []
+        self.error_count = 0
+
+    def error(self, entry: int | None, resource: dict | None, path: str, message: str) -> None:
+        r = resource if isinstance(resource, dict) else {}
+        self.error_at(entry, r.get("resourceType"), r.get("id"), path, message)
+
+    def error_at(self, entry: int | None, rtype, rid, path: str, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"entry": entry, "resourceType": rtype, "id": rid, "path": path, "message": message})
+
+    def as_dict(self) -> dict:
+        # Coding errors arrive at flush time: order by entry, Bundle-level first (stable within an entry)
+        errors = sorted(self.errors, key=lambda e: -1 if e["entry"] is None else e["entry"])
+        return {"valid": self.error_count == 0, "summary": self.summary, "entries": self.entries,
+                "codings": self.codings, "errorCount": self.error_count, "errors": errors,
+                "errorsTruncated": self.error_count > len(self.errors)}
+
+class BundleImporter:
+    """Feed resources (or whole Bundles) in; `finish()` flushes the pending Coding checks and
+    returns the report. ICD codes are validated in one call per `batch_size` pending usages."""
+    def __init__(self, repo: AsyncICDRepo | None, codes: CodeSet | None, full: bool = False,
+                 batch_size: int = 5000, max_errors: int = 1000):
+        self.repo = repo
+        self.codes = codes
+        self.full = full
+        self.batch_size = batch_size
+        self.report = ImportReport(max_errors)
+        self._pending: dict[str, list[tuple]] = {}  # ICD code -> (entry, resourceType, id, path) usages
+        self._pending_n = 0
+
+    async def add_bundle(self, bundle, line: int | None = None) -> None:
+        """A whole Bundle; errors are located by entry index, or by `line` for NDJSON input."""
+        if not isinstance(bundle, dict) or bundle.get("resourceType") != "Bundle":
+            self.report.error(None, bundle, "", "expected a Bundle resource")
+            return
+        if bundle.get("type") not in BUNDLE_TYPES:
+            self.report.error(None, bundle, "type", f"invalid Bundle.type: {bundle.get('type')!r}")
+        entries = bundle.get("entry") or []
+        if not isinstance(entries, list):
+            self.report.error(None, bundle, "entry", "Bundle.entry must be a list")
+            return
+        for i, e in enumerate(entries):
+            if not isinstance(e, dict) or not isinstance(e.get("resource"), dict):
+                self.report.entries += 1
+                self.report.error(i if line is None else line, None, f"entry[{i}]", "entry without a resource object")
+                continue
+            await self.add(e["resource"], i if line is None else line, f"entry[{i}].resource")
+
+    async def add(self, resource: dict, entry: int, path: str = "") -> None:
+        rep = self.report
+        rep.entries += 1
+        rtype = resource.get("resourceType")
+        if not isinstance(rtype, str) or not RESOURCE_TYPE.match(rtype):
+            rep.error(entry, resource, _join(path, "resourceType"), "missing or invalid resourceType")
+            return
+        rep.summary[rtype] = rep.summary.get(rtype, 0) + 1
+        rid = resource.get("id")
+        # the model checks the id itself; reference format it doesn't, so _walk always does
+        if not self.full and rid is not None and not (isinstance(rid, str) and FHIR_ID.match(rid)):
+            rep.error(entry, resource, _join(path, "id"), f"invalid id: {rid!r}")
+        self._walk(resource, entry, resource, path)
+        if self.full:
+            self._validate_model(rtype, resource, entry, path)
+        if self._pending_n >= self.batch_size:
+            await self._flush()
+        elif rep.entries % 500 == 0:
+            await asyncio.sleep(0)  # let other requests in between chunks of a big import
+
+    def _walk(self, node, entry: int, resource: dict, path: str) -> None:
+        # one pass over the resource: references and Codings wherever they appear
+        for k, v in node.items():
+            p = _join(path, k)
+            if k == "reference" and isinstance(v, str):
+                if not REFERENCE.match(v):
+                    self.report.error(entry, resource, p, f"malformed reference: {v!r}")
+            elif k == "coding" and isinstance(v, list):
+                for i, c in enumerate(v):
+                    self._coding(c, entry, resource, f"{p}[{i}]")
+            elif isinstance(v, dict):
+                self._walk(v, entry, resource, p)
+            elif isinstance(v, list):
+                for i, item in enumerate(v):
+                    if isinstance(item, dict):
+                        self._walk(item, entry, resource, f"{p}[{i}]")
+
+    def _coding(self, c, entry: int, resource: dict, path: str) -> None:
+        rep = self.report
+        rep.codings["checked"] += 1
+        if not isinstance(c, dict):
+            rep.error(entry, resource, path, "Coding must be an object")
+            return
+        code, system = c.get("code"), c.get("system")
+        if not isinstance(code, str) or not code.strip():
+            rep.error(entry, resource, path, "Coding without a code")
+            return
+        if system is not None and not isinstance(system, str):
+            rep.error(entry, resource, _join(path, "system"), "Coding.system must be a string")
+        if c.get("display") is not None and not isinstance(c["display"], str):
+            rep.error(entry, resource, _join(path, "display"), "Coding.display must be a string")
+        if system == ICD_SYSTEM:
+            rep.codings["icd"] += 1
+            self._pending.setdefault(code, []).append((entry, resource.get("resourceType"), resource.get("id"), path))
+            self._pending_n += 1
+
+    def _validate_model(self, rtype: str, resource: dict, entry: int, path: str) -> None:
+        try:
+            model = get_fhir_model_class(rtype)
+        except KeyError:
+            self.report.error(entry, resource, _join(path, "resourceType"), f"unknown resourceType: {rtype}")
+            return
+        try:
+            model.parse_obj(resource)
+        except ValueError as e:  # pydantic ValidationError included
+            errors = e.errors() if hasattr(e, "errors") else [{"loc": (), "msg": str(e)}]
+            for err in errors:
+                loc = ".".join(map(str, err["loc"]))
+                self.report.error(entry, resource, _join(path, loc), err["msg"])
+
+    async def _flush(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending, self._pending_n = self._pending, {}, 0
+        codes = list(pending)
+        results = await avalidate_codes(self.repo, codes, self.codes)
+        for code, (ok, _title, _lin) in zip(codes, results):
+            if not ok:
+                for entry, rtype, rid, path in pending[code]:
+                    self.report.codings["invalid"] += 1
+                    self.report.error_at(entry, rtype, rid, _join(path, "code"), f"unknown ICD-11 code: {code}")
+
+    async def finish(self) -> dict:
+        await self._flush()
+        return self.report.as_dict()
+
+def _join(path: str, key: str) -> str:
+    return f"{path}.{key}" if path and key else path or key
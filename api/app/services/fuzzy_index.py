@@ -0,0 +1,132 @@
+# typo/transliteration tolerant matching: SymSpell-style deletion index over folded tokens
+import heapq
+from array import array
+from typing import Container, Iterable
+from app.services.snapshot import Snapshot, SnapshotWriter, Table
+from app.services.textnorm import tokenize, fold_translit
+from app.services.term_index import ICD_SYSTEM
+
+TITLE_WEIGHT = 1.0
+SYNONYM_WEIGHT = 0.9
+MAX_DISTANCE = 2
+PREFIX_LEN = 7  # deletes are generated over the first N chars only (bounded index size)
+
+def max_distance(token: str) -> int:
+    return 0 if len(token) < 3 else 1 if len(token) <= 5 else MAX_DISTANCE
+
+def _deletes(word: str, depth: int) -> set[str]:
+    out = {word}
+    frontier = {word}
+    for _ in range(depth):
+        nxt = set()
+        for w in frontier:
+            for i in range(len(w)):
+                nxt.add(w[:i] + w[i + 1:])
+        out |= nxt
+        frontier = nxt
+    return out
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance; returns limit + 1 as soon as it is exceeded."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2: list[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            v = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                v = min(v, prev2[j - 2] + 1)
+            cur[j] = v
+            row_min = min(row_min, v)
+        if row_min > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+class FuzzyIndex:
+    """Candidates come from shared delete-variants, so a lookup touches only the
+    handful of vocabulary words within edit distance, never every concept."""
+
+    def __init__(self):
+        self.docs: list[tuple[str, str, str | None]] = []
+        self.words: list[str] = []
+        self.word_docs: list[tuple[array, array]] = []
+        self.deletes: dict[str, array] = {}
+
+    def __len__(self):
+        return len(self.docs)
+
+    @classmethod
+    def build(cls, concepts: Iterable[dict]) -> "FuzzyIndex":
+        idx = cls()
+        vocab: dict[str, dict[int, float]] = {}
+        for c in concepts:
+            if not c.get("code"):
+                continue
+            doc_id = len(idx.docs)
+            idx.docs.append((c["code"], c.get("title") or "", c.get("linearization")))
+            terms = [(c.get("title"), TITLE_WEIGHT)] + [(s, SYNONYM_WEIGHT) for s in c.get("synonyms") or []]
+            for term, w in terms:
+                for t in tokenize(term):
+                    d = vocab.setdefault(fold_translit(t), {})
+                    if w > d.get(doc_id, 0.0):
+                        d[doc_id] = w
+
+        deletes: dict[str, list[int]] = {}
+        for word_id, (word, per_doc) in enumerate(vocab.items()):
+            idx.words.append(word)
+            idx.word_docs.append((array("i", per_doc.keys()), array("f", per_doc.values())))
+            for v in _deletes(word[:PREFIX_LEN], MAX_DISTANCE):
+                deletes.setdefault(v, []).append(word_id)
+        idx.deletes = {k: array("i", v) for k, v in deletes.items()}
+        return idx
+
+    def write(self, w: SnapshotWriter) -> None:
+        w.strings("fuzzy.words", self.words)
+        w.groups("fuzzy.word_docs", None, self.word_docs, "if")
+        w.groups("fuzzy.deletes", self.deletes.keys(), self.deletes.values(), "i")
+
+    @classmethod
+    def from_snapshot(cls, snap: Snapshot, docs: Table) -> "FuzzyIndex":
+        idx = cls()
+        idx.docs, idx.words = docs, snap.strings("fuzzy.words")
+        idx.word_docs, idx.deletes = snap.groups("fuzzy.word_docs"), snap.groups("fuzzy.deletes")
+        return idx
+
+    def lookup(self, token: str) -> list[tuple[int, int]]:
+        """(word_id, distance) for vocabulary words within the token's edit budget."""
+        q = fold_translit(token)
+        limit = max_distance(q)
+        seen: set[int] = set()
+        out = []
+        for v in _deletes(q[:PREFIX_LEN], limit):
+            for word_id in self.deletes.get(v, ()):
+                if word_id in seen:
+                    continue
+                seen.add(word_id)
+                d = edit_distance(q, self.words[word_id], limit)
+                if d <= limit:
+                    out.append((word_id, d))
+        return out
+
+    def search(self, text: str, top_k: int = 10, members: Container[str] | None = None) -> list[dict]:
+        acc: dict[int, float] = {}
+        for t in set(tokenize(text)):
+            best: dict[int, float] = {}
+            for word_id, d in self.lookup(t):
+                sim = 1.0 - d / (len(t) + 1)
+                for doc_id, w in zip(*self.word_docs[word_id]):
+                    if sim * w > best.get(doc_id, 0.0):
+                        best[doc_id] = sim * w
+            for doc_id, s in best.items():
+                acc[doc_id] = acc.get(doc_id, 0.0) + s
+        items = acc.items() if members is None else ((d, s) for d, s in acc.items() if self.docs[d][0] in members)
+        out = []
+        for doc_id, s in heapq.nlargest(top_k, items, key=lambda kv: kv[1]):
+            code, display, lin = self.docs[doc_id]
+            out.append({"code": code, "display": display, "system": ICD_SYSTEM, "score": round(s, 4), "linearization": lin})
+        return out
@@ -1,33 +1,76 @@
 # ICD repo logic
 from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlalchemy import text
 
 class ICDRepo:
     def __init__(self, engine: Engine):
+        # tables are created by app.migrations, not per instance
         self.engine = engine
-        self._ensure_tables()
-
-    def _ensure_tables(self):
-        with self.engine.begin() as cx:
-            cx.exec_driver_sql("""
-            CREATE TABLE IF NOT EXISTS icd_concept(
-              id TEXT PRIMARY KEY,
-              code TEXT,
-              title TEXT,
-              definition TEXT,
-              linearization TEXT,
-              last_updated TEXT
-            );""")
-            cx.exec_driver_sql("""
-            CREATE TABLE IF NOT EXISTS icd_synonym(
-              concept_id TEXT,
-              term TEXT,
-              lang TEXT,
-              weight REAL DEFAULT 1.0
-            );""")
 
     def get(self, code: str):
         with self.engine.begin() as cx:
             row = cx.exec_driver_sql("SELECT id, code, title, definition, linearization FROM icd_concept WHERE code=:c", {"c":code}).fetchone()
             if not row: return None
             return {"id": row[0], "code": row[1], "title": row[2], "definition": row[3], "linearization": row[4]}
+
+    def get_many(self, codes: list[str], chunk: int = 500) -> dict[str, dict]:
+        out: dict[str, dict] = {}
+        uniq = list(dict.fromkeys(codes))
+        with self.engine.begin() as cx:
+            for i in range(0, len(uniq), chunk):
+                part = uniq[i:i + chunk]
+                marks = ",".join(f":c{j}" for j in range(len(part)))
+                rows = cx.exec_driver_sql(
+                    f"SELECT id, code, title, definition, linearization FROM icd_concept WHERE code IN ({marks})",
+                    {f"c{j}": c for j, c in enumerate(part)}).fetchall()
+                for r in rows:
+                    out[r[1]] = {"id": r[0], "code": r[1], "title": r[2], "definition": r[3], "linearization": r[4]}
+        return out
+
+    def iter_concepts(self) -> list[dict]:
+        """All concepts with their synonym terms, for building the in-process indexes."""
+        with self.engine.begin() as cx:
+            rows = cx.exec_driver_sql("SELECT id, code, title, definition, linearization FROM icd_concept").fetchall()
+            syns = cx.exec_driver_sql("SELECT concept_id, term FROM icd_synonym").fetchall()
+        by_id: dict[str, list[str]] = {}
+        for cid, term in syns:
+            if term:
+                by_id.setdefault(cid, []).append(term)
+        return [{
+            "id": r[0], "code": r[1], "title": r[2], "definition": r[3], "linearization": r[4],
+            "synonyms": by_id.get(r[0], []),
+        } for r in rows]
+
+class AsyncICDRepo:
+    """Request-path lookups on the async engine (aiosqlite/asyncpg). Bulk loading for the
+    in-process indexes stays on ICDRepo.iter_concepts, which runs in the warm-up/watcher threads."""
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+
+    async def get(self, code: str):
+        async with self.engine.connect() as cx:
+            row = (await cx.execute(text(
+                "SELECT id, code, title, definition, linearization FROM icd_concept WHERE code=:c"), {"c": code})).fetchone()
+        if not row: return None
+        return {"id": row[0], "code": row[1], "title": row[2], "definition": row[3], "linearization": row[4]}
+
+    async def get_many(self, codes: list[str], chunk: int = 500) -> dict[str, dict]:
+        out: dict[str, dict] = {}
+        uniq = list(dict.fromkeys(codes))
+        async with self.engine.connect() as cx:
+            for i in range(0, len(uniq), chunk):
+                part = uniq[i:i + chunk]
+                marks = ",".join(f":c{j}" for j in range(len(part)))
+                rows = (await cx.execute(text(
+                    f"SELECT id, code, title, definition, linearization FROM icd_concept WHERE code IN ({marks})"),
+                    {f"c{j}": c for j, c in enumerate(part)})).fetchall()
+                for r in rows:
+                    out[r[1]] = {"id": r[0], "code": r[1], "title": r[2], "definition": r[3], "linearization": r[4]}
+        return out
+
+    async def like_titles(self, q: str, limit: int) -> list:
+        async with self.engine.connect() as cx:
+            return (await cx.execute(text("SELECT code, title FROM icd_concept WHERE title LIKE :q LIMIT :k"),
+                                     {"q": f"%{q}%", "k": limit})).fetchall()
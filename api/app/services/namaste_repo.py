@@ -1 +1,100 @@
-# NAMASTE mapping logic
\ No newline at end of file
+# NAMASTE mapping logic
+import logging
+from array import array
+from typing import NamedTuple
+from sqlalchemy.engine import Engine
+from app.services.corpus import Reloadable
+from app.services.snapshot import Groups, Snapshot, SnapshotWriter, Table
+from app.services.textnorm import normalize
+
+log = logging.getLogger(__name__)
+
+class Mapping(NamedTuple):
+    icd_code: str
+    confidence: float
+    notes: str | None
+    namaste_term: str
+    namaste_code: str | None
+
+class MappingTable:
+    """Immutable multimap: NAMASTE code / normalized term -> mappings by descending confidence."""
+
+    def __init__(self, rows: list[Mapping] | None = None):
+        by_code: dict[str, list[Mapping]] = {}
+        by_term: dict[str, list[Mapping]] = {}
+        for m in rows or []:
+            if m.namaste_code:
+                by_code.setdefault(m.namaste_code.upper(), []).append(m)
+            if m.namaste_term:
+                by_term.setdefault(normalize(m.namaste_term), []).append(m)
+        key = lambda m: (-m.confidence, m.icd_code)
+        self.by_code = {k: tuple(sorted(v, key=key)) for k, v in by_code.items()}
+        self.by_term = {k: tuple(sorted(v, key=key)) for k, v in by_term.items()}
+        self.rows = rows or []
+        self.size = len(self.rows)
+
+    def write(self, w: SnapshotWriter) -> None:
+        w.strings("namaste.icd_code", (m.icd_code for m in self.rows))
+        w.array("namaste.confidence", array("d", (float(m.confidence) for m in self.rows)))
+        w.strings("namaste.notes", (m.notes for m in self.rows))
+        w.strings("namaste.namaste_term", (m.namaste_term for m in self.rows))
+        w.strings("namaste.namaste_code", (m.namaste_code for m in self.rows))
+        ordinal = {id(m): i for i, m in enumerate(self.rows)}
+        for name, groups in (("by_code", self.by_code), ("by_term", self.by_term)):
+            w.groups(f"namaste.{name}", groups.keys(), ([ordinal[id(m)] for m in ms] for ms in groups.values()), "i")
+
+    @classmethod
+    def from_snapshot(cls, snap: Snapshot) -> "MappingTable":
+        rows = Table((snap.strings("namaste.icd_code"), snap.array("namaste.confidence"), snap.strings("namaste.notes"),
+                      snap.strings("namaste.namaste_term"), snap.strings("namaste.namaste_code")))
+        table = cls()
+        table.by_code = _MappedGroups(snap.groups("namaste.by_code"), rows)
+        table.by_term = _MappedGroups(snap.groups("namaste.by_term"), rows)
+        table.rows, table.size = rows, len(rows)
+        return table
+
+    def lookup(self, code: str | None = None, term: str | None = None) -> tuple[Mapping, ...]:
+        if code:
+            hit = self.by_code.get(code.strip().upper())
+            if hit:
+                return hit
+        if term:
+            return self.by_term.get(normalize(term), ())
+        return ()
+
+class _MappedGroups:
+    """by_code / by_term of a mapped table: row ordinals per key, materialized on lookup."""
+
+    def __init__(self, groups: Groups, rows: Table):
+        self.groups, self.rows = groups, rows
+
+    def get(self, key: str, default=None):
+        ids = self.groups.get(key)
+        return default if ids is None else tuple(Mapping(*self.rows[i]) for i in ids)
+
+class NamasteRepo(Reloadable):
+    """Serves namaste_map from memory; reloaded whenever ingest bumps the 'namaste' version."""
+
+    version_name = "namaste"
+
+    def __init__(self, engine: Engine, check_interval: float = 5.0, snapshot_dir: str = "", snapshot_keep: int = 3):
+        super().__init__(engine, check_interval, snapshot_dir, snapshot_keep)
+        self.table = MappingTable()
+
+    def _build(self) -> None:
+        with self.engine.begin() as cx:
+            rows = cx.exec_driver_sql(
+                "SELECT icd_code, confidence, notes, namaste_term, namaste_code FROM namaste_map WHERE icd_code IS NOT NULL"
+            ).fetchall()
+        # single reference swap: readers see either the old table or the new one
+        self.table = MappingTable([Mapping(r[0], r[1] if r[1] is not None else 0.0, r[2] or None, r[3] or "", r[4]) for r in rows])
+        log.info("namaste_map: %d mappings", self.table.size)
+
+    def _write(self, w: SnapshotWriter) -> None:
+        self.table.write(w)
+
+    def _map(self, snap: Snapshot) -> None:
+        self.table = MappingTable.from_snapshot(snap)
+
+    def translate(self, code: str | None = None, term: str | None = None) -> tuple[Mapping, ...]:
+        return self.table.lookup(code, term)
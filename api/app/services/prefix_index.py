@@ -0,0 +1,154 @@
+# typeahead index: sorted string table + parallel arrays, no per-node dicts
+import heapq
+from array import array
+from typing import Iterable
+from app.services.snapshot import Snapshot, SnapshotWriter, StringTable, Table
+from app.services.textnorm import normalize
+from app.services.term_index import ICD_SYSTEM
+
+TITLE_WEIGHT = 1.0
+SYNONYM_WEIGHT = 0.8
+INNER_WORD_FACTOR = 0.6  # entry starts mid-term ("disorder" in "vata disorder")
+HOT_PREFIX_LEN = 2       # top-k precomputed for prefixes up to this length
+HOT_TOP_K = 20
+
+def _weight(base: float, key: str) -> float:
+    # shorter terms first: "vata" before "vata dosha imbalance"
+    return base / (1.0 + 0.02 * len(key))
+
+class PrefixIndex:
+    """Normalized titles/synonyms (and their word suffixes) kept in one string
+    table (UTF-8 blob + offset array), sorted so a prefix is a contiguous range.
+    A max-tree over the weights yields a range's best entries without scanning it."""
+
+    def __init__(self):
+        self.docs: list[tuple[str, str, str | None]] = []  # code, display, linearization
+        self._keys = StringTable.build(())
+        self._doc = array("i")
+        self._weight = array("f")
+        self._tree = array("i", [-1, -1])  # heap layout: node -> entry with the subtree's max weight
+        self._hot: dict[str, tuple[array, array]] = {}  # prefix -> top docs, weights
+
+    def __len__(self):
+        return len(self._doc)
+
+    @classmethod
+    def build(cls, concepts: Iterable[dict]) -> "PrefixIndex":
+        idx = cls()
+        entries: dict[tuple[str, int], float] = {}
+        for c in concepts:
+            if not c.get("code"):
+                continue
+            doc_id = len(idx.docs)
+            idx.docs.append((c["code"], c.get("title") or "", c.get("linearization")))
+            terms = [(c.get("title"), TITLE_WEIGHT)] + [(s, SYNONYM_WEIGHT) for s in c.get("synonyms") or []]
+            for term, base in terms:
+                words = normalize(term).split()
+                for i in range(len(words)):
+                    key = " ".join(words[i:])
+                    w = _weight(base if i == 0 else base * INNER_WORD_FACTOR, key)
+                    if w > entries.get((key, doc_id), 0.0):
+                        entries[(key, doc_id)] = w
+
+        ordered = sorted(entries.items())
+        idx._keys = StringTable.build(key for (key, _), _ in ordered)
+        idx._doc = array("i", (doc_id for (_, doc_id), _ in ordered))
+        idx._weight = array("f", (w for _, w in ordered))
+        idx._tree = _max_tree(idx._weight)
+
+        hot: dict[str, dict[int, float]] = {}
+        for (key, d), w in ordered:
+            for n in range(1, min(HOT_PREFIX_LEN, len(key)) + 1):
+                best = hot.setdefault(key[:n], {})
+                if w > best.get(d, 0.0):
+                    best[d] = w
+        for p, best in hot.items():
+            top = heapq.nlargest(HOT_TOP_K, best.items(), key=lambda kv: kv[1])
+            idx._hot[p] = (array("i", (d for d, _ in top)), array("f", (w for _, w in top)))
+        return idx
+
+    def write(self, w: SnapshotWriter) -> None:
+        w.strings("prefix.keys", self._keys)
+        w.array("prefix.doc", self._doc)
+        w.array("prefix.weight", self._weight)
+        w.array("prefix.tree", self._tree)
+        w.groups("prefix.hot", self._hot.keys(), self._hot.values(), "if")
+
+    @classmethod
+    def from_snapshot(cls, snap: Snapshot, docs: Table) -> "PrefixIndex":
+        idx = cls()
+        idx.docs, idx._keys, idx._hot = docs, snap.strings("prefix.keys"), snap.groups("prefix.hot")
+        idx._doc, idx._weight, idx._tree = snap.array("prefix.doc"), snap.array("prefix.weight"), snap.array("prefix.tree")
+        return idx
+
+    def _key(self, i: int) -> str:
+        return self._keys[i]
+
+    def _bounds(self, q: str) -> tuple[int, int]:
+        lo, hi = 0, len(self._doc)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < q:
+                lo = mid + 1
+            else:
+                hi = mid
+        end, hi = lo, len(self._doc)
+        while end < hi:
+            mid = (end + hi) // 2
+            if self._key(mid).startswith(q):
+                end = mid + 1
+            else:
+                hi = mid
+        return lo, end
+
+    def _top(self, lo: int, hi: int, top_k: int) -> list[tuple[int, float]]:
+        # best-first over the tree nodes covering [lo, hi): entries pop by descending weight
+        tree, weight, size = self._tree, self._weight, len(self._tree) // 2
+        heap, l, r = [], lo + size, hi + size
+        while l < r:
+            if l & 1:
+                heap.append((-weight[tree[l]], -l))
+                l += 1
+            if r & 1:
+                r -= 1
+                heap.append((-weight[tree[r]], -r))
+            l, r = l >> 1, r >> 1
+        heapq.heapify(heap)
+        best, seen = [], set()
+        while heap and len(best) < top_k:
+            w, node = heapq.heappop(heap)
+            node = -node  # deepest first among equal weights: ties reach a leaf without a wide sweep
+            if node >= size:
+                d = self._doc[node - size]
+                if d not in seen:
+                    seen.add(d)
+                    best.append((d, -w))
+                continue
+            for child in (2 * node, 2 * node + 1):
+                if tree[child] >= 0:
+                    heapq.heappush(heap, (-weight[tree[child]], -child))
+        return best
+
+    def complete(self, prefix: str, top_k: int = 10) -> list[dict]:
+        q = normalize(prefix)
+        if not q:
+            return []
+        if len(q) <= HOT_PREFIX_LEN and top_k <= HOT_TOP_K:
+            docs, weights = self._hot.get(q, ((), ()))
+            best = list(zip(docs[:top_k], weights[:top_k]))
+        else:
+            best = self._top(*self._bounds(q), top_k)
+        out = []
+        for doc_id, w in best:
+            code, display, lin = self.docs[doc_id]
+            out.append({"code": code, "display": display, "system": ICD_SYSTEM, "score": round(w, 4), "linearization": lin})
+        return out
+
+def _max_tree(weights) -> array:
+    size = 1 << max(len(weights) - 1, 0).bit_length()
+    tree = array("i", [-1]) * (2 * size)
+    tree[size:size + len(weights)] = array("i", range(len(weights)))
+    for node in range(size - 1, 0, -1):
+        a, b = tree[2 * node], tree[2 * node + 1]
+        tree[node] = a if b < 0 or (a >= 0 and weights[a] >= weights[b]) else b
+    return tree
@@ -0,0 +1,194 @@
+# on-demand profiling of a running worker, driven by /admin (app/routers/admin.py)
+import cProfile, json, os, sys, threading, time, tracemalloc
+from collections import Counter
+
+# leaf frames of threads that are waiting, not working (event loop select, idle pool threads, watchers)
+IDLE = {("selectors.py", "select"), ("threading.py", "wait")}
+
+Frame = tuple[str, str, int]  # file, qualified name, first line
+
+def _frame(code) -> Frame:
+    return code.co_filename, getattr(code, "co_qualname", code.co_name), code.co_firstlineno
+
+def speedscope(stacks: dict[str, Counter], interval: float, name: str) -> dict:
+    """One sampled profile per thread; stacks are root-first tuples of frames."""
+    frames: list[dict] = []
+    index: dict[Frame, int] = {}
+    profiles = []
+    for thread, counts in stacks.items():
+        samples, weights = [], []
+        for stack, n in counts.most_common():
+            ids = []
+            for f in stack:
+                if f not in index:
+                    index[f] = len(frames)
+                    frames.append({"name": f[1], "file": f[0], "line": f[2]})
+                ids.append(index[f])
+            samples.append(ids)
+            weights.append(round(n * interval * 1000, 3))
+        profiles.append({"type": "sampled", "name": thread, "unit": "milliseconds", "startValue": 0,
+                         "endValue": round(sum(weights), 3), "samples": samples, "weights": weights})
+    return {"$schema": "https://www.speedscope.app/file-format-schema.json", "name": name,
+            "exporter": "saarthi", "shared": {"frames": frames}, "profiles": profiles}
+
+def folded(stacks: dict[str, Counter]) -> str:
+    lines = []
+    for thread, counts in stacks.items():
+        for stack, n in counts.most_common():
+            names = ";".join(f"{f[1]} ({os.path.basename(f[0])}:{f[2]})" for f in stack)
+            lines.append(f"{thread};{names} {n}")
+    return "\n".join(lines) + "\n"
+
+class StackSampler:
+    """Statistical profiler over all threads of this process."""
+    def __init__(self):
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self.path: str | None = None
+        self.until = 0.0
+        self.samples = 0
+
+    @property
+    def active(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, path: str, seconds: float, interval: float, fmt: str = "speedscope", idle: bool = False) -> None:
+        if self.active:
+            raise RuntimeError("a sampling profile is already running")
+        self._stop.clear()
+        self.path, self.until, self.samples = path, time.time() + seconds, 0
+        self._thread = threading.Thread(target=self._run, args=(path, seconds, interval, fmt, idle),
+                                        name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()  # the thread still writes what it has
+
+    def _run(self, path: str, seconds: float, interval: float, fmt: str, idle: bool) -> None:
+        me = threading.get_ident()
+        names: dict[int, str] = {}
+        stacks: dict[str, Counter] = {}
+        deadline = time.monotonic() + seconds
+        while not self._stop.wait(interval) and time.monotonic() < deadline:
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame(frame.f_code))
+                    frame = frame.f_back
+                if not idle and (os.path.basename(stack[0][0]), stack[0][1].rsplit(".", 1)[-1]) in IDLE:
+                    continue
+                if tid not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stacks.setdefault(names.get(tid, str(tid)), Counter())[tuple(reversed(stack))] += 1
+            self.samples += 1
+        with open(path, "w", encoding="utf-8") as f:
+            if fmt == "folded":
+                f.write(folded(stacks))
+            else:
+                json.dump(speedscope(stacks, interval, os.path.basename(path)), f)
+
+class RequestProfiler:
+    """Decides which requests get a cProfile; used from the event loop thread only."""
+    def __init__(self):
+        self.until = 0.0
+        self.remaining = 0
+        self.written = 0
+        self._busy = False
+
+    def start(self, seconds: float, limit: int) -> None:
+        self.until, self.remaining = time.time() + seconds, limit
+
+    def stop(self) -> None:
+        self.until, self.remaining = 0.0, 0
+
+    @property
+    def window(self) -> bool:
+        return self.remaining > 0 and time.time() < self.until
+
+    def acquire(self, forced: bool) -> bool:
+        """True when this request should be profiled now; pair with release()."""
+        if self._busy or not (forced or self.window):
+            return False
+        self._busy = True
+        if not forced:
+            self.remaining -= 1
+        return True
+
+    def release(self, profiler: cProfile.Profile, path: str) -> None:
+        self._busy = False
+        profiler.dump_stats(path)
+        self.written += 1
+
+class AllocTracer:
+    """tracemalloc on demand; keeps the previous snapshot for diffs while tracing."""
+    # tracemalloc's own bookkeeping and import machinery would otherwise top every list
+    FILTERS = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"))
+
+    def __init__(self):
+        self._last: tracemalloc.Snapshot | None = None
+
+    @property
+    def active(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            self._last = None
+
+    def stop(self) -> None:
+        tracemalloc.stop()
+        self._last = None
+
+    def snapshot(self, path: str, top: int, key: str = "lineno") -> dict:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running")
+        snap = tracemalloc.take_snapshot().filter_traces(self.FILTERS)
+        snap.dump(path)
+        current, peak = tracemalloc.get_traced_memory()
+        out = {"file": os.path.basename(path), "traced_mb": round(current / 2**20, 2), "peak_mb": round(peak / 2**20, 2),
+               "top": [_stat(s, key) for s in snap.statistics(key)[:top]]}
+        if self._last is not None:
+            out["diff"] = [_stat(s, key) for s in snap.compare_to(self._last, key)[:top]]
+        self._last = snap
+        return out
+
+def _stat(s, key: str) -> dict:
+    # file:line only: traceback.format() would read sources through linecache, into the next snapshot
+    out = {"where": [str(f) for f in s.traceback] if key == "traceback" else str(s.traceback[0]),
+           "size_kb": round(s.size / 1024, 1), "count": s.count}
+    if hasattr(s, "size_diff"):  # StatisticDiff
+        out["size_diff_kb"] = round(s.size_diff / 1024, 1)
+        out["count_diff"] = s.count_diff
+    return out
+
+class Profiling:
+    """The three tools of one worker, writing into `directory`."""
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.sampler = StackSampler()
+        self.requests = RequestProfiler()
+        self.alloc = AllocTracer()
+
+    def path(self, kind: str, ext: str, label: str = "") -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        label = "".join(ch if ch.isalnum() else "_" for ch in label).strip("_")
+        name = "-".join(filter(None, (kind, str(os.getpid()), str(int(time.time() * 1000)), label)))
+        return os.path.join(self.directory, f"{name}.{ext}")
+
+    def files(self) -> list[dict]:
+        try:
+            entries = sorted(os.scandir(self.directory), key=lambda e: e.stat().st_mtime, reverse=True)
+        except OSError:
+            return []
+        return [{"name": e.name, "bytes": e.stat().st_size, "modified": round(e.stat().st_mtime)} for e in entries[:50]]
+
+    def status(self) -> dict:
+        s, r = self.sampler, self.requests
+        return {"pid": os.getpid(), "directory": os.path.abspath(self.directory),
+                "sampler": {"active": s.active, "file": s.path and os.path.basename(s.path),
+                            "until": round(s.until), "samples": s.samples},
+                "requests": {"window": r.window, "until": round(r.until), "remaining": r.remaining, "written": r.written},
+                "tracemalloc": {"active": self.alloc.active}, "files": self.files()}
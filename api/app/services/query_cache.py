@@ -0,0 +1,127 @@
+# two-tier cache for autocode/validate results: in-process LRU with TTL, then shared Redis
+import hashlib, logging, threading, time
+from collections import OrderedDict
+from typing import Any
+
+import orjson
+
+log = logging.getLogger(__name__)
+
+MISS = object()
+
+class LRUTTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return MISS
+            if item[0] < time.monotonic():
+                del self._data[key]
+                return MISS
+            self._data.move_to_end(key)
+            return item[1]
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+class QueryCache:
+    def __init__(self, local: LRUTTLCache, redis=None, ttl: float = 300.0, prefix: str = "saarthi:q",
+                 retry_after: float = 30.0):
+        self.local = local
+        self.redis = redis  # redis.asyncio client, or None for a local-only cache
+        self.ttl = ttl
+        self.prefix = prefix
+        self.retry_after = retry_after  # after a Redis error, skip the shared tier for this long
+        self._redis_down_until = 0.0
+        self.stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "redis_errors": 0}
+
+    def key(self, kind: str, version: int | str, *parts: Any) -> str:
+        """Versioned key: an ingest moves every worker to a fresh key space, no flush needed."""
+        digest = hashlib.blake2b(orjson.dumps(parts), digest_size=16).hexdigest()
+        return f"{self.prefix}:{kind}:v{version}:{digest}"
+
+    def _redis_usable(self) -> bool:
+        return self.redis is not None and time.monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, e: Exception) -> None:
+        self.stats["redis_errors"] += 1
+        self._redis_down_until = time.monotonic() + self.retry_after
+        log.warning("query cache: redis unavailable (%s); local tier only for %.0fs", e, self.retry_after)
+
+    async def get(self, key: str) -> Any:
+        value = self.local.get(key)
+        if value is not MISS:
+            self.stats["local_hits"] += 1
+            return value
+        if self._redis_usable():
+            try:
+                raw = await self.redis.get(key)
+            except Exception as e:
+                self._redis_failed(e)
+                raw = None
+            if raw is not None:
+                value = orjson.loads(raw)
+                self.local.put(key, value)
+                self.stats["redis_hits"] += 1
+                return value
+        self.stats["misses"] += 1
+        return MISS
+
+    async def put(self, key: str, value: Any) -> None:
+        self.local.put(key, value)
+        if self._redis_usable():
+            try:
+                await self.redis.set(key, orjson.dumps(value), ex=int(self.ttl))
+            except Exception as e:
+                self._redis_failed(e)
+
+    async def get_many(self, keys: list[str]) -> list[Any]:
+        """Batch lookup: local tier per key, then one MGET for the rest."""
+        out = [self.local.get(k) for k in keys]
+        self.stats["local_hits"] += sum(v is not MISS for v in out)
+        rest = [i for i, v in enumerate(out) if v is MISS]
+        if rest and self._redis_usable():
+            try:
+                raws = await self.redis.mget([keys[i] for i in rest])
+            except Exception as e:
+                self._redis_failed(e)
+                raws = [None] * len(rest)
+            for i, raw in zip(rest, raws):
+                if raw is not None:
+                    out[i] = orjson.loads(raw)
+                    self.local.put(keys[i], out[i])
+                    self.stats["redis_hits"] += 1
+        self.stats["misses"] += sum(v is MISS for v in out)
+        return out
+
+    async def put_many(self, items: list[tuple[str, Any]]) -> None:
+        for k, v in items:
+            self.local.put(k, v)
+        if items and self._redis_usable():
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for k, v in items:
+                        pipe.set(k, orjson.dumps(v), ex=int(self.ttl))
+                    await pipe.execute()
+            except Exception as e:
+                self._redis_failed(e)
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["local_hits"] + self.stats["redis_hits"] + self.stats["misses"]
+        hits = lookups - self.stats["misses"]
+        return {**self.stats, "lookups": lookups, "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+                "local_size": len(self.local), "local_maxsize": self.local.maxsize,
+                "redis": self.redis is not None and self._redis_usable()}
@@ -0,0 +1,90 @@
+# per-client rate limiting: GCRA in Redis (one EVALSHA per request), local fallback per worker
+import logging, math, threading, time
+from collections import OrderedDict
+from typing import NamedTuple
+
+log = logging.getLogger(__name__)
+
+# KEYS[1] bucket; ARGV emission interval ms, burst tolerance ms, cost -> {allowed, remaining, retry_after_ms, reset_ms}
+GCRA_LUA = """
+local t = redis.call('TIME')
+local now = t[1] * 1000 + t[2] / 1000
+local interval = tonumber(ARGV[1])
+local tau = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local new_tat = tat + interval * cost
+if new_tat - tau > now then
+  return {0, math.floor((tau - (tat - now)) / interval + 1e-6), math.ceil(new_tat - tau - now), math.ceil(tat - now)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil(new_tat - now) + 1)
+return {1, math.floor((tau - (new_tat - now)) / interval + 1e-6), 0, math.ceil(new_tat - now)}
+"""
+
+class Decision(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float  # seconds until this request would be admitted (0 when allowed)
+    reset: float  # seconds until the bucket is full again
+
+    def headers(self) -> dict[str, str]:
+        h = {"X-RateLimit-Limit": str(self.limit), "X-RateLimit-Remaining": str(max(self.remaining, 0)),
+             "X-RateLimit-Reset": str(math.ceil(self.reset))}
+        if not self.allowed:
+            h["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return h
+
+def _units(span: float, interval: float) -> int:
+    return math.floor(span / interval + 1e-6)  # 1.9999999 units left is 2
+
+class LocalBuckets:
+    """The same GCRA per key, in-process; bounded LRU so one-off clients don't accumulate."""
+    def __init__(self, maxsize: int = 100_000):
+        self.maxsize = maxsize
+        self._tat: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, interval: float, tau: float, cost: int) -> tuple[bool, int, float, float]:
+        with self._lock:
+            now = time.monotonic()
+            tat = max(self._tat.get(key, now), now)
+            new_tat = tat + interval * cost
+            if new_tat - tau > now:
+                return False, _units(tau - (tat - now), interval), new_tat - tau - now, tat - now
+            self._tat[key] = new_tat
+            self._tat.move_to_end(key)
+            while len(self._tat) > self.maxsize:
+                self._tat.popitem(last=False)
+            return True, _units(tau - (new_tat - now), interval), 0.0, new_tat - now
+
+class RateLimiter:
+    def __init__(self, rate: float, burst: int, redis=None, prefix: str = "saarthi:rl", retry_after: float = 30.0):
+        self.rate = rate  # units per second
+        self.burst = burst
+        self.redis = redis  # redis.asyncio client, or None for per-worker limits only
+        self.prefix = prefix
+        self.retry_after = retry_after  # after a Redis error, use local buckets for this long
+        self.local = LocalBuckets()
+        self._script = redis.register_script(GCRA_LUA) if redis is not None else None
+        self._redis_down_until = 0.0
+        self.stats = {"allowed": 0, "limited": 0, "redis_errors": 0}
+
+    async def hit(self, client: str, cost: int = 1) -> Decision:
+        cost = max(1, min(cost, self.burst))  # a request costing more than the burst could never pass
+        interval, tau = 1.0 / self.rate, self.burst / self.rate
+        res = None
+        if self._script is not None and time.monotonic() >= self._redis_down_until:
+            try:
+                allowed, remaining, retry_ms, reset_ms = await self._script(
+                    keys=[f"{self.prefix}:{client}"], args=[interval * 1000, tau * 1000, cost])
+                res = (bool(allowed), int(remaining), retry_ms / 1000, reset_ms / 1000)
+            except Exception as e:
+                self.stats["redis_errors"] += 1
+                self._redis_down_until = time.monotonic() + self.retry_after
+                log.warning("rate limit: redis unavailable (%s); per-worker limits for %.0fs", e, self.retry_after)
+        if res is None:
+            res = self.local.hit(client, interval, tau, cost)
+        self.stats["allowed" if res[0] else "limited"] += 1
+        return Decision(res[0], self.burst, res[1], res[2], res[3])
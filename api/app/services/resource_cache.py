@@ -0,0 +1,69 @@
+# mtime-invalidated cache of static FHIR resources, pre-serialized and pre-compressed
+import gzip, hashlib, threading, time
+from dataclasses import dataclass, field
+from pathlib import Path
+import orjson
+
+try:
+    import brotli  # optional: br variants are only offered when installed
+except ImportError:  # pragma: no cover
+    brotli = None
+
+@dataclass
+class CachedResource:
+    data: dict
+    body: bytes
+    etag: str  # strong validator of the identity encoding; variants append "-gzip"/"-br"
+    variants: dict[str, bytes] = field(default_factory=dict)
+    mtime_ns: int = 0
+    size: int = 0
+
+    @classmethod
+    def from_obj(cls, obj: dict, mtime_ns: int = 0, size: int = 0) -> "CachedResource":
+        body = orjson.dumps(obj)
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        variants = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants["br"] = brotli.compress(body, quality=11)
+        return cls(obj, body, etag, variants, mtime_ns, size)
+
+class ResourceCache:
+    """Parses each JSON file once; afterwards a hit costs at most one stat()
+    per check_interval seconds to notice edits on disk."""
+
+    def __init__(self, check_interval: float = 1.0):
+        self.check_interval = check_interval
+        self._entries: dict[Path, tuple[CachedResource, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: Path) -> CachedResource | None:
+        hit = self._entries.get(path)
+        now = time.monotonic()
+        if hit is not None and now - hit[1] < self.check_interval:
+            return hit[0]
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            self._entries.pop(path, None)
+            return None
+        if hit is not None and (hit[0].mtime_ns, hit[0].size) == (st.st_mtime_ns, st.st_size):
+            self._entries[path] = (hit[0], now)
+            return hit[0]
+        with self._lock:
+            res = CachedResource.from_obj(orjson.loads(path.read_bytes()), st.st_mtime_ns, st.st_size)
+            self._entries[path] = (res, now)
+        return res
+
+DATA_DIR = Path(__file__).resolve().parents[3] / "data"
+# deployed data first, then the seeds shipped with the repo
+VALUESET_DIRS = [DATA_DIR / "valuesets", DATA_DIR / "seeds" / "valusets"]
+CONCEPTMAP_DIRS = [DATA_DIR / "conceptmaps", DATA_DIR / "seeds" / "conceptmaps"]
+
+cache = ResourceCache()
+
+def find(dirs: list[Path], name: str) -> CachedResource | None:
+    for d in dirs:
+        res = cache.get(d / name)
+        if res is not None:
+            return res
+    return None
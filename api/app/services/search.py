@@ -1,53 +1,324 @@
-# search logic with ES
+# search logic with ES (sync SearchService, AsyncSearchService for async routes)
+import logging
 from typing import List
-from elasticsearch import Elasticsearch
+from elasticsearch import AsyncElasticsearch, Elasticsearch
 from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+from app.metrics import ES_FALLBACK, stage
+from app.services.corpus import Corpus
+from app.services.icd_repo import AsyncICDRepo
+from app.services.query_cache import MISS, QueryCache
+from app.services.textnorm import normalize
+from app.services.valueset_index import ValueSetIndex, ValueSetRegistry
+
+log = logging.getLogger(__name__)
+
+# (text, top_k, value_set, fuzzy, lang) — one entry of a batch autocode request
+Query = tuple[str, int, str | None, bool, str | None]
+
+# the only document fields _es_hits reads; synonyms/definition stay on the ES side
+ES_SOURCE = ["code", "title", "linearization"]
+LANG_BOOST = 1.5  # extra weight for synonyms in the requested language
+ES_MAX_TERMS = 65536  # ES index.max_terms_count: larger ValueSets can't be a terms filter and are searched locally
+
+def lang_key(lang: str | None) -> str | None:
+    """"en-GB" -> "en": the suffix of the synonyms_<lang> ES fields (as ingest_icd11_tm._lang_key)."""
+    key = "".join(ch for ch in (lang or "").split("-")[0].lower() if ch.isalpha())
+    return key or None
 
 class SearchService:
-    def __init__(self, es: Elasticsearch | None, index: str, engine: Engine):
+    def __init__(self, es: Elasticsearch | None, index: str, engine: Engine, corpus: Corpus | None = None,
+                 valuesets: ValueSetRegistry | None = None):
         self.es = es
         self.index = index
         self.engine = engine
+        self.corpus = corpus
+        self.valuesets = valuesets
 
-    def suggest(self, text: str, top_k: int = 10, value_set: str | None = None):
+    def suggest(self, text: str, top_k: int = 10, value_set: str | None = None, fuzzy: bool = False,
+                lang: str | None = None):
         text = (text or '').strip()
         if not text:
             return []
+        members = self._members(value_set)
 
         # Prefer Elasticsearch
-        if self.es is not None:
+        if self.es is not None and self._es_can_filter(members, "search"):
             try:
-                q = {
-                    "size": top_k,
-                    "query": {
-                        "multi_match": {
-                            "query": text,
-                            "fields": ["title^3","synonyms^2","definition"]
-                        }
-                    }
-                }
-                res = self.es.search(index=self.index, body=q)
-                out=[]
-                for hit in res["hits"]["hits"]:
-                    src = hit["_source"]
-                    out.append({
-                        "code": src.get("code"),
-                        "display": src.get("title"),
-                        "system": "http://id.who.int/icd/release/11",
-                        "score": hit.get("_score", 0.0),
-                        "linearization": src.get("linearization")
-                    })
+                with stage("search.es"):
+                    res = self.es.search(index=self.index, body=self._es_body(text, top_k, fuzzy, members, lang))
+                out = self._shape(res)
                 if out:
                     return out
-            except Exception:
-                pass
+                self._es_fallback("search", "empty")
+            except Exception as e:
+                self._es_fallback("search", "error", e)
+
+        # In-process index: primary engine when ES is disabled, fallback otherwise
+        local = self._local(text, top_k, members, fuzzy)
+        if local is not None:
+            return local
+
+        # Last resort: simple LIKE search on DB if no index is loaded
+        with stage("search.sql"):
+            return self._like(text, top_k, members)
+
+    def suggest_many(self, queries: List[Query]) -> list[list[dict] | Exception]:
+        """Batch form of suggest: one _msearch round-trip on ES, one shared postings
+        pass on the in-process index. Failures are returned in place, per item."""
+        results, members, pending = self._prepare(queries)
+        sent = [i for i in pending if self._es_can_filter(members[i], "msearch")] if self.es is not None else []
+        if sent:
+            try:
+                with stage("search.es"):
+                    res = self.es.msearch(searches=self._msearch_body(queries, members, sent))
+                self._take_msearch(res, results, sent)
+            except Exception as e:
+                self._es_fallback("msearch", "error", e, len(sent))
+            pending = [i for i in pending if results[i] is None]
+        pending = self._local_many(queries, members, results, pending)
+        for i in pending:
+            text, top_k, _vs, fuzzy, _lang = queries[i]
+            try:
+                local = self._local(text, top_k, members[i], fuzzy)
+                results[i] = local if local is not None else self._like(text.strip(), top_k, members[i])
+            except Exception as e:
+                results[i] = e
+        return results
+
+    # shared by SearchService and AsyncSearchService: everything except the I/O calls
+
+    def _es_fallback(self, op: str, reason: str, err: Exception | None = None, n: int = 1) -> None:
+        ES_FALLBACK.labels(op, reason).inc(n)
+        if err is not None:
+            log.debug("ES %s failed, falling back: %r", op, err)
+
+    def _es_can_filter(self, members: ValueSetIndex | None, op: str) -> bool:
+        if members is None or len(members) <= ES_MAX_TERMS:
+            return True
+        ES_FALLBACK.labels(op, "valueset_size").inc()
+        return False
+
+    def _shape(self, res) -> list[dict]:
+        with stage("search.shape"):
+            return self._es_hits(res)
+
+    def _local(self, text: str, top_k: int, members: ValueSetIndex | None, fuzzy: bool) -> list[dict] | None:
+        # no lang here: the in-process index does not keep synonym languages, so a language only boosts on ES
+        if not self._has_index():
+            return None
+        with stage("search.local"):
+            if fuzzy:
+                return self.corpus.fuzzy.search(text, top_k, members)
+            return self.corpus.term.search(text, top_k, members)
+
+    def _prepare(self, queries: List[Query]) -> tuple[list, list[ValueSetIndex | None], list[int]]:
+        results: list = [None] * len(queries)
+        members: list[ValueSetIndex | None] = [None] * len(queries)
+        pending = []
+        for i, (text, _k, value_set, _f, _lang) in enumerate(queries):
+            if not (text or '').strip():
+                results[i] = []
+                continue
+            try:
+                members[i] = self._members(value_set)
+                pending.append(i)
+            except LookupError as e:
+                results[i] = e
+        return results, members, pending
+
+    def _msearch_body(self, queries: List[Query], members: list, pending: list[int]) -> list[dict]:
+        searches = []
+        for i in pending:
+            text, top_k, _vs, fuzzy, lang = queries[i]
+            searches += [{"index": self.index}, self._es_body(text.strip(), top_k, fuzzy, members[i], lang)]
+        return searches
+
+    def _take_msearch(self, res, results: list, pending: list[int]) -> list[int]:
+        errors = 0
+        with stage("search.shape"):
+            for i, r in zip(pending, res["responses"]):
+                if "error" not in r:
+                    results[i] = self._es_hits(r) or None
+                else:
+                    errors += 1
+        left = [i for i in pending if results[i] is None]
+        if errors:
+            self._es_fallback("msearch", "error", n=errors)
+        if len(left) > errors:
+            self._es_fallback("msearch", "empty", n=len(left) - errors)
+        return left
+
+    def _local_many(self, queries: List[Query], members: list, results: list, pending: list[int]) -> list[int]:
+        """Exact queries in one postings pass; returns what is left (fuzzy, or no index loaded)."""
+        if not self._has_index():
+            return pending
+        exact = [i for i in pending if not queries[i][3]]
+        with stage("search.local_batch"):
+            batch = self.corpus.term.search_many([(queries[i][0], queries[i][1], members[i]) for i in exact])
+        for i, out in zip(exact, batch):
+            results[i] = out
+        return [i for i in pending if queries[i][3]]
+
+    def complete(self, prefix: str, top_k: int = 10):
+        if self.corpus is None:
+            return []
+        return self.corpus.prefix.complete(prefix, top_k)
+
+    def _has_index(self) -> bool:
+        return self.corpus is not None and len(self.corpus.term) > 0
 
-        # Fallback: simple LIKE search on DB if ES unavailable
+    def _members(self, value_set: str | None) -> ValueSetIndex | None:
+        if not value_set:
+            return None
+        idx = self.valuesets.get(value_set) if self.valuesets is not None else None
+        if idx is None:
+            raise LookupError(f"ValueSet not found: {value_set}")
+        return idx
+
+    def _es_body(self, text: str, top_k: int, fuzzy: bool, members: ValueSetIndex | None = None,
+                 lang: str | None = None) -> dict:
+        # dis_max: a hit scores by its best way of matching, plus a little for the others
+        words = {"query": text, "fields": ["title^3", "synonyms^2", "synonyms_*^2", "definition"]}
+        if fuzzy:
+            words["fuzziness"] = "AUTO"
+        query: dict = {"dis_max": {"tie_breaker": 0.3, "queries": [
+            {"multi_match": words},
+            {"multi_match": {"query": text, "fields": ["title.prefix^2", "synonyms.prefix", "synonyms_*.prefix"],
+                             "operator": "and"}},
+            {"multi_match": {"query": text, "fields": ["title.translit^2", "synonyms.translit", "synonyms_*.translit"]}},
+        ]}}
+        key = lang_key(lang)
+        if key is not None:
+            # the requested language's synonyms (reindex_es.py: synonyms_<lang>) rank a concept higher
+            query = {"bool": {"must": query, "should": {"multi_match": {
+                "query": text, "fields": [f"synonyms_{key}", f"synonyms_{key}.translit"], "boost": LANG_BOOST}}}}
+        body: dict = {"size": top_k, "_source": ES_SOURCE, "query": query}
+        if members is not None:
+            body["query"] = {"bool": {"must": query, "filter": {"terms": {"code": members.codes}}}}
+        return body
+
+    def _es_hits(self, res) -> list[dict]:
+        out = []
+        for hit in res["hits"]["hits"]:
+            src = hit["_source"]
+            out.append({
+                "code": src.get("code"),
+                "display": src.get("title"),
+                "system": "http://id.who.int/icd/release/11",
+                "score": hit.get("_score", 0.0),
+                "linearization": src.get("linearization")
+            })
+        return out
+
+    def _like(self, text: str, top_k: int, members: ValueSetIndex | None = None) -> list[dict]:
         with self.engine.begin() as cx:
             rows = cx.exec_driver_sql(
                 "SELECT code, title FROM icd_concept WHERE title LIKE :q LIMIT :k",
-                {"q": f"%{text}%", "k": top_k}
+                {"q": f"%{text}%", "k": top_k if members is None else top_k * 10}
             ).fetchall()
+        return self._like_hits(rows, top_k, members)
+
+    def _like_hits(self, rows, top_k: int, members: ValueSetIndex | None) -> list[dict]:
+        if members is not None:
+            rows = [r for r in rows if r[0] in members][:top_k]
         return [{
             "code": r[0], "display": r[1], "system": "http://id.who.int/icd/release/11", "score": 1.0
         } for r in rows]
+
+class AsyncSearchService(SearchService):
+    """SearchService for async handlers: ES and DB calls are awaited instead of holding
+    a threadpool worker. The in-process indexes are shared with the sync service.
+    Results go through the optional QueryCache, keyed by corpus version."""
+
+    def __init__(self, es: AsyncElasticsearch | None, index: str, repo: AsyncICDRepo, corpus: Corpus | None = None,
+                 valuesets: ValueSetRegistry | None = None, cache: QueryCache | None = None):
+        super().__init__(None, index, None, corpus, valuesets)
+        self.es = es
+        self.repo = repo
+        self.cache = cache
+
+    def _cache_key(self, text: str, top_k: int, members: ValueSetIndex | None, fuzzy: bool, lang: str | None) -> str:
+        version = self.corpus.cache_version if self.corpus is not None else -1
+        vs = members.resource.etag if members is not None else None
+        return self.cache.key("suggest", version, normalize(text), top_k, vs, fuzzy, lang_key(lang))
+
+    async def suggest(self, text: str, top_k: int = 10, value_set: str | None = None, fuzzy: bool = False,  # type: ignore[override]
+                      lang: str | None = None):
+        text = (text or '').strip()
+        if not text:
+            return []
+        members = self._members(value_set)
+        key = None
+        if self.cache is not None:
+            key = self._cache_key(text, top_k, members, fuzzy, lang)
+            with stage("search.cache"):
+                hit = await self.cache.get(key)
+            if hit is not MISS:
+                return hit
+        out = await self._suggest(text, top_k, members, fuzzy, lang)
+        if key is not None:
+            await self.cache.put(key, out)
+        return out
+
+    async def _suggest(self, text: str, top_k: int, members: ValueSetIndex | None, fuzzy: bool,
+                       lang: str | None = None) -> list[dict]:
+        if self.es is not None and self._es_can_filter(members, "search"):
+            try:
+                with stage("search.es"):
+                    res = await self.es.search(index=self.index, body=self._es_body(text, top_k, fuzzy, members, lang))
+                out = self._shape(res)
+                if out:
+                    return out
+                self._es_fallback("search", "empty")
+            except Exception as e:
+                self._es_fallback("search", "error", e)
+        if self._has_index():  # BM25F/fuzzy scoring is CPU work: off the event loop
+            return await run_in_threadpool(self._local, text, top_k, members, fuzzy)
+        return await self._alike(text, top_k, members)
+
+    async def suggest_many(self, queries: List[Query]) -> list[list[dict] | Exception]:  # type: ignore[override]
+        results, members, pending = self._prepare(queries)
+        keys: dict[int, str] = {}
+        if self.cache is not None and pending:
+            for i in pending:
+                text, top_k, _vs, fuzzy, lang = queries[i]
+                keys[i] = self._cache_key(text.strip(), top_k, members[i], fuzzy, lang)
+            with stage("search.cache"):
+                hits = await self.cache.get_many([keys[i] for i in pending])
+            for i, hit in zip(pending, hits):
+                if hit is not MISS:
+                    results[i] = hit
+            pending = [i for i in pending if results[i] is None]
+        computed = list(pending)
+
+        sent = [i for i in pending if self._es_can_filter(members[i], "msearch")] if self.es is not None else []
+        if sent:
+            try:
+                with stage("search.es"):
+                    res = await self.es.msearch(searches=self._msearch_body(queries, members, sent))
+                self._take_msearch(res, results, sent)
+            except Exception as e:
+                self._es_fallback("msearch", "error", e, len(sent))
+            pending = [i for i in pending if results[i] is None]
+        if pending and self._has_index():
+            # a large batch is a few ms of pure CPU; keep it off the event loop
+            pending = await run_in_threadpool(self._local_many, queries, members, results, pending)
+        for i in pending:
+            text, top_k, _vs, fuzzy, _lang = queries[i]
+            try:
+                if self._has_index():
+                    results[i] = await run_in_threadpool(self._local, text, top_k, members[i], fuzzy)
+                else:
+                    results[i] = await self._alike(text.strip(), top_k, members[i])
+            except Exception as e:
+                results[i] = e
+
+        if keys:
+            await self.cache.put_many([(keys[i], results[i]) for i in computed if not isinstance(results[i], Exception)])
+        return results
+
+    async def _alike(self, text: str, top_k: int, members: ValueSetIndex | None = None) -> list[dict]:
+        with stage("search.sql"):
+            rows = await self.repo.like_titles(text, top_k if members is None else top_k * 10)
+        return self._like_hits(rows, top_k, members)
@@ -0,0 +1,248 @@
+# versioned, read-only binary snapshots of the in-process terminology indexes, mmapped by workers
+# layout: MAGIC | u64 header offset | u64 header length | sections | header JSON
+import hashlib, json, logging, mmap, os, re, struct, sys, zlib
+from array import array
+from contextlib import suppress
+from typing import Iterable, Sequence
+
+log = logging.getLogger(__name__)
+
+MAGIC = b"SAARSNAP"
+FORMAT = 1
+HEAD = struct.Struct("<8sQQ")
+ALIGN = 8
+ITEMSIZE = {tc: array(tc).itemsize for tc in "BiIfd"}  # a snapshot is only read by a matching build
+
+class SnapshotError(Exception):
+    pass
+
+class StringTable:
+    """Strings by ordinal out of one UTF-8 blob, with optional crc32 hash slots for find()."""
+
+    def __init__(self, blob, offs, slots=None, nulls=None):
+        self.blob, self.offs, self.slots, self.nulls = blob, offs, slots, nulls
+
+    @classmethod
+    def build(cls, values: Iterable[str | None], index: bool = False) -> "StringTable":
+        blob, offs, nulls, raws = bytearray(), array("I", [0]), bytearray(), []
+        for v in values:
+            b = b"" if v is None else v.encode()
+            blob += b
+            offs.append(len(blob))
+            nulls.append(v is None)
+            raws.append(b)
+        slots = None
+        if index:
+            size = 1 << max(3, (2 * len(raws)).bit_length())  # load factor <= 1/2
+            mask, slots = size - 1, array("I", bytes(4 * size))
+            for i, b in enumerate(raws):
+                h = zlib.crc32(b) & mask
+                while slots[h] and raws[slots[h] - 1] != b:
+                    h = (h + 1) & mask
+                slots[h] = i + 1  # a repeated key resolves to its last ordinal
+        return cls(bytes(blob), offs, slots, nulls if any(nulls) else None)
+
+    def __len__(self):
+        return len(self.offs) - 1
+
+    def __getitem__(self, i: int) -> str | None:
+        if self.nulls is not None and self.nulls[i]:
+            return None
+        return str(self.blob[self.offs[i]:self.offs[i + 1]], "utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def find(self, key: str) -> int:
+        """Ordinal of `key`, or -1."""
+        b = key.encode()
+        mask = len(self.slots) - 1
+        h = zlib.crc32(b) & mask
+        while s := self.slots[h]:
+            if self.blob[self.offs[s - 1]:self.offs[s]] == b:
+                return s - 1
+            h = (h + 1) & mask
+        return -1
+
+class Groups:
+    """Parallel column slices per key (or ordinal): group i is offs[i]:offs[i + 1]."""
+
+    def __init__(self, keys: StringTable | None, offs, *columns):
+        self.keys, self.offs, self.columns = keys, offs, columns
+
+    def __len__(self):
+        return len(self.offs) - 1
+
+    def __getitem__(self, i: int):
+        a, b = self.offs[i], self.offs[i + 1]
+        return tuple(c[a:b] for c in self.columns) if len(self.columns) > 1 else self.columns[0][a:b]
+
+    def get(self, key: str, default=None):
+        i = self.keys.find(key)
+        return default if i < 0 else self[i]
+
+class Table:
+    """Rows as tuples across columns, by ordinal or (with an indexed key table) by key."""
+
+    def __init__(self, columns: Sequence, keys: StringTable | None = None):
+        self.columns, self.keys = tuple(columns), keys
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    def __getitem__(self, i: int) -> tuple:
+        return tuple(c[i] for c in self.columns)
+
+    def get(self, key: str, default=None):
+        i = self.keys.find(key)
+        return default if i < 0 else self[i]
+
+class SnapshotWriter:
+    def __init__(self):
+        self.sections: dict[str, tuple[str, object]] = {}  # name -> (typecode, buffer)
+        self.meta: dict = {}
+
+    def array(self, name: str, data) -> None:
+        tc = data.typecode if isinstance(data, array) else "B" if isinstance(data, (bytes, bytearray)) else data.format
+        self.sections[name] = (tc, data)
+
+    def strings(self, name: str, values: StringTable | Iterable[str | None], index: bool = False) -> None:
+        t = values if isinstance(values, StringTable) else StringTable.build(values, index)
+        self.array(f"{name}.blob", t.blob)
+        self.array(f"{name}.offs", t.offs)
+        if t.slots is not None:
+            self.array(f"{name}.slots", t.slots)
+        if t.nulls is not None:
+            self.array(f"{name}.nulls", t.nulls)
+
+    def groups(self, name: str, keys: Iterable[str] | None, groups: Iterable, typecodes: str) -> None:
+        """`groups` yields, per key/ordinal, one sequence per typecode (a bare sequence for one column)."""
+        offs, cols = array("I", [0]), [array(tc) for tc in typecodes]
+        for g in groups:
+            for col, vals in zip(cols, g if len(cols) > 1 else (g,)):
+                col.extend(vals)
+            offs.append(len(cols[0]))
+        if keys is not None:
+            self.strings(f"{name}.keys", keys, index=True)
+        self.array(f"{name}.offs", offs)
+        for j, col in enumerate(cols):
+            self.array(f"{name}.{j}", col)
+
+    def dump(self, f) -> None:
+        f.write(HEAD.pack(MAGIC, 0, 0))
+        pos, table = HEAD.size, {}
+        for name, (tc, data) in self.sections.items():
+            pad = -pos % ALIGN
+            f.write(b"\0" * pad)
+            pos += pad
+            n = f.write(memoryview(data).cast("B"))
+            table[name] = (tc, pos, n)
+            pos += n
+        header = json.dumps({"format": FORMAT, "byteorder": sys.byteorder, "itemsize": ITEMSIZE,
+                             "meta": self.meta, "sections": table}).encode()
+        f.write(header)
+        f.seek(0)
+        f.write(HEAD.pack(MAGIC, pos, len(header)))
+
+    def publish(self, directory: str, name: str, db: str, version: int, keep: int = 3) -> str:
+        """Atomically install <name>-<db>-v<version>.snap and drop all but the newest `keep`."""
+        os.makedirs(directory, exist_ok=True)
+        path = snapshot_path(directory, name, db, version)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        self.meta.update(name=name, db=db, version=version)
+        try:
+            with open(tmp, "wb") as f:
+                self.dump(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            with suppress(OSError):
+                os.unlink(tmp)
+            raise
+        with suppress(OSError):  # make the rename durable
+            fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        prune(directory, name, db, keep)
+        return path
+
+class Snapshot:
+    """One mapped snapshot file; views handed out keep the mapping alive."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            try:
+                magic, hoff, hlen = HEAD.unpack_from(mm, 0)
+                if magic != MAGIC:
+                    raise SnapshotError(f"{path}: not a snapshot")
+                header = json.loads(mm[hoff:hoff + hlen])
+            except (struct.error, ValueError) as e:
+                raise SnapshotError(f"{path}: unreadable header ({e})") from e
+            if (header["format"], header["byteorder"], header["itemsize"]) != (FORMAT, sys.byteorder, ITEMSIZE):
+                raise SnapshotError(f"{path}: written by an incompatible build")
+        except BaseException:
+            mm.close()  # nothing references the mapping yet; don't leave it to the GC
+            raise
+        self.path, self.size, self.meta = path, len(mm), header["meta"]
+        self._sections = header["sections"]
+        self._mm, self._mem = mm, memoryview(mm)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._sections
+
+    def close(self) -> None:
+        """Unmap now; only for a snapshot no view has been taken from."""
+        self._mem.release()
+        self._mm.close()
+
+    def array(self, name: str) -> memoryview:
+        tc, off, n = self._sections[name]
+        return self._mem[off:off + n].cast(tc)
+
+    def strings(self, name: str) -> StringTable:
+        return StringTable(self.array(f"{name}.blob"), self.array(f"{name}.offs"),
+                           self.array(f"{name}.slots") if f"{name}.slots" in self else None,
+                           self.array(f"{name}.nulls") if f"{name}.nulls" in self else None)
+
+    def groups(self, name: str) -> Groups:
+        keys = self.strings(f"{name}.keys") if f"{name}.keys.offs" in self else None
+        cols = []
+        while f"{name}.{len(cols)}" in self:
+            cols.append(self.array(f"{name}.{len(cols)}"))
+        return Groups(keys, self.array(f"{name}.offs"), *cols)
+
+def db_tag(url: str) -> str:
+    """Short fingerprint of the database a snapshot was built from (url without password)."""
+    return hashlib.blake2b(url.encode(), digest_size=4).hexdigest()
+
+def snapshot_path(directory: str, name: str, db: str, version: int) -> str:
+    return os.path.join(directory, f"{name}-{db}-v{version}.snap")
+
+def prune(directory: str, name: str, db: str, keep: int) -> None:
+    # workers still mapping a removed file keep their pages until they swap away from it
+    pattern = re.compile(rf"^{re.escape(name)}-{re.escape(db)}-v(\d+)\.snap$")
+    versions = sorted((int(m.group(1)) for m in map(pattern.match, os.listdir(directory)) if m), reverse=True)
+    for v in versions[max(keep, 1):]:
+        with suppress(OSError):
+            os.unlink(snapshot_path(directory, name, db, v))
+
+def open_snapshot(directory: str, name: str, db: str, version: int, generation: str) -> Snapshot | None:
+    """The snapshot of `version`, or None when missing, unreadable or from another generation."""
+    path = snapshot_path(directory, name, db, version)
+    if not os.path.exists(path):
+        return None
+    try:
+        snap = Snapshot(path)
+    except (OSError, SnapshotError, KeyError, ValueError):
+        log.warning("ignoring snapshot %s", path, exc_info=True)
+        return None
+    if snap.meta.get("generation") != generation:
+        log.info("ignoring snapshot %s: generation %s, database is at %s", path, snap.meta.get("generation"), generation)
+        snap.close()
+        return None
+    return snap
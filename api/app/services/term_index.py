@@ -0,0 +1,112 @@
+# in-process inverted index over ICD-TM concepts (BM25F-style scoring)
+import heapq, math
+from array import array
+from typing import Container, Iterable
+from app.services.snapshot import Snapshot, SnapshotWriter, Table
+from app.services.textnorm import tokenize
+
+ICD_SYSTEM = "http://id.who.int/icd/release/11"
+
+# same boosts as the ES multi_match: title^3, synonyms^2, definition
+FIELD_BOOSTS = {"title": 3.0, "synonyms": 2.0, "definition": 1.0}
+K1 = 1.2
+B = 0.75
+
+class TermIndex:
+    """Token -> (doc ids, precomputed impacts). Scores are static, so a query
+    is a sum of postings lookups instead of a per-document scoring loop."""
+
+    def __init__(self):
+        self.docs: list[tuple[str, str, str | None]] = []  # code, display, linearization
+        self.postings: dict[str, tuple[array, array]] = {}
+
+    def __len__(self):
+        return len(self.docs)
+
+    @classmethod
+    def build(cls, concepts: Iterable[dict]) -> "TermIndex":
+        idx = cls()
+        field_tokens: list[dict[str, list[str]]] = []
+        totals = {f: 0 for f in FIELD_BOOSTS}
+        for c in concepts:
+            if not c.get("code"):
+                continue
+            idx.docs.append((c["code"], c.get("title") or "", c.get("linearization")))
+            ft = {
+                "title": tokenize(c.get("title")),
+                "synonyms": [t for s in c.get("synonyms") or [] for t in tokenize(s)],
+                "definition": tokenize(c.get("definition")),
+            }
+            for f, toks in ft.items():
+                totals[f] += len(toks)
+            field_tokens.append(ft)
+
+        n = len(idx.docs)
+        if not n:
+            return idx
+        avg = {f: (totals[f] / n) or 1.0 for f in FIELD_BOOSTS}
+
+        # weighted, length-normalized term frequency per (token, doc)
+        wtf: dict[str, dict[int, float]] = {}
+        for doc_id, ft in enumerate(field_tokens):
+            for f, toks in ft.items():
+                if not toks:
+                    continue
+                norm = 1 - B + B * len(toks) / avg[f]
+                counts: dict[str, int] = {}
+                for t in toks:
+                    counts[t] = counts.get(t, 0) + 1
+                for t, tf in counts.items():
+                    d = wtf.setdefault(t, {})
+                    d[doc_id] = d.get(doc_id, 0.0) + FIELD_BOOSTS[f] * tf / norm
+
+        for t, per_doc in wtf.items():
+            idf = math.log(1 + (n - len(per_doc) + 0.5) / (len(per_doc) + 0.5))
+            ids = array("i", per_doc.keys())
+            impacts = array("f", (idf * w * (K1 + 1) / (w + K1) for w in per_doc.values()))
+            idx.postings[t] = (ids, impacts)
+        return idx
+
+    def write(self, w: SnapshotWriter) -> None:
+        w.groups("term.postings", self.postings.keys(), self.postings.values(), "if")
+
+    @classmethod
+    def from_snapshot(cls, snap: Snapshot, docs: Table) -> "TermIndex":
+        idx = cls()
+        idx.docs, idx.postings = docs, snap.groups("term.postings")
+        return idx
+
+    def search(self, text: str, top_k: int = 10, members: Container[str] | None = None) -> list[dict]:
+        return self.search_many([(text, top_k, members)])[0]
+
+    def search_many(self, queries: list[tuple[str, int, Container[str] | None]]) -> list[list[dict]]:
+        """Score a batch in one pass over the union of its tokens: each postings
+        list is walked once and credited to every query that contains the token.
+        `members` (e.g. a ValueSet) restricts a query to those codes."""
+        token_sets = [set(tokenize(text)) for text, _, _ in queries]
+        users: dict[str, list[int]] = {}
+        for qi, toks in enumerate(token_sets):
+            for t in toks:
+                users.setdefault(t, []).append(qi)
+        accs: list[dict[int, float]] = [{} for _ in queries]
+        for t, qis in users.items():
+            p = self.postings.get(t)
+            if p is None:
+                continue
+            for doc_id, imp in zip(*p):
+                for qi in qis:
+                    acc = accs[qi]
+                    acc[doc_id] = acc.get(doc_id, 0.0) + imp
+        out = []
+        for (_, top_k, members), acc in zip(queries, accs):
+            items = acc.items() if members is None else ((d, s) for d, s in acc.items() if self.docs[d][0] in members)
+            best = heapq.nlargest(top_k, items, key=lambda kv: kv[1])
+            out.append([self._suggestion(doc_id, s) for doc_id, s in best])
+        return out
+
+    def _suggestion(self, doc_id: int, score: float) -> dict:
+        code, display, lin = self.docs[doc_id]
+        return {
+            "code": code, "display": display, "system": ICD_SYSTEM,
+            "score": round(score, 4), "linearization": lin,
+        }
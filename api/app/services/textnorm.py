@@ -0,0 +1,24 @@
+# text normalization shared by the in-process indexes
+import re, unicodedata
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+def normalize(s: str | None) -> str:
+    """Lowercase, strip diacritics and collapse punctuation/whitespace to single spaces."""
+    s = unicodedata.normalize("NFKD", s or "")
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    return " ".join(_TOKEN_RE.findall(s.lower()))
+
+def tokenize(s: str | None) -> list[str]:
+    return normalize(s).split()
+
+# romanization variants folded to one key (vaata/vata, jwara/jvara); also the ES tm_translit filters
+TRANSLIT_RULES = [("aa", "a"), ("ee", "i"), ("ii", "i"), ("oo", "u"), ("uu", "u"), ("w", "v"),
+                  ("sh", "s"), ("kh", "k"), ("gh", "g"), ("ch", "c"), ("jh", "j"),
+                  ("th", "t"), ("dh", "d"), ("ph", "p"), ("bh", "b")]
+_REPEAT_RE = re.compile(r"(.)\1+")
+
+def fold_translit(token: str) -> str:
+    for a, b in TRANSLIT_RULES:
+        token = token.replace(a, b)
+    return _REPEAT_RE.sub(r"\1", token)
@@ -1,8 +1,51 @@
 # validate codes
-from app.services.icd_repo import ICDRepo
+from app.metrics import stage
+from app.services.icd_repo import ICDRepo, AsyncICDRepo
+from app.services.codeset import CodeSet
+from app.services.query_cache import MISS, QueryCache
 
-def validate_code(repo: ICDRepo, code: str) -> tuple[bool, str | None]:
-    c = repo.get(code)
-    if not c: 
-        return False, None
-    return True, c.get("title")
+Result = tuple[bool, str | None, str | None]  # valid, title, linearization
+
+def _lookup(codes: CodeSet, code: str) -> Result:
+    hit = codes.lookup(code)
+    return (True, hit[0], hit[1]) if hit else (False, None, None)
+
+def validate_code(repo: ICDRepo, code: str, codes: CodeSet | None = None) -> Result:
+    with stage("validate.code"):
+        if codes is not None and len(codes):
+            return _lookup(codes, code)
+        c = repo.get(code)
+        if not c:
+            return False, None, None
+        return True, c.get("title"), c.get("linearization")
+
+def validate_codes(repo: ICDRepo, codes: list[str], code_set: CodeSet | None = None) -> list[Result]:
+    with stage("validate.batch"):
+        if code_set is not None and len(code_set):
+            return [_lookup(code_set, c) for c in codes]
+        # no code set loaded yet: one IN query per chunk instead of one SELECT per code
+        found = repo.get_many(codes)
+    return [(True, found[c]["title"], found[c]["linearization"]) if c in found else (False, None, None) for c in codes]
+
+async def avalidate_code(repo: AsyncICDRepo, code: str, codes: CodeSet | None = None,
+                         cache: QueryCache | None = None, version: int | str = -1) -> Result:
+    if codes is not None and len(codes):
+        return validate_code(None, code, codes)  # in-memory and cheaper than a cache lookup
+    key = cache.key("validate", version, code) if cache is not None else None
+    if key is not None:
+        hit = await cache.get(key)
+        if hit is not MISS:
+            return tuple(hit)
+    with stage("validate.code"):
+        c = await repo.get(code)
+    res: Result = (True, c.get("title"), c.get("linearization")) if c else (False, None, None)
+    if key is not None:
+        await cache.put(key, res)
+    return res
+
+async def avalidate_codes(repo: AsyncICDRepo, codes: list[str], code_set: CodeSet | None = None) -> list[Result]:
+    if code_set is not None and len(code_set):
+        return validate_codes(None, codes, code_set)
+    with stage("validate.batch"):
+        found = await repo.get_many(codes)
+    return [(True, found[c]["title"], found[c]["linearization"]) if c in found else (False, None, None) for c in codes]
@@ -0,0 +1,95 @@
+# per-ValueSet member index for $expand paging/filtering and autocode restriction
+import bisect, re, threading
+from array import array
+from app.services.resource_cache import CachedResource, VALUESET_DIRS, find
+from app.services.textnorm import tokenize
+
+FHIR_ID = re.compile(r"^[A-Za-z0-9\-.]{1,64}$")
+
+def _members(vs: dict) -> dict[str, tuple[str, str]]:
+    out: dict[str, tuple[str, str]] = {}
+    for inc in (vs.get("compose") or {}).get("include") or []:
+        for c in inc.get("concept") or []:
+            if c.get("code"):
+                out[c["code"]] = (inc.get("system") or "", c.get("display") or "")
+    stack = list((vs.get("expansion") or {}).get("contains") or [])
+    while stack:
+        c = stack.pop()
+        if c.get("code"):
+            out.setdefault(c["code"], (c.get("system") or "", c.get("display") or ""))
+        stack.extend(c.get("contains") or [])
+    return out
+
+class ValueSetIndex:
+    """Members held as code-sorted parallel lists; a display-token index maps
+    each token to sorted member ordinals, so filtered pages stay in code order."""
+
+    def __init__(self, resource: CachedResource):
+        self.resource = resource
+        members = _members(resource.data)
+        self.codes = sorted(members)
+        self.systems = [members[c][0] for c in self.codes]
+        self.displays = [members[c][1] for c in self.codes]
+        postings: dict[str, list[int]] = {}
+        for i, d in enumerate(self.displays):
+            # the code goes through tokenize() like the filter text ("SA05.1" -> sa05, 1)
+            for t in set(tokenize(d)) | set(tokenize(self.codes[i])):
+                postings.setdefault(t, []).append(i)
+        self.tokens = sorted(postings)
+        self.postings = [array("i", postings[t]) for t in self.tokens]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __contains__(self, code: str) -> bool:
+        i = bisect.bisect_left(self.codes, code)
+        return i < len(self.codes) and self.codes[i] == code
+
+    def _matching(self, token: str, prefix: bool) -> set[int]:
+        i = bisect.bisect_left(self.tokens, token)
+        if not prefix:
+            return set(self.postings[i]) if i < len(self.tokens) and self.tokens[i] == token else set()
+        out: set[int] = set()
+        while i < len(self.tokens) and self.tokens[i].startswith(token):
+            out.update(self.postings[i])
+            i += 1
+        return out
+
+    def expand(self, filter: str | None, offset: int, count: int) -> tuple[int, list[dict]]:
+        toks = tokenize(filter)
+        if not toks:
+            total = len(self.codes)
+            ordinals = range(offset, min(offset + count, total))
+        else:
+            # every token must match; the last one as a prefix (typeahead-style filter)
+            sets = sorted((self._matching(t, i == len(toks) - 1) for i, t in enumerate(toks)), key=len)
+            hits = set.intersection(*sets) if sets else set()
+            total = len(hits)
+            ordinals = sorted(hits)[offset:offset + count]
+        return total, [{"system": self.systems[i], "code": self.codes[i], "display": self.displays[i]} for i in ordinals]
+
+class ValueSetRegistry:
+    """Resolves ids or canonical URLs to member indexes, rebuilding one only when
+    the resource cache hands back a new parse of its file."""
+
+    def __init__(self):
+        self._indexes: dict[str, ValueSetIndex] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def resolve_id(ref: str) -> str:
+        # "namaste-ayurveda", ".../ValueSet/namaste-ayurveda" or "...|1.0"
+        return ref.split("|")[0].rstrip("/").rsplit("/", 1)[-1]
+
+    def get(self, ref: str) -> ValueSetIndex | None:
+        vs_id = self.resolve_id(ref)
+        res = find(VALUESET_DIRS, f"{vs_id}.json") if FHIR_ID.match(vs_id) else None
+        if res is None:
+            return None
+        idx = self._indexes.get(vs_id)
+        if idx is None or idx.resource is not res:
+            with self._lock:
+                idx = self._indexes.get(vs_id)
+                if idx is None or idx.resource is not res:
+                    idx = self._indexes[vs_id] = ValueSetIndex(res)
+        return idx
@@ -0,0 +1,85 @@
+# Test settings: a throwaway sqlite DB, fresh RS256 keys, the in-process search backend and
+# no Redis/ES. Set before anything imports app.config, which reads the environment once.
+import os, tempfile, time
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+TMP = tempfile.mkdtemp(prefix="saarthi-tests-")
+
+def _write_keys() -> tuple[str, str]:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    priv, pub = os.path.join(TMP, "priv.pem"), os.path.join(TMP, "pub.pem")
+    with open(priv, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    with open(pub, "wb") as f:
+        f.write(key.public_key().public_bytes(serialization.Encoding.PEM,
+                                              serialization.PublicFormat.SubjectPublicKeyInfo))
+    return priv, pub
+
+_priv, _pub = _write_keys()
+os.environ.update({
+    "DB_URL": f"sqlite:///{TMP}/app.db",
+    "JWT_PRIVATE_KEY_PATH": _priv,
+    "JWT_PUBLIC_KEY_PATH": _pub,
+    "SEARCH_BACKEND": "memory",
+    "ES_URL": "http://127.0.0.1:9",
+    "REDIS_URL": "",
+    "SNAPSHOT_DIR": "",  # per test: tmp_path, never the repo's data/snapshots
+    "PROFILE_DIR": os.path.join(TMP, "profiles"),
+    "ICD_CHECKPOINT_FILE": os.path.join(TMP, "checkpoint.json"),
+    "RATE_LIMIT_BURST": "1000",
+    "LOG_ACCESS": "false",
+    "LOG_LEVEL": "WARNING",
+})
+
+CONCEPTS = [
+    ("u1", "SA00", "Vata disorder", "Disorder of the vata dosha", "mms", ["Vata dosha imbalance", "Vaata vikara"]),
+    ("u2", "SA01", "Pitta disorder", "Disorder of pitta dosha with heat", "mms", ["Pitta vikara"]),
+    ("u3", "SA02", "Kapha disorder", "Disorder of kapha", "mms", ["Kapha vikara", "Shleshma disorder"]),
+    ("u4", "SA10", "Amlapitta", "Hyperacidity pattern", "mms", ["Acid dyspepsia"]),
+    ("u5", "SB20", "Jwara (fever) disorder", "Fever pattern in Ayurveda", "mms", ["Fever", "Jvara"]),
+]
+
+def seed(engine, concepts=CONCEPTS) -> None:
+    """Migrate `engine`'s database and load `concepts` (id, code, title, definition, linearization, synonyms)."""
+    from app.migrations import migrate
+    migrate(engine)
+    with engine.begin() as cx:
+        for cid, code, title, definition, lin, synonyms in concepts:
+            cx.exec_driver_sql("INSERT INTO icd_concept(id, code, title, definition, linearization) VALUES (?, ?, ?, ?, ?)",
+                               (cid, code, title, definition, lin))
+            for term in synonyms:
+                cx.exec_driver_sql("INSERT INTO icd_synonym(concept_id, term, lang, linearization) VALUES (?, ?, 'en', ?)",
+                                   (cid, term, lin))
+
+@pytest.fixture
+def engine(tmp_path):
+    """A seeded sqlite database of its own, for tests that build indexes directly."""
+    from sqlalchemy import create_engine
+    eng = create_engine(f"sqlite:///{tmp_path}/icd.db", future=True)
+    seed(eng)
+    yield eng
+    eng.dispose()
+
+@pytest.fixture(scope="session")
+def client(tmp_path_factory):
+    """TestClient over the app, warmed up, with a read:codes bearer token."""
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine
+    from app.config import settings
+    from app.main import app
+    settings.snapshot_dir = str(tmp_path_factory.mktemp("snapshots"))
+    eng = create_engine(os.environ["DB_URL"], future=True)
+    seed(eng)
+    eng.dispose()
+    with TestClient(app) as c:
+        deadline = time.monotonic() + 30
+        while not getattr(app.state, "ready", False) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        tok = c.post("/v1/auth/token", data={"client_id": "demo-client-id", "client_secret": "demo-client-secret",
+                                              "scope": "read:codes write:bundles"}).json()["access_token"]
+        c.headers["Authorization"] = f"Bearer {tok}"
+        yield c
@@ -0,0 +1,43 @@
+import asyncio, threading
+
+from app.services.corpus import Corpus
+from app.services.icd_repo import ICDRepo
+from app.services.search import AsyncSearchService
+
+class _DownES:
+    async def search(self, **_):
+        raise ConnectionError("es down")
+
+    async def msearch(self, **_):
+        raise ConnectionError("es down")
+
+def _service(engine, es=None) -> tuple[AsyncSearchService, list[int]]:
+    corpus = Corpus(ICDRepo(engine))
+    corpus.refresh(force=True)
+    threads: list[int] = []
+    for idx in (corpus.term, corpus.fuzzy):
+        search = idx.search
+        def traced(*a, _search=search, **kw):
+            threads.append(threading.get_ident())
+            return _search(*a, **kw)
+        idx.search = traced
+    return AsyncSearchService(es, "icd", None, corpus), threads
+
+def _run(coro_fn) -> tuple[object, int]:
+    async def go():
+        return await coro_fn(), threading.get_ident()
+    return asyncio.run(go())
+
+def test_local_search_runs_off_the_event_loop(engine):
+    svc, threads = _service(engine)
+    (exact, fuzzy), loop = _run(lambda: asyncio.gather(svc.suggest("vata", 3), svc.suggest("vaata", 3, fuzzy=True)))
+    assert exact[0]["code"] == "SA00" and fuzzy[0]["code"] == "SA00"
+    assert len(threads) == 2 and loop not in threads
+
+def test_es_failure_falls_back_off_the_event_loop(engine):
+    svc, threads = _service(engine, _DownES())
+    out, loop = _run(lambda: svc.suggest("fever", 3))
+    assert out[0]["code"] == "SB20"
+    many, loop = _run(lambda: svc.suggest_many([("kapha", 3, None, False, None), ("jvaraa", 3, None, True, None)]))
+    assert [r[0]["code"] for r in many] == ["SA02", "SB20"]
+    assert len(threads) == 2 and loop not in threads  # the exact query went through search_many
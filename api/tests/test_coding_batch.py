@@ -0,0 +1,44 @@
+from app.config import settings
+
+def test_autocode_batch_reports_errors_per_item(client):
+    r = client.post("/v1/coding/autocode/batch", json={"items": [
+        {"text": "vata", "topK": 3},
+        {"text": "fever", "valueSet": "no-such-valueset"},
+        {"text": "   "},
+        {"text": "kapha vikaara", "fuzzy": True},
+    ]})
+    assert r.status_code == 200
+    results = r.json()["results"]
+    assert [x["query"] for x in results] == ["vata", "fever", "   ", "kapha vikaara"]
+    assert results[0]["suggestions"][0]["code"] == "SA00"
+    assert results[0]["error"] is None
+    assert results[1]["error"] == "ValueSet not found: no-such-valueset"
+    assert results[2]["suggestions"] == []
+    assert results[3]["suggestions"][0]["code"] == "SA02"
+
+def test_autocode_batch_matches_single_requests(client):
+    texts = ["vata", "pitta disorder", "fever"]
+    batch = client.post("/v1/coding/autocode/batch", json={"items": [{"text": t} for t in texts]}).json()["results"]
+    for t, res in zip(texts, batch):
+        assert res["suggestions"] == client.post("/v1/coding/autocode", json={"text": t}).json()["suggestions"]
+
+def test_autocode_batch_limit(client, monkeypatch):
+    monkeypatch.setattr(settings, "autocode_batch_max", 2)
+    r = client.post("/v1/coding/autocode/batch", json={"items": [{"text": "a"}] * 3})
+    assert r.status_code == 413
+
+def test_validate_batch_reports_each_code(client):
+    codes = ["SA00", "XX99", "SB20", "", "SA00"]
+    r = client.post("/v1/coding/validate/batch", json={"codes": codes})
+    assert r.status_code == 200
+    results = r.json()["results"]
+    assert [x["code"] for x in results] == codes
+    assert [x["valid"] for x in results] == [True, False, True, False, True]
+    assert results[0]["title"] == "Vata disorder" and results[0]["linearization"] == "mms"
+    assert results[1]["title"] is None
+
+def test_validate_batch_rejects_other_systems_and_oversized_batches(client, monkeypatch):
+    r = client.post("/v1/coding/validate/batch", json={"codes": ["SA00"], "system": "http://snomed.info/sct"})
+    assert r.status_code == 400
+    monkeypatch.setattr(settings, "validate_batch_max", 2)
+    assert client.post("/v1/coding/validate/batch", json={"codes": ["SA00"] * 3}).status_code == 413
@@ -0,0 +1,42 @@
+import csv, io
+
+import orjson
+
+PATIENT = {"patient": {"name": "Demo Patient", "gender": "male", "birthDate": "1985-01-01"},
+           "conditions": [{"text": "vata", "code": "SA00", "display": "Vata disorder"}],
+           "procedures": [{"text": "x", "code": "PR01", "display": "Procedure"}]}
+
+def _ids(resources) -> list[str]:
+    return [r["id"] for r in resources]
+
+def test_single_bundle_keeps_unscoped_ids(client):
+    r = client.post("/v1/fhir/export/bundle", json=PATIENT)
+    assert r.status_code == 200
+    bundle = r.json()
+    assert bundle["resourceType"] == "Bundle" and bundle["type"] == "collection"
+    assert _ids(e["resource"] for e in bundle["entry"]) == ["pat1", "enc1", "cond0", "proc0"]
+    assert bundle["entry"][2]["resource"]["subject"] == {"reference": "Patient/pat1"}
+
+def test_stream_scopes_ids_per_patient(client):
+    named = {**PATIENT, "patient": {**PATIENT["patient"], "id": "p-7"}}
+    r = client.post("/v1/fhir/export/stream", json={"items": [PATIENT, PATIENT, named]})
+    assert r.status_code == 200
+    lines = [orjson.loads(l) for l in r.text.splitlines()]
+    assert _ids(lines) == ["pat1", "pat1-enc1", "pat1-cond0", "pat1-proc0",
+                           "pat2", "pat2-enc1", "pat2-cond0", "pat2-proc0",
+                           "p-7", "p-7-enc1", "p-7-cond0", "p-7-proc0"]
+
+def test_stream_bundles_types_and_csv(client):
+    ndjson = b"\n".join([orjson.dumps(PATIENT), b"{not json", orjson.dumps(PATIENT)])
+    r = client.post("/v1/fhir/export/stream", params={"unit": "bundle"}, content=ndjson,
+                    headers={"Content-Type": "application/x-ndjson"})
+    lines = [orjson.loads(l) for l in r.text.splitlines()]
+    assert [l["resourceType"] for l in lines] == ["Bundle", "OperationOutcome", "Bundle"]
+    assert _ids(e["resource"] for e in lines[2]["entry"])[1] == "pat3-enc1"
+
+    r = client.post("/v1/fhir/export/stream", params={"format": "csv", "_type": "Condition"}, json={"items": [PATIENT]})
+    rows = list(csv.reader(io.StringIO(r.text)))
+    assert rows == [["patient", "resourceType", "id", "system", "code", "display"],
+                    ["pat1", "Condition", "pat1-cond0", "http://id.who.int/icd/release/11", "SA00", "Vata disorder"]]
+    assert client.post("/v1/fhir/export/stream", params={"format": "csv", "unit": "bundle"},
+                       json={"items": []}).status_code == 400
@@ -0,0 +1,69 @@
+import asyncio
+
+import orjson
+
+from app.services.codeset import CodeSet
+from app.services.fhir_import import BundleImporter
+
+ICD = "http://id.who.int/icd/release/11"
+
+def _coded(rtype: str, rid: str, code: str, **extra) -> dict:
+    return {"resourceType": rtype, "id": rid, "subject": {"reference": "Patient/p1"},
+            "code": {"coding": [{"system": ICD, "code": code}]}, **extra}
+
+MIXED = {"resourceType": "Bundle", "type": "collection", "entry": [
+    {"resource": {"resourceType": "Patient", "id": "p1"}},
+    {"resource": _coded("Condition", "c1", "XX99")},
+    {"resource": {"resourceType": "Condition", "id": "bad id!", "subject": {"reference": "nope"}}},
+    {"fullUrl": "urn:uuid:1"},
+    {"resource": _coded("Procedure", "pr1", "SA00")},
+    {"resource": {"resourceType": "lowercase"}},
+]}
+
+def _import(bundle: dict, full: bool = False, max_errors: int = 100) -> dict:
+    imp = BundleImporter(None, CodeSet.build([{"code": "SA00", "title": "Vata disorder"}]), full, max_errors=max_errors)
+    async def go():
+        await imp.add_bundle(bundle)
+        return await imp.finish()
+    return asyncio.run(go())
+
+def test_mixed_bundle_reports_every_problem_by_entry():
+    report = _import(MIXED)
+    assert not report["valid"]
+    assert report["entries"] == 6
+    assert report["summary"]["Condition"] == 2 and report["summary"]["Procedure"] == 1
+    assert report["codings"] == {"checked": 2, "icd": 2, "invalid": 1}
+    got = [(e["entry"], e["path"]) for e in report["errors"]]
+    # the unknown code is only known at flush time but is still listed under its entry
+    assert got == [(1, "entry[1].resource.code.coding[0].code"), (2, "entry[2].resource.id"),
+                   (2, "entry[2].resource.subject.reference"), (3, "entry[3]"), (5, "entry[5].resource.resourceType")]
+    assert report["errors"][0]["message"] == "unknown ICD-11 code: XX99"
+    assert report["errorCount"] == 5 and not report["errorsTruncated"]
+
+def test_full_validation_does_not_repeat_fast_path_errors():
+    report = _import(MIXED, full=True)
+    entries = [e["entry"] for e in report["errors"]]
+    assert entries == sorted(entries)
+    paths = [e["path"] for e in report["errors"] if e["entry"] == 2]
+    assert paths.count("entry[2].resource.id") == 1  # from the model only
+    assert "entry[2].resource.subject.reference" in paths  # the model doesn't check reference syntax
+
+def test_errors_are_capped_but_counted():
+    report = _import(MIXED, max_errors=2)
+    assert report["errorCount"] == 5 and len(report["errors"]) == 2 and report["errorsTruncated"]
+
+def test_not_a_bundle():
+    report = _import({"resourceType": "Patient"})
+    assert report["errors"][0]["message"] == "expected a Bundle resource"
+
+def test_import_endpoints(client):
+    r = client.post("/v1/fhir/import/bundle", content=orjson.dumps(MIXED))
+    assert r.status_code == 200
+    assert [e["entry"] for e in r.json()["errors"]] == [1, 2, 2, 3, 5]
+    lines = b"\n".join([orjson.dumps(_coded("Condition", "c1", "SA00")), b"{oops", orjson.dumps(MIXED)])
+    r = client.post("/v1/fhir/import/ndjson", content=lines, headers={"Content-Type": "application/x-ndjson"})
+    assert r.status_code == 200
+    errors = r.json()["errors"]
+    assert errors[0]["entry"] == 2 and errors[0]["message"].startswith("invalid JSON")
+    assert {e["entry"] for e in errors[1:]} == {3}
+    assert client.post("/v1/fhir/import/bundle", content=b"{").status_code == 400
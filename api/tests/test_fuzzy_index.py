@@ -0,0 +1,50 @@
+import pytest
+
+from app.services.fuzzy_index import FuzzyIndex, edit_distance, max_distance
+from app.services.textnorm import fold_translit
+
+INDEX = FuzzyIndex.build([
+    {"code": "V", "title": "Vata disorder", "synonyms": ["Vaata vikara"]},
+    {"code": "J", "title": "Jwara", "synonyms": ["Fever"]},
+    {"code": "P", "title": "Pitta disorder"},
+    {"code": "K", "title": "Kapha disorder", "synonyms": ["Shleshma"]},
+])
+
+@pytest.mark.parametrize("a,b,d", [
+    ("vata", "vata", 0), ("vata", "vatta", 1), ("vata", "avta", 1),  # a transposition is one edit (OSA)
+    ("kapha", "kpaah", 2), ("pitta", "tipat", 3), ("", "abc", 3),
+])
+def test_edit_distance(a, b, d):
+    assert edit_distance(a, b, 5) == d
+
+def test_edit_distance_stops_at_the_limit():
+    assert edit_distance("disorder", "dysentery", 2) == 3
+    assert edit_distance("a", "abcdef", 2) == 3
+
+def test_budget_grows_with_token_length():
+    assert [max_distance(t) for t in ["vt", "vat", "vikar", "vikara"]] == [0, 1, 1, 2]
+
+@pytest.mark.parametrize("spelling", ["jwara", "jvara", "jwaraa", "jvra", "jawra"])
+def test_transliteration_and_typos_find_the_concept(spelling):
+    assert INDEX.search(spelling, 1)[0]["code"] == "J"
+
+def test_folding_makes_spelling_variants_equal():
+    assert fold_translit("vaata") == fold_translit("vata") == fold_translit("vatta")
+    assert fold_translit("shleshma") == fold_translit("sleshma")
+    assert INDEX.search("sleshma", 1)[0]["code"] == "K"
+    assert INDEX.search("vaata", 1)[0]["score"] == INDEX.search("vata", 1)[0]["score"]
+
+def test_closer_matches_score_higher_and_title_beats_synonym():
+    exact, typo = INDEX.search("kapha", 1)[0], INDEX.search("kaphq", 1)[0]
+    assert exact["code"] == typo["code"] == "K" and exact["score"] > typo["score"]
+    assert INDEX.search("vata", 1)[0]["score"] > INDEX.search("vikara", 1)[0]["score"]
+
+def test_out_of_budget_and_short_tokens_do_not_match():
+    assert INDEX.search("xyzzy") == []
+    assert INDEX.search("vt") == []  # two letters: exact only
+    assert {r["code"] for r in INDEX.search("disordr", 5)} == {"V", "P", "K"}
+    assert {r["code"] for r in INDEX.search("disordr", 5, members={"P", "K"})} == {"P", "K"}
+
+def test_fuzzy_autocode(client):
+    r = client.post("/v1/coding/autocode", json={"text": "kapa vikaara", "fuzzy": True, "topK": 1})
+    assert r.json()["suggestions"][0]["code"] == "SA02"
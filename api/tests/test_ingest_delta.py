@@ -0,0 +1,92 @@
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts"))
+import ingest_icd11_tm as ingest  # noqa: E402
+from ingest_checkpoint import Checkpoint  # noqa: E402
+from app.services.corpus import read_state  # noqa: E402
+
+def _concept(n: int, title: str | None = None, synonyms=("syn",)) -> dict:
+    return {"id": f"https://id.who.int/icd/entity/{n}", "code": f"SA{n:02d}", "title": title or f"Title {n}",
+            "definition": None, "synonyms": [{"label": f"{s} {n}", "lang": "en"} for s in synonyms],
+            "linearization": "mms:2024-01"}
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path}/ingest.db"
+    monkeypatch.setattr(ingest, "DB_URL", url)
+    eng = create_engine(url, future=True)
+    yield eng
+    eng.dispose()
+
+def _rows(eng) -> dict[str, tuple]:
+    with eng.begin() as cx:
+        concepts = cx.exec_driver_sql("SELECT id, title, last_updated FROM icd_concept").fetchall()
+        syns = cx.exec_driver_sql("SELECT concept_id, term FROM icd_synonym").fetchall()
+    return {cid: (title, stamp, sorted(t for c, t in syns if c == cid)) for cid, title, stamp in concepts}
+
+def test_content_hash_covers_stored_fields_only():
+    a = _concept(1, synonyms=("x", "y"))
+    b = {**a, "synonyms": list(reversed(a["synonyms"]))}
+    assert ingest.content_hash(a) == ingest.content_hash(b)
+    assert ingest.content_hash(a) != ingest.content_hash({**a, "title": "Other"})
+    assert ingest.content_hash(a) != ingest.content_hash({**a, "synonyms": a["synonyms"][:1]})
+
+def test_delta_writes_only_added_changed_and_removed(db, monkeypatch):
+    monkeypatch.setattr(ingest, "_now", lambda: "t1")
+    upserts, deletes = ingest.apply_delta_to_db([_concept(1), _concept(2), _concept(3)])
+    assert sorted(upserts) == sorted(c["id"] for c in [_concept(1), _concept(2), _concept(3)]) and deletes == []
+
+    monkeypatch.setattr(ingest, "_now", lambda: "t2")
+    upserts, deletes = ingest.apply_delta_to_db([_concept(1), _concept(2, "Renamed", ("new",)), _concept(4)])
+    assert upserts == [_concept(4)["id"], _concept(2)["id"]]  # added, then changed
+    assert deletes == [_concept(3)["id"]]
+    rows = _rows(db)
+    assert set(rows) == {_concept(n)["id"] for n in (1, 2, 4)}
+    assert rows[_concept(1)["id"]] == ("Title 1", "t1", ["syn 1"])  # unchanged row untouched
+    assert rows[_concept(2)["id"]] == ("Renamed", "t2", ["new 2"])  # old synonyms replaced
+    assert rows[_concept(4)["id"]][1] == "t2"
+
+    assert ingest.apply_delta_to_db([_concept(1), _concept(2, "Renamed", ("new",)), _concept(4)]) == ([], [])
+
+def test_empty_fetch_is_not_a_mass_delete(db):
+    ingest.apply_delta_to_db([_concept(1)])
+    assert ingest.apply_delta_to_db([]) == ([], [])
+    assert len(_rows(db)) == 1
+
+def test_checkpoint_resumes_saved_entities_only(tmp_path):
+    path = str(tmp_path / "cp.json")
+    cp = Checkpoint(path, {"strategy": "seeds"})
+    cp.add_entities([{"id": 1}, {"id": 2}])
+    cp.save(stage="seeds", cursor=2)
+    cp.add_entities([{"id": 3}])  # crash before the next save: refetched on resume
+
+    resumed = Checkpoint(path, {"strategy": "seeds"})
+    assert resumed.state == {"stage": "seeds", "cursor": 2}
+    assert resumed.entities == [{"id": 1}, {"id": 2}]
+
+    other = Checkpoint(path, {"strategy": "chapter"})  # another configuration starts fresh
+    assert other.state == {} and other.entities == []
+    assert not Path(path).exists() and not Path(cp.entities_path).exists()
+
+def test_main_resumes_after_the_db_write(db, tmp_path, monkeypatch):
+    """A run that died after writing the DB only replays the ES delta, then bumps the version."""
+    monkeypatch.setattr(ingest, "CHECKPOINT_FILE", str(tmp_path / "cp.json"))
+    monkeypatch.setattr(ingest, "fetch_token", lambda: pytest.fail("fetched again"))
+    monkeypatch.setattr(ingest, "apply_delta_to_db", lambda _: pytest.fail("DB written again"))
+    sent = []
+    monkeypatch.setattr(ingest, "index_delta_to_es", lambda concepts, up, down: sent.append((up, down)) or True)
+    key = {"strategy": ingest.STRATEGY, "base": ingest.ICD_BASE, "release": ingest.ICD_RELEASE,
+           "small_probe": ingest.SMALL_PROBE, "mode": ingest.INGEST_MODE}
+    cp = Checkpoint(ingest.CHECKPOINT_FILE, key)
+    cp.add_entities([{"@id": "http://id.who.int/icd/entity/1", "theCode": "SA01", "title": {"@value": "Vata"}}])
+    cp.save(stage="written", es_upserts=["https://id.who.int/icd/entity/1"], es_deletes=["gone"])
+    ingest.migrate(db)
+
+    ingest.main()
+    assert sent == [(["https://id.who.int/icd/entity/1"], ["gone"])]
+    assert read_state(db)[0] == 1
+    assert not Path(ingest.CHECKPOINT_FILE).exists()
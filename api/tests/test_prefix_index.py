@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from app.services.prefix_index import HOT_TOP_K, PrefixIndex
+from app.services.snapshot import SnapshotWriter, Table, open_snapshot
+
+WORDS = ["disorder", "disease", "dosha", "pain", "painful", "pitta", "vata", "kapha", "jvara", "amlapitta", "shotha"]
+
+def _concepts(n: int = 400, seed: int = 7) -> list[dict]:
+    rnd = random.Random(seed)
+    return [{"code": f"C{i:04d}", "title": " ".join(rnd.sample(WORDS, rnd.randint(1, 4))), "linearization": "mms",
+             "synonyms": [" ".join(rnd.sample(WORDS, rnd.randint(1, 3))) for _ in range(rnd.randint(0, 2))]}
+            for i in range(n)]
+
+def _brute(idx: PrefixIndex, q: str) -> dict[str, float]:
+    """Best weight per doc over every key starting with q, by a full scan."""
+    best: dict[str, float] = {}
+    for i in range(len(idx)):
+        if idx._key(i).startswith(q):
+            code = idx.docs[idx._doc[i]][0]
+            best[code] = max(best.get(code, 0.0), round(idx._weight[i], 4))
+    return best
+
+@pytest.fixture(scope="module")
+def index():
+    return PrefixIndex.build(_concepts())
+
+@pytest.mark.parametrize("q", ["d", "di", "dis", "pai", "disorder", "pitta d", "vata dosha", "zzz"])
+@pytest.mark.parametrize("k", [1, 5, 30])
+def test_top_k_matches_a_full_scan(index, q, k):
+    out = index.complete(q, k)
+    scores = [s["score"] for s in out]
+    expected = sorted(_brute(index, q).values(), reverse=True)[:k]
+    assert len(out) <= k
+    assert len({s["code"] for s in out}) == len(out)  # one entry per doc
+    assert scores == sorted(scores, reverse=True)
+    if len(q) > 2 or k > HOT_TOP_K:
+        assert scores == expected
+    else:  # hot lists are capped at HOT_TOP_K and keep the same ranking
+        assert scores == expected[:min(k, HOT_TOP_K)]
+    brute = _brute(index, q)
+    assert all(brute[s["code"]] == s["score"] for s in out)
+
+def test_shorter_and_title_matches_rank_first():
+    idx = PrefixIndex.build([
+        {"code": "A", "title": "Vata dosha imbalance"},
+        {"code": "B", "title": "Vata"},
+        {"code": "C", "title": "Kapha", "synonyms": ["Vata like"]},
+        {"code": "D", "title": "Severe vata"},
+    ])
+    assert [s["code"] for s in idx.complete("vat", 10)] == ["B", "A", "C", "D"]
+    assert [s["code"] for s in idx.complete("vata d", 10)] == ["A"]
+
+def test_mapped_index_answers_the_same(index, tmp_path):
+    w = SnapshotWriter()
+    index.write(w)
+    w.meta["generation"] = "g"
+    w.publish(str(tmp_path), "prefix", "db", 1)
+    snap = open_snapshot(str(tmp_path), "prefix", "db", 1, "g")
+    mapped = PrefixIndex.from_snapshot(snap, Table(list(zip(*index.docs))))
+    for q in ["d", "dis", "pain", "vata dosha"]:
+        assert mapped.complete(q, 8) == index.complete(q, 8)
+
+def test_empty_index():
+    assert PrefixIndex.build([]).complete("dis") == []
@@ -0,0 +1,57 @@
+import asyncio
+
+from app.services.corpus import Corpus, bump_version
+from app.services.icd_repo import ICDRepo
+from app.services.query_cache import MISS, LRUTTLCache, QueryCache
+from app.services.search import AsyncSearchService
+
+def _cache() -> QueryCache:
+    return QueryCache(LRUTTLCache(100, 60.0))
+
+def test_key_depends_on_version_and_parts():
+    cache = _cache()
+    k = cache.key("suggest", "1.g", "vata", 10)
+    assert k == cache.key("suggest", "1.g", "vata", 10)
+    assert k != cache.key("suggest", "2.g", "vata", 10)
+    assert k != cache.key("suggest", "1.h", "vata", 10)  # same version, recreated database
+    assert k != cache.key("validate", "1.g", "vata", 10)
+    assert k != cache.key("suggest", "1.g", "vata", 5)
+
+def test_local_tier_round_trip():
+    cache = _cache()
+    async def go():
+        assert await cache.get("k") is MISS
+        await cache.put("k", [1, 2])
+        return await cache.get("k"), await cache.get_many(["k", "other"])
+    value, many = asyncio.run(go())
+    assert value == [1, 2] and many == [[1, 2], MISS]
+    assert cache.stats["local_hits"] == 2 and cache.stats["misses"] == 2
+
+def test_ingest_moves_search_to_a_fresh_key_space(engine):
+    corpus = Corpus(ICDRepo(engine))
+    bump_version(engine)
+    corpus.refresh(force=True)
+    search = AsyncSearchService(None, "icd", None, corpus, cache=_cache())
+
+    async def suggest():
+        return await search.suggest("vayu", 5), (await search.suggest_many([("vayu", 5, None, False, None)]))[0]
+
+    assert asyncio.run(suggest()) == ([], [])
+    hits = search.cache.stats["local_hits"]
+    assert asyncio.run(suggest()) == ([], [])
+    assert search.cache.stats["local_hits"] == hits + 2
+
+    with engine.begin() as cx:
+        cx.exec_driver_sql("UPDATE icd_concept SET title = 'Vayu disorder' WHERE code = 'SA00'")
+    bump_version(engine)
+    assert corpus.refresh()
+    single, batched = asyncio.run(suggest())
+    assert [s["code"] for s in single] == [s["code"] for s in batched] == ["SA00"]
+
+def test_lang_is_part_of_the_key(engine):
+    corpus = Corpus(ICDRepo(engine))
+    corpus.refresh(force=True)
+    search = AsyncSearchService(None, "icd", None, corpus, cache=_cache())
+    assert search._cache_key("vata", 5, None, False, "hi-IN") == search._cache_key("vata", 5, None, False, "hi")
+    assert search._cache_key("vata", 5, None, False, "hi") != search._cache_key("vata", 5, None, False, "en")
+    assert search._cache_key("vata", 5, None, False, None) != search._cache_key("vata", 5, None, False, "en")
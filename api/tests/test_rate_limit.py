@@ -0,0 +1,48 @@
+import asyncio
+
+from app.services.rate_limit import Decision, RateLimiter
+
+def _hits(limiter: RateLimiter, n: int, client: str = "c", cost: int = 1) -> list[Decision]:
+    async def go():
+        return [await limiter.hit(client, cost) for _ in range(n)]
+    return asyncio.run(go())
+
+def test_burst_then_deny():
+    limiter = RateLimiter(rate=1, burst=3)
+    d = _hits(limiter, 4)
+    assert [x.allowed for x in d] == [True, True, True, False]
+    assert [x.remaining for x in d[:3]] == [2, 1, 0]
+    assert 0 < d[3].retry_after <= 1
+    assert limiter.stats == {"allowed": 3, "limited": 1, "redis_errors": 0}
+
+def test_clients_and_costs_are_separate():
+    limiter = RateLimiter(rate=1, burst=10)
+    assert _hits(limiter, 1, "a", cost=10)[0].allowed
+    assert not _hits(limiter, 1, "a")[0].allowed
+    assert _hits(limiter, 1, "b")[0].remaining == 9
+    # a cost above the burst is capped to it rather than never passing
+    assert _hits(limiter, 1, "c", cost=50)[0].allowed
+
+def test_headers():
+    assert Decision(True, 40, 39, 0.0, 0.05).headers() == {
+        "X-RateLimit-Limit": "40", "X-RateLimit-Remaining": "39", "X-RateLimit-Reset": "1"}
+    h = Decision(False, 40, -1, 0.2, 2.0).headers()
+    assert h["X-RateLimit-Remaining"] == "0"
+    assert h["Retry-After"] == "1"
+
+class _DownRedis:
+    def register_script(self, _):
+        async def script(**_):
+            raise ConnectionError("down")
+        return script
+
+def test_redis_error_falls_back_to_local_buckets():
+    limiter = RateLimiter(rate=1, burst=2, redis=_DownRedis())
+    assert [x.allowed for x in _hits(limiter, 3)] == [True, True, False]
+    assert limiter.stats["redis_errors"] == 1  # then skipped for retry_after seconds
+
+def test_responses_carry_limit_headers(client):
+    r = client.get("/v1/coding/complete", params={"q": "va"})
+    assert r.status_code == 200
+    assert r.headers["X-RateLimit-Limit"] == "1000"
+    assert int(r.headers["X-RateLimit-Remaining"]) < 1000
@@ -0,0 +1,71 @@
+import gzip, json, os
+
+from app.routers.terminology import _etag_matches
+from app.services.resource_cache import CachedResource, ResourceCache, brotli
+
+VS = "/v1/terminology/valuesets/namaste-ayurveda"
+
+def test_identity_response_and_validators(client):
+    r = client.get(VS, headers={"Accept-Encoding": "identity"})
+    assert r.status_code == 200
+    assert "content-encoding" not in r.headers
+    assert r.headers["vary"] == "Accept-Encoding" and r.headers["cache-control"] == "no-cache"
+    etag = r.headers["etag"]
+    assert etag.startswith('"') and "-" not in etag
+    assert r.json()["id"] == "namaste-ayurveda"
+
+def test_compressed_variants(client):
+    r = client.get(VS, headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip" and r.headers["etag"].endswith('-gzip"')
+    assert r.json()["id"] == "namaste-ayurveda"  # decoded by the client
+    if brotli is not None:
+        r = client.get(VS, headers={"Accept-Encoding": "gzip, br"})
+        assert r.headers["content-encoding"] == "br" and r.headers["etag"].endswith('-br"')
+
+def test_if_none_match_returns_304_for_any_variant(client):
+    etag = client.get(VS, headers={"Accept-Encoding": "identity"}).headers["etag"]
+    gz_etag = client.get(VS, headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    for inm in [etag, gz_etag, f"W/{etag}", f'"other", {etag}', "*"]:
+        r = client.get(VS, headers={"If-None-Match": inm, "Accept-Encoding": "gzip"})
+        assert r.status_code == 304 and r.content == b""
+        assert r.headers["etag"] == gz_etag
+    assert client.get(VS, headers={"If-None-Match": '"stale"'}).status_code == 200
+
+def test_unknown_resources(client):
+    assert client.get("/v1/terminology/valuesets/no-such-vs").status_code == 404
+    assert client.get("/v1/terminology/valuesets/bad$id").status_code == 404
+    assert client.get("/v1/terminology/conceptmaps/namaste-to-icd11").json()["resourceType"] == "ConceptMap"
+
+def test_etag_matching():
+    assert _etag_matches('"abc"', "abc")
+    assert _etag_matches('W/"abc-gzip"', "abc")
+    assert not _etag_matches('"abcd"', "abc")
+    assert not _etag_matches("", "abc")
+
+def test_variants_decode_to_the_body():
+    res = CachedResource.from_obj({"resourceType": "ValueSet", "id": "x"})
+    assert gzip.decompress(res.variants["gzip"]) == res.body
+    if brotli is not None:
+        assert brotli.decompress(res.variants["br"]) == res.body
+    assert CachedResource.from_obj({"resourceType": "ValueSet", "id": "x"}).etag == res.etag
+
+def test_file_edits_are_picked_up(tmp_path):
+    path = tmp_path / "vs.json"
+    path.write_text(json.dumps({"id": "a"}))
+    cache = ResourceCache(check_interval=0)
+    first = cache.get(path)
+    assert cache.get(path) is first  # unchanged file: same parse
+    path.write_text(json.dumps({"id": "ab"}))
+    os.utime(path, ns=(first.mtime_ns + 10**9, first.mtime_ns + 10**9))
+    second = cache.get(path)
+    assert second.data == {"id": "ab"} and second.etag != first.etag
+    path.unlink()
+    assert cache.get(path) is None
+
+def test_within_the_check_interval_no_stat(tmp_path):
+    path = tmp_path / "vs.json"
+    path.write_text("{}")
+    cache = ResourceCache(check_interval=60.0)
+    first = cache.get(path)
+    path.unlink()
+    assert cache.get(path) is first
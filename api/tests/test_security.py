@@ -0,0 +1,98 @@
+import json, time
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+from jose import jwk, jwt
+
+from app import security
+from app.config import settings
+from app.security import KeyRing, TokenCache
+
+def _rsa_pem() -> str:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                             serialization.NoEncryption()).decode()
+
+def _sign(pem: str, kid: str | None, exp_in: float = 300, **claims) -> str:
+    headers = {"kid": kid} if kid else None
+    return jwt.encode({"sub": "c", "exp": int(time.time() + exp_in), **claims}, pem, algorithm="RS256", headers=headers)
+
+def test_token_cache_entries_die_at_exp():
+    cache = TokenCache(2)
+    cache.put(b"live", {"exp": time.time() + 60})
+    cache.put(b"dead", {"exp": time.time()})
+    cache.put(b"no-exp", {"sub": "c"})  # never cached: could not be expired
+    assert cache.get(b"live") is not None
+    assert cache.get(b"dead") is None and len(cache) == 1
+    assert cache.get(b"no-exp") is None
+
+def test_token_cache_is_bounded_lru():
+    cache = TokenCache(2)
+    for d in (b"a", b"b"):
+        cache.put(d, {"exp": time.time() + 60})
+    cache.get(b"a")
+    cache.put(b"c", {"exp": time.time() + 60})
+    assert cache.get(b"b") is None and cache.get(b"a") and cache.get(b"c")
+    TokenCache(0).put(b"a", {"exp": time.time() + 60})
+
+@pytest.fixture
+def jwks(tmp_path, monkeypatch):
+    path = tmp_path / "jwks.json"
+    path.write_text(json.dumps({"keys": []}))
+    monkeypatch.setattr(settings, "jwt_jwks", str(path))
+    ring = KeyRing()
+    monkeypatch.setattr(security, "keys", ring)
+    monkeypatch.setattr(security, "verified", TokenCache(10))
+    def publish(pem: str, kid: str) -> None:
+        path.write_text(json.dumps({"keys": [{**jwk.construct(pem, "RS256").public_key().to_dict(), "kid": kid}]}))
+    return ring, publish
+
+def test_unknown_kid_reloads_the_jwks(jwks, monkeypatch):
+    ring, publish = jwks
+    monkeypatch.setattr(settings, "jwt_keys_retry_seconds", 0.0)
+    pem = _rsa_pem()
+    token = _sign(pem, "rotated")
+    with pytest.raises(HTTPException) as e:
+        security.verify_token(token)
+    assert e.value.status_code == 401
+    publish(pem, "rotated")  # key rotated in without a restart
+    assert security.verify_token(token)["sub"] == "c"
+    assert ring.kid in ring.public  # the PEM pair is still trusted
+
+def test_kid_misses_reload_at_most_once_per_retry_window(jwks, monkeypatch):
+    ring, publish = jwks
+    monkeypatch.setattr(settings, "jwt_keys_retry_seconds", 3600.0)
+    pem = _rsa_pem()
+    assert ring.lookup("rotated") == []
+    publish(pem, "rotated")
+    assert ring.lookup("rotated") == []  # no reload per bogus kid
+    ring._loaded_at -= 3600
+    assert len(ring.lookup("rotated")) == 1
+
+def test_tokens_signed_by_other_keys_or_expired_are_rejected(jwks):
+    ring, _ = jwks
+    ring.load()
+    for token in [_sign(_rsa_pem(), ring.kid), _sign(ring.private.to_pem().decode(), ring.kid, exp_in=-5), "not.a.jwt"]:
+        with pytest.raises(HTTPException) as e:
+            security.verify_token(token)
+        assert e.value.status_code == 401
+    assert len(security.verified) == 0
+
+def _token(client, scope: str) -> dict:
+    tok = client.post("/v1/auth/token", data={"client_id": "demo-client-id", "client_secret": "demo-client-secret",
+                                               "scope": scope}).json()["access_token"]
+    return {"Authorization": f"Bearer {tok}"}
+
+def test_admin_routes_need_the_admin_scope(client, monkeypatch):
+    assert client.get("/v1/health/cache").status_code == 403
+    monkeypatch.setattr(settings, "admin_clients", "")
+    headers = _token(client, "read:codes admin")  # admin dropped: not an admin client
+    assert client.get("/v1/health/cache", headers=headers).status_code == 403
+    assert client.get("/v1/health/cache", headers={"Authorization": "Bearer nope"}).status_code == 401
+
+def test_admin_clients_get_the_admin_scope(client, monkeypatch):
+    monkeypatch.setattr(settings, "admin_clients", "other,demo-client-id")
+    r = client.get("/v1/health/cache", headers=_token(client, "read:codes admin"))
+    assert r.status_code == 200 and "corpusVersion" in r.json()
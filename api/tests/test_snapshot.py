@@ -0,0 +1,72 @@
+import logging
+
+import pytest
+
+from app.services import snapshot
+from app.services.corpus import Corpus, bump_version, read_state
+from app.services.icd_repo import ICDRepo
+from app.services.namaste_repo import Mapping, MappingTable
+
+QUERIES = ["vata", "pitta disorder", "fever", "kapha vikara", "acid", "disorder", "nothing here"]
+
+def _mapped(engine, tmp_path) -> Corpus:
+    bump_version(engine)
+    c = Corpus(ICDRepo(engine), snapshot_dir=str(tmp_path / "snap"))
+    c.refresh(force=True)
+    assert c.snapshot is not None
+    return c
+
+def test_corpus_round_trip(engine, tmp_path):
+    built = Corpus(ICDRepo(engine))
+    built._build()
+    mapped = _mapped(engine, tmp_path)
+    # a second worker maps the file the first one published instead of rebuilding
+    other = Corpus(ICDRepo(engine), snapshot_dir=str(tmp_path / "snap"))
+    other._build = lambda: pytest.fail("rebuilt instead of mapping the snapshot")
+    other.refresh(force=True)
+    for c in (mapped, other):
+        for q in QUERIES:
+            assert c.term.search(q, 5) == built.term.search(q, 5)
+            assert c.fuzzy.search(q, 5) == built.fuzzy.search(q, 5)
+        for p in ["v", "pi", "kap", "jw", "x"]:
+            assert c.prefix.complete(p, 5) == built.prefix.complete(p, 5)
+        for code in ["SA00", "SB20", "XX99"]:
+            assert c.codes.lookup(code) == built.codes.lookup(code)
+
+def test_mapping_table_round_trip(tmp_path):
+    rows = [Mapping("SA00", 0.9, "exact", "Vata vyadhi", "AYU-1"), Mapping("SA01", 0.5, None, "Vata vyadhi", "AYU-1"),
+            Mapping("SB20", 0.7, None, "Jvara", None)]
+    table = MappingTable(rows)
+    w = snapshot.SnapshotWriter()
+    table.write(w)
+    w.meta["generation"] = "g"
+    w.publish(str(tmp_path), "namaste", "db", 1)
+    mapped = MappingTable.from_snapshot(snapshot.open_snapshot(str(tmp_path), "namaste", "db", 1, "g"))
+    for code, term in [("ayu-1", None), (None, "vata  VYADHI"), (None, "jvara"), ("nope", None)]:
+        assert tuple(map(tuple, mapped.lookup(code, term))) == tuple(map(tuple, table.lookup(code, term)))
+    assert mapped.size == 3
+
+def test_recreated_database_does_not_map_old_snapshot(engine, tmp_path, caplog):
+    mapped = _mapped(engine, tmp_path)
+    version, generation = read_state(engine)
+    assert mapped.version == version and mapped.generation == generation
+    with engine.begin() as cx:  # same url, new database: the row starts over at v1 under a new generation
+        cx.exec_driver_sql("DELETE FROM corpus_version")
+        cx.exec_driver_sql("UPDATE icd_concept SET title = 'Vayu disorder' WHERE code = 'SA00'")
+    bump_version(engine)
+    assert read_state(engine)[0] == version and read_state(engine)[1] != generation
+    fresh = Corpus(ICDRepo(engine), snapshot_dir=str(tmp_path / "snap"))
+    with caplog.at_level(logging.INFO, "app.services.snapshot"):
+        fresh.refresh(force=True)
+    assert "generation" in caplog.text
+    assert fresh.codes.lookup("SA00")[0] == "Vayu disorder"
+    assert fresh.snapshot.meta["generation"] == fresh.generation
+    assert fresh.cache_version != mapped.cache_version
+
+def test_rejects_foreign_file(tmp_path):
+    path = snapshot.snapshot_path(str(tmp_path), "icd", "db", 1)
+    with open(path, "wb") as f:
+        f.write(b"NOTASNAP" + bytes(32))
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.Snapshot(path)
+    assert snapshot.open_snapshot(str(tmp_path), "icd", "db", 1, "g") is None
@@ -0,0 +1,47 @@
+import math
+
+from app.services.term_index import FIELD_BOOSTS, K1, TermIndex
+
+def _codes(results) -> list[str]:
+    return [r["code"] for r in results]
+
+FIELDS = TermIndex.build([
+    {"code": "T", "title": "Shotha swelling"},
+    {"code": "S", "title": "Oedema", "synonyms": ["Shotha"]},
+    {"code": "D", "title": "Fluid retention", "definition": "Known in Ayurveda as shotha"},
+    {"code": "X", "title": "Unrelated"},
+])
+
+def test_field_boosts_rank_title_over_synonym_over_definition():
+    assert _codes(FIELDS.search("shotha")) == ["T", "S", "D"]
+
+def test_rare_terms_weigh_more_than_common_ones():
+    idx = TermIndex.build([{"code": f"C{i}", "title": f"Vata disorder {i}"} for i in range(20)]
+                          + [{"code": "R", "title": "Grahani disorder"}])
+    # every doc has "disorder"; only R has "grahani"
+    assert _codes(idx.search("grahani disorder", 3))[0] == "R"
+    assert idx.search("grahani", 1)[0]["score"] > idx.search("disorder", 1)[0]["score"]
+
+def test_shorter_fields_score_higher_for_the_same_match():
+    idx = TermIndex.build([{"code": "L", "title": "Kapha disorder of the upper respiratory tract with cough"},
+                           {"code": "S", "title": "Kapha disorder"}])
+    assert _codes(idx.search("kapha")) == ["S", "L"]
+
+def test_score_is_bm25f():
+    idx = TermIndex.build([{"code": "A", "title": "vata"}, {"code": "B", "title": "pitta"}])
+    idf = math.log(1 + (2 - 1 + 0.5) / (1 + 0.5))
+    w = FIELD_BOOSTS["title"] * 1  # tf 1, title length equal to the average
+    assert idx.search("vata")[0]["score"] == round(idf * w * (K1 + 1) / (w + K1), 4)
+
+def test_members_top_k_and_batches():
+    assert _codes(FIELDS.search("shotha", members={"S", "D"})) == ["S", "D"]
+    assert _codes(FIELDS.search("shotha", 1)) == ["T"]
+    assert FIELDS.search("nothing matches") == []
+    queries = [("shotha", 2, None), ("oedema retention", 5, None), ("shotha", 5, {"D"})]
+    assert FIELDS.search_many(queries) == [FIELDS.search(*q) for q in queries]
+
+def test_autocode_uses_the_in_process_index(client):
+    r = client.post("/v1/coding/autocode", json={"text": "vata dosha", "topK": 2})
+    assert r.status_code == 200
+    suggestions = r.json()["suggestions"]
+    assert suggestions[0]["code"] == "SA00" and len(suggestions) <= 2
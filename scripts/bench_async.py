@@ -0,0 +1,148 @@
+# Load benchmark: threadpool (sync def + Elasticsearch) vs async (async def + AsyncElasticsearch) handlers
+#   PYTHONPATH=api python scripts/bench_async.py --es-latency-ms 100 --concurrency 10,50,100,200 --seconds 5
+import argparse, asyncio, json, multiprocessing, time
+import uvicorn
+from bench_corpus import percentiles
+
+HIT = {"_index": "icd_tm", "_id": "x", "_score": 1.0,
+       "_source": {"code": "SA00", "title": "Vata disorder", "linearization": "mms:bench"}}
+
+async def _read_request(reader: asyncio.StreamReader) -> tuple[bytes, bytes]:
+    """(request line, body)"""
+    head = await reader.readuntil(b"\r\n\r\n")
+    body = b""
+    for line in head.split(b"\r\n"):
+        if line.lower().startswith(b"content-length:"):
+            body = await reader.readexactly(int(line.split(b":")[1]))
+    return head.split(b"\r\n", 1)[0], body
+
+def _response(body: bytes, head_only: bool = False) -> bytes:
+    return (b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nX-Elastic-Product: Elasticsearch\r\n"
+            b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + (b"" if head_only else body))
+
+def fake_es(port: int, latency_ms: float) -> None:
+    """Bare asyncio HTTP/1.1 server answering like ES after `latency_ms`: one hit per _search and
+    per _msearch item, an empty 200 for the HEAD / ping."""
+    result = {"took": int(latency_ms), "timed_out": False,
+              "hits": {"total": {"value": 1, "relation": "eq"}, "max_score": 1.0, "hits": [HIT]}}
+    search = _response(json.dumps(result).encode())
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                line, body = await _read_request(reader)
+                if line.startswith(b"HEAD"):
+                    writer.write(_response(b"{}", head_only=True))
+                    continue
+                await asyncio.sleep(latency_ms / 1000)
+                if b"/_msearch" in line:  # header + body line per search
+                    n = len([l for l in body.split(b"\n") if l.strip()]) // 2
+                    writer.write(_response(json.dumps({"took": int(latency_ms), "responses": [result] * n}).encode()))
+                else:
+                    writer.write(search)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    async def serve():
+        server = await asyncio.start_server(handle, "127.0.0.1", port, backlog=1024)
+        async with server:
+            await server.serve_forever()
+    asyncio.run(serve())
+
+def bench_app(port: int, es_url: str) -> None:
+    from fastapi import FastAPI
+    from elasticsearch import AsyncElasticsearch, Elasticsearch
+    from app.services.search import AsyncSearchService, SearchService  # type: ignore
+    # generous client pools so the handler model, not the ES connection pool, is what's measured
+    sync = SearchService(Elasticsearch(es_url, connections_per_node=512), "icd_tm", None)
+    aio = AsyncSearchService(AsyncElasticsearch(es_url, connections_per_node=512), "icd_tm", None)
+    app = FastAPI()
+
+    @app.get("/sync")
+    def sync_route(q: str = "vata"):
+        return sync.suggest(q, 10)
+
+    @app.get("/async")
+    async def async_route(q: str = "vata"):
+        return await aio.suggest(q, 10)
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+async def wait_up(port: int, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, w = await asyncio.open_connection("127.0.0.1", port)
+            w.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise SystemExit(f"port {port} did not come up")
+
+async def load(port: int, path: str, concurrency: int, seconds: float) -> dict:
+    """`concurrency` keep-alive connections, each sending the next request as soon as the last one returns.
+    Raw asyncio streams rather than an HTTP client library, so the generator stays cheap on CPU."""
+    samples: list[float] = []
+    errors = 0
+    req = f"GET {path} HTTP/1.1\r\nHost: bench\r\n\r\n".encode()
+    stop = time.perf_counter() + seconds
+
+    async def worker():
+        nonlocal errors
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            while time.perf_counter() < stop:
+                t0 = time.perf_counter()
+                writer.write(req)
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = next(int(l.split(b":")[1]) for l in head.split(b"\r\n") if l.lower().startswith(b"content-length:"))
+                await reader.readexactly(length)
+                if head.startswith(b"HTTP/1.1 200"):
+                    samples.append((time.perf_counter() - t0) * 1000)
+                else:
+                    errors += 1
+        finally:
+            writer.close()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    return {"requests": len(samples), "errors": errors, "rps": round(len(samples) / elapsed, 1),
+            "latency_ms": percentiles(samples)}
+
+async def run(args) -> dict:
+    await wait_up(args.es_port)
+    await wait_up(args.app_port)
+    report = {"es_latency_ms": args.es_latency_ms, "seconds": args.seconds, "results": {}}
+    for c in [int(x) for x in args.concurrency.split(",")]:
+        row = {}
+        for mode in ("sync", "async"):
+            await load(args.app_port, f"/{mode}", min(c, 10), 0.5)  # warm up
+            row[mode] = await load(args.app_port, f"/{mode}", c, args.seconds)
+        row["speedup"] = round(row["async"]["rps"] / max(row["sync"]["rps"], 1e-9), 2)
+        report["results"][str(c)] = row
+        print(f"c={c:<4} sync {row['sync']['rps']:>8} rps  async {row['async']['rps']:>8} rps  x{row['speedup']}")
+    return report
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--es-latency-ms", type=float, default=100.0)
+    ap.add_argument("--concurrency", default="10,50,100,200")
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--es-port", type=int, default=8191)
+    ap.add_argument("--app-port", type=int, default=8192)
+    args = ap.parse_args()
+    procs = [multiprocessing.Process(target=fake_es, args=(args.es_port, args.es_latency_ms), daemon=True),
+             multiprocessing.Process(target=bench_app, args=(args.app_port, f"http://127.0.0.1:{args.es_port}"), daemon=True)]
+    for p in procs:
+        p.start()
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        for p in procs:
+            p.terminate()
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# corpus helpers shared by the benchmark scripts: DB_URL concepts, else a synthetic corpus
+import random
+from sqlalchemy import create_engine
+from app.services.icd_repo import ICDRepo  # type: ignore
+
+SYSTEMS = ["Vata", "Pitta", "Kapha", "Rakta", "Mamsa", "Meda", "Asthi", "Majja", "Shukra", "Rasa"]
+ROOTS = ["jwara", "kasa", "shwasa", "amlapitta", "atisara", "grahani", "prameha", "sandhivata",
+         "amavata", "shotha", "pandu", "kamala", "arsha", "bhagandara", "kushtha", "vatarakta",
+         "unmada", "apasmara", "shiroroga", "netraroga", "mutrakrichha", "ashmari", "gulma", "udara"]
+QUALIFIERS = ["disorder", "pattern", "imbalance", "vikara", "dushti", "kshaya", "vriddhi", "avarana"]
+SYLLABLES = ["ka", "ta", "pa", "ma", "ra", "va", "sha", "dha", "bha", "ja", "gu", "ni", "tri", "su", "ksha"]
+
+B36 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+def synthetic_code(i: int) -> str:
+    # real TM shape (SA00..SJZZ) for the first 12960, then ".n" extensions
+    j = i % 12960
+    code = f"S{'ABCDEFGHIJ'[j // 1296]}{B36[j // 36 % 36]}{B36[j % 36]}"
+    return code if i < 12960 else f"{code}.{i // 12960}"
+
+def synthetic_concepts(n: int, seed: int = 7) -> list[dict]:
+    rnd = random.Random(seed)
+    out = []
+    for i in range(n):
+        root = rnd.choice(ROOTS) if i < len(ROOTS) * 4 else "".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4)))
+        title = f"{rnd.choice(SYSTEMS)} {root} {rnd.choice(QUALIFIERS)}"
+        syns = [f"{root} {rnd.choice(QUALIFIERS)}" for _ in range(rnd.randint(0, 3))]
+        out.append({
+            "id": f"https://id.who.int/icd/entity/synthetic{i}",
+            "code": synthetic_code(i),
+            "title": title.capitalize(),
+            "definition": f"A {root} condition involving {rnd.choice(SYSTEMS).lower()} dosha",
+            "linearization": "mms:synthetic",
+            "synonyms": syns,
+        })
+    return out
+
+def load_concepts(db_url: str | None, n: int) -> tuple[list[dict], str]:
+    if db_url:
+        try:
+            concepts = ICDRepo(create_engine(db_url, future=True)).iter_concepts()
+            if concepts:
+                return concepts, f"db ({db_url})"
+        except Exception as e:
+            print(f"⚠️ could not read concepts from DB: {e}")
+    return synthetic_concepts(n), f"synthetic ({n} concepts)"
+
+def percentiles(samples_ms: list[float]) -> dict:
+    s = sorted(samples_ms)
+    if not s:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    pick = lambda p: round(s[min(len(s) - 1, int(p * len(s)))], 4)
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
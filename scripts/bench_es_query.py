@@ -0,0 +1,126 @@
+# Relevance + latency comparison: legacy ES mapping/query vs es_index.py's mapping and the dis_max query
+#   PYTHONPATH=api python scripts/bench_es_query.py --es-url http://localhost:9200 --n 5000 --queries 300
+# query kinds:
+#   exact     full title
+#   prefix    first 3-5 characters of the title's most distinctive word (typeahead)
+#   translit  title with one romanization variant (a->aa, v->w, s->sh, i->ee, t->th)
+import argparse, json, os, random, time
+from collections import Counter
+from elasticsearch import Elasticsearch, helpers
+from app.services.search import SearchService  # type: ignore
+from bench_corpus import load_concepts, percentiles
+import es_index
+
+LEGACY_MAPPINGS = {"properties": {
+    "code": {"type": "keyword"}, "title": {"type": "text"}, "synonyms": {"type": "text"},
+    "definition": {"type": "text"}, "linearization": {"type": "keyword"},
+}}
+
+def legacy_body(text: str, top_k: int) -> dict:
+    return {"size": top_k, "query": {"multi_match": {"query": text, "fields": ["title^3", "synonyms^2", "definition"]}}}
+
+def tuned_body(text: str, top_k: int) -> dict:
+    return SearchService(None, "", None)._es_body(text, top_k, False)
+
+VARIANTS = [("aa", "a"), ("w", "v"), ("sh", "s"), ("ee", "i"), ("th", "t")]
+
+def translit_variant(title: str, rnd: random.Random) -> str | None:
+    words = title.split()
+    for _ in range(10):
+        i = rnd.randrange(len(words))
+        long, short = rnd.choice(VARIANTS)
+        w = words[i]
+        j = w.lower().find(short)
+        if j >= 0 and not w.lower().startswith(long, j):
+            words[i] = w[:j] + long + w[j + len(short):]
+            return " ".join(words)
+    return None
+
+def build_queries(concepts: list[dict], n: int, seed: int = 11) -> list[tuple[str, str, str]]:
+    rnd = random.Random(seed)
+    df = Counter(w for c in concepts for w in set(c["title"].lower().split()))
+    sample = rnd.sample(concepts, min(n, len(concepts)))
+    out = []
+    for c in sample:
+        title = c["title"]
+        out.append(("exact", title, c["code"]))
+        word = min(title.split(), key=lambda w: (df[w.lower()], -len(w)))  # most distinctive word
+        out.append(("prefix", word[:rnd.randint(3, 5)], c["code"]))
+        v = translit_variant(title, rnd)
+        if v:
+            out.append(("translit", v, c["code"]))
+    return out
+
+def load(es: Elasticsearch, index: str, concepts: list[dict], mappings: dict, analysis: dict | None) -> None:
+    settings = {"index": {"number_of_replicas": 0}}
+    if analysis:
+        settings["analysis"] = analysis
+    es.indices.create(index=index, mappings=mappings, settings=settings)
+    def docs():
+        for c in concepts:
+            syns = [s["label"] if isinstance(s, dict) else s for s in c["synonyms"]]
+            src = {"code": c["code"], "title": c["title"], "definition": c["definition"],
+                   "synonyms": syns, "linearization": c["linearization"]}
+            if analysis:
+                src["synonyms_en"] = syns
+            yield {"_index": index, "_id": c["id"], "_source": src}
+    helpers.bulk(es, docs(), request_timeout=300)
+    es.indices.refresh(index=index)
+
+def run(es: Elasticsearch, index: str, body_fn, queries, top_k: int) -> dict:
+    by_kind: dict[str, dict] = {}
+    for kind, text, code in queries:
+        t0 = time.perf_counter()
+        res = es.search(index=index, body=body_fn(text, top_k))
+        ms = (time.perf_counter() - t0) * 1000
+        codes = [h["_source"].get("code") for h in res["hits"]["hits"]]
+        k = by_kind.setdefault(kind, {"n": 0, "hits": 0, "rr": 0.0, "ms": [], "took": [], "bytes": 0})
+        k["n"] += 1
+        if code in codes:
+            k["hits"] += 1
+            k["rr"] += 1 / (codes.index(code) + 1)
+        k["ms"].append(ms)
+        k["took"].append(float(res["took"]))
+        k["bytes"] += len(json.dumps(res.body))
+    return {kind: {
+        "queries": k["n"],
+        f"recall@{top_k}": round(k["hits"] / k["n"], 4),
+        "mrr": round(k["rr"] / k["n"], 4),
+        "latency_ms": percentiles(k["ms"]),
+        "es_took_ms": percentiles(k["took"]),
+        "avg_response_bytes": round(k["bytes"] / k["n"]),
+    } for kind, k in sorted(by_kind.items())}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--es-url", default=os.getenv("ES_URL", "http://localhost:9200"))
+    ap.add_argument("--db-url", default=os.getenv("DB_URL"))
+    ap.add_argument("--n", type=int, default=5000, help="synthetic corpus size when DB_URL has no concepts")
+    ap.add_argument("--queries", type=int, default=300, help="concepts sampled for the query set")
+    ap.add_argument("--top-k", type=int, default=10)
+    args = ap.parse_args()
+
+    es = Elasticsearch(args.es_url)
+    if not es.ping():
+        raise SystemExit(f"Elasticsearch not reachable at {args.es_url}")
+    concepts, source = load_concepts(args.db_url, args.n)
+    queries = build_queries(concepts, args.queries)
+    suffix = time.strftime("%Y%m%d%H%M%S", time.gmtime())
+    legacy, tuned = f"bench_icd_legacy-{suffix}", f"bench_icd_tuned-{suffix}"
+    try:
+        load(es, legacy, concepts, LEGACY_MAPPINGS, None)
+        load(es, tuned, concepts, es_index.MAPPINGS, es_index.ANALYSIS)
+        for index, fn in ((legacy, legacy_body), (tuned, tuned_body)):  # warm caches
+            run(es, index, fn, queries[:20], args.top_k)
+        report = {
+            "corpus": source,
+            "queries": len(queries),
+            "legacy": run(es, legacy, legacy_body, queries, args.top_k),
+            "tuned": run(es, tuned, tuned_body, queries, args.top_k),
+        }
+    finally:
+        es.indices.delete(index=f"{legacy},{tuned}", ignore_unavailable=True)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# Export benchmark: whole-response bundles vs the streaming NDJSON/CSV export.
+#
+#   PYTHONPATH=api python scripts/bench_export.py --resources 100000
+#   legacy   bundle_dict per patient, then jsonable_encoder + json.dumps (one whole-response body)
+#   ndjson   the /fhir/export/stream generator chain
+#   csv      the same chain with CSV rows
+import argparse, asyncio, json, time, tracemalloc
+from fastapi.encoders import jsonable_encoder
+from app.models.requests import ExportFHIRReq  # type: ignore
+from app.routers.fhirio import FHIR_CSV, _csv_rows, _export_objs  # type: ignore
+from app.services.export import csv_stream, ndjson_stream  # type: ignore
+from app.services.fhir_builders import bundle_dict  # type: ignore
+
+def patients(resources: int, conditions: int, procedures: int) -> list[ExportFHIRReq]:
+    per = 2 + conditions + procedures
+    return [ExportFHIRReq(patient={"name": f"Patient {i}", "gender": "female", "birthDate": "1980-01-01"},
+                          conditions=[{"code": f"SA{j:02d}", "display": f"Condition {j}"} for j in range(conditions)],
+                          procedures=[{"code": f"PR{j:02d}", "display": f"Procedure {j}"} for j in range(procedures)])
+            for i in range(-(-resources // per))]
+
+async def _items(reqs):
+    for r in reqs:
+        yield r
+
+def legacy(reqs) -> int:
+    return len(json.dumps(jsonable_encoder([bundle_dict(r, f"pat{n}") for n, r in enumerate(reqs, 1)])).encode())
+
+async def _drain(chunks) -> int:
+    return sum([len(c) async for c in chunks])
+
+def streamed(reqs, fmt: str) -> int:
+    objs = _export_objs(_items(reqs), "resource", None)
+    chunks = csv_stream(FHIR_CSV, _csv_rows(objs)) if fmt == "csv" else ndjson_stream(objs)
+    return asyncio.run(_drain(chunks))
+
+def measure(fn, *args) -> dict:
+    """Timed pass, then a second pass under tracemalloc for peak memory (tracing skews timings)."""
+    t0 = time.perf_counter()
+    size = fn(*args)
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": round(elapsed, 3), "bytes": size, "peak_mem_mb": round(peak / 2**20, 1)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--resources", type=int, default=100_000)
+    ap.add_argument("--conditions", type=int, default=3)
+    ap.add_argument("--procedures", type=int, default=1)
+    args = ap.parse_args()
+    reqs = patients(args.resources, args.conditions, args.procedures)
+    n = len(reqs) * (2 + args.conditions + args.procedures)
+    report = {"patients": len(reqs), "resources": n,
+              "legacy": measure(legacy, reqs), "ndjson": measure(streamed, reqs, "ndjson"),
+              "csv": measure(streamed, reqs, "csv")}
+    for k in ("legacy", "ndjson", "csv"):
+        report[k]["resources_per_s"] = round(n / report[k]["seconds"])
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# recall/latency benchmark for fuzzy (typo + transliteration) matching
+#   PYTHONPATH=api python scripts/bench_fuzzy.py [--queries 500] [--k 5] [--size 5000]
+import argparse, json, os, random, time
+from bench_corpus import load_concepts, percentiles
+from app.services.term_index import TermIndex  # type: ignore
+from app.services.fuzzy_index import FuzzyIndex, edit_distance, max_distance  # type: ignore
+from app.services.textnorm import tokenize, fold_translit  # type: ignore
+
+def respell(token: str, rnd: random.Random) -> str:
+    ops = []
+    vowels = [i for i, ch in enumerate(token) if ch in "aeiou"]
+    if vowels:
+        i = rnd.choice(vowels); ops.append(token[:i + 1] + token[i] + token[i + 1:])  # lengthen vowel
+    doubled = [i for i in range(1, len(token)) if token[i] == token[i - 1]]
+    if doubled:
+        i = rnd.choice(doubled); ops.append(token[:i] + token[i + 1:])  # degeminate
+    for a, b in (("v", "w"), ("w", "v"), ("sh", "s"), ("s", "sh"), ("t", "tt")):
+        if a in token:
+            ops.append(token.replace(a, b, 1))
+    if len(token) > 4:
+        i = rnd.randrange(1, len(token) - 1)
+        ops.append(token[:i] + token[i + 1:])                          # drop a letter
+        ops.append(token[:i] + token[i + 1] + token[i] + token[i + 2:])  # swap neighbours
+    return rnd.choice(ops) if ops else token
+
+def build_queries(concepts: list[dict], n: int, seed: int = 11) -> list[tuple[str, str]]:
+    rnd = random.Random(seed)
+    out = []
+    while len(out) < n:
+        c = rnd.choice(concepts)
+        term = rnd.choice([c["title"]] + list(c.get("synonyms") or []))
+        toks = tokenize(term)
+        cands = [i for i, t in enumerate(toks) if len(t) >= 4]
+        if not cands:
+            continue
+        i = rnd.choice(cands)
+        toks[i] = respell(toks[i], rnd)
+        out.append((" ".join(toks), c["code"]))
+    return out
+
+class BruteForceIndex(FuzzyIndex):
+    """Same scoring, but every vocabulary word is distance-checked per token."""
+    def lookup(self, token):
+        q = fold_translit(token)
+        limit = max_distance(q)
+        return [(i, d) for i, w in enumerate(self.words) if (d := edit_distance(q, w, limit)) <= limit]
+
+def run(name, search, queries, k):
+    hits, lat = 0, []
+    for q, code in queries:
+        t0 = time.perf_counter()
+        res = search(q, k)
+        lat.append((time.perf_counter() - t0) * 1000)
+        hits += any(r["code"] == code for r in res)
+    return {"engine": name, "recall_at_k": round(hits / len(queries), 4), "latency_ms": percentiles(lat)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--size", type=int, default=5000, help="synthetic corpus size when the DB is empty")
+    args = ap.parse_args()
+
+    concepts, source = load_concepts(os.getenv("DB_URL"), args.size)
+    queries = build_queries(concepts, args.queries)
+    exact, fuzzy, brute = TermIndex.build(concepts), FuzzyIndex.build(concepts), BruteForceIndex.build(concepts)
+    report = {
+        "corpus": source, "concepts": len(concepts), "queries": len(queries), "k": args.k,
+        "results": [
+            run("exact (bm25)", exact.search, queries, args.k),
+            run("fuzzy (deletion index)", fuzzy.search, queries, args.k),
+            run("fuzzy (brute force)", brute.search, queries, args.k),
+        ],
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
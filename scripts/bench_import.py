@@ -0,0 +1,84 @@
+# FHIR import benchmark: Bundle.parse_obj (the old /fhir/import/bundle) vs the fast path.
+#
+#   PYTHONPATH=api python scripts/bench_import.py --entries 10000,50000
+#   legacy   json.loads + Bundle.parse_obj + summarize_bundle
+#   fast     orjson.loads + BundleImporter (structure, references, batched ICD Coding checks)
+#   full     fast + per-resource fhir.resources validation (import ?full=true)
+import argparse, asyncio, json, random, time
+import orjson
+from fhir.resources.bundle import Bundle
+from app.services.codeset import CodeSet  # type: ignore
+from app.services.fhir_builders import summarize_bundle  # type: ignore
+from app.services.fhir_import import BundleImporter  # type: ignore
+from app.services.term_index import ICD_SYSTEM  # type: ignore
+
+def bench_codes(n: int) -> list[str]:
+    return [f"SA{i:04d}" for i in range(n)]
+
+def code_set(n: int) -> CodeSet:
+    return CodeSet.build({"code": c, "title": f"Disorder {c}", "linearization": "mms:bench"} for c in bench_codes(n))
+
+def bundle_bytes(entries: int, codes: list[str], invalid_rate: float, seed: int = 7) -> bytes:
+    rnd = random.Random(seed)
+    out, p = [], 0
+    while len(out) < entries:
+        pid = f"p{p}"
+        subject = {"reference": f"Patient/{pid}"}
+        out.append({"resourceType": "Patient", "id": pid, "name": [{"text": f"Patient {p}"}], "gender": "female"})
+        out.append({"resourceType": "Encounter", "id": f"{pid}-enc", "status": "completed", "subject": subject})
+        for j in range(4):
+            code = f"XX{rnd.randrange(10**4):04d}" if rnd.random() < invalid_rate else rnd.choice(codes)
+            cc = {"coding": [{"system": ICD_SYSTEM, "code": code, "display": f"Disorder {code}"}], "text": code}
+            if j < 3:
+                out.append({"resourceType": "Condition", "id": f"{pid}-c{j}", "subject": subject, "code": cc,
+                            "clinicalStatus": {"coding": [{"system": "http://terminology.hl7.org/CodeSystem/condition-clinical",
+                                                           "code": "active"}]}})
+            else:
+                out.append({"resourceType": "Procedure", "id": f"{pid}-pr", "status": "completed",
+                            "subject": subject, "code": cc})
+        p += 1
+    return orjson.dumps({"resourceType": "Bundle", "type": "collection",
+                         "entry": [{"resource": r} for r in out[:entries]]})
+
+def legacy(raw: bytes, codes: CodeSet) -> dict:
+    return {"summary": summarize_bundle(Bundle.parse_obj(json.loads(raw)))}
+
+def fast(raw: bytes, codes: CodeSet, full: bool = False) -> dict:
+    async def run():
+        imp = BundleImporter(None, codes, full)
+        await imp.add_bundle(orjson.loads(raw))
+        return await imp.finish()
+    return asyncio.run(run())
+
+def timed(fn, *args, repeat: int = 3) -> tuple[float, dict]:
+    best, res = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        res = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best, res
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--entries", default="10000,50000")
+    ap.add_argument("--codes", type=int, default=5000, help="size of the ICD code set")
+    ap.add_argument("--invalid-rate", type=float, default=0.01)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    codes = code_set(args.codes)
+    report = {}
+    for n in [int(x) for x in args.entries.split(",")]:
+        raw = bundle_bytes(n, bench_codes(args.codes), args.invalid_rate)
+        row = {"bytes": len(raw)}
+        for name, fn, extra in (("legacy", legacy, ()), ("fast", fast, ()), ("full", fast, (True,))):
+            secs, res = timed(fn, raw, codes, *extra, repeat=args.repeat)
+            row[name] = {"seconds": round(secs, 3), "entries_per_s": round(n / secs),
+                         "errors": res.get("errorCount", 0), "invalid_codes": res.get("codings", {}).get("invalid")}
+        row["speedup_fast"] = round(row["legacy"]["seconds"] / row["fast"]["seconds"], 1)
+        report[str(n)] = row
+        print(f"{n:>7} entries  legacy {row['legacy']['seconds']}s  fast {row['fast']['seconds']}s  "
+              f"full {row['full']['seconds']}s  x{row['speedup_fast']}")
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
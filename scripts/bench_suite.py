@@ -0,0 +1,362 @@
+# Benchmark suite: the real API under uvicorn, on a seeded synthetic corpus, at fixed concurrency.
+#
+#   PYTHONPATH=api python scripts/bench_suite.py --concepts 100000 --workers 2 --concurrency 1,16,64 --out bench.json
+#   PYTHONPATH=api python scripts/bench_suite.py ... --baseline bench-main.json   # exit 1 on a regression
+# stages: seed (synthetic corpus into --db-url), micro (in-process timings), http (uvicorn, per --concurrency)
+import argparse, asyncio, json, multiprocessing, os, platform, random, subprocess, sys, time
+import urllib.error, urllib.parse, urllib.request
+import orjson
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from sqlalchemy import create_engine
+from app.migrations import migrate  # type: ignore
+from app.models.requests import ExportFHIRReq  # type: ignore
+from app.services.corpus import Corpus, bump_version  # type: ignore
+from app.services.fhir_builders import bundle_dict  # type: ignore
+from app.services.fhir_import import BundleImporter  # type: ignore
+from app.services.icd_repo import ICDRepo  # type: ignore
+from app.services.validators import validate_code  # type: ignore
+from bench_async import fake_es, wait_up
+from bench_corpus import percentiles, synthetic_concepts
+from bench_import import bundle_bytes
+from bulk_writer import BulkWriter
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api")
+LINEARIZATION = "mms:synthetic"  # what synthetic_concepts() stamps; only these rows are replaced
+SCENARIOS = ("autocode", "validate", "export_bundle", "import_bundle")
+
+# ---------- corpus ----------
+def seed(db_url: str, n: int) -> dict:
+    eng = create_engine(db_url, future=True)
+    migrate(eng)
+    with eng.begin() as conn:
+        have = conn.exec_driver_sql("SELECT count(*) FROM icd_concept WHERE linearization = :l",
+                                    {"l": LINEARIZATION}).scalar()
+    if have == n:
+        return {"concepts": n, "seeded": False}
+    t0 = time.perf_counter()
+    concepts = synthetic_concepts(n)
+    with eng.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM icd_synonym WHERE linearization = :l", {"l": LINEARIZATION})
+        conn.exec_driver_sql("DELETE FROM icd_concept WHERE linearization = :l", {"l": LINEARIZATION})
+        w = BulkWriter(conn)
+        w.write("icd_concept", ("id", "code", "title", "definition", "linearization"),
+                ((c["id"], c["code"], c["title"], c["definition"], c["linearization"]) for c in concepts), key="id")
+        w.write("icd_synonym", ("concept_id", "term", "lang", "weight", "linearization"),
+                ((c["id"], s, "en", 1.0, c["linearization"]) for c in concepts for s in c["synonyms"]))
+    bump_version(eng)
+    return {"concepts": n, "seeded": True, "seconds": round(time.perf_counter() - t0, 2)}
+
+def workload(concepts: list[dict], n: int, import_entries: int, seed_: int = 11) -> dict[str, list]:
+    """Request payloads per scenario, `n` each, drawn from the corpus: exact titles, synonyms,
+    typeahead prefixes and typos (fuzzy), mostly-valid codes, one-patient bundles."""
+    rnd = random.Random(seed_)
+    codes = [c["code"] for c in concepts]
+    autocode, validate, export = [], [], []
+    for i in range(n):
+        c = rnd.choice(concepts)
+        kind = i % 4
+        if kind == 0:
+            q = {"text": c["title"]}
+        elif kind == 1:
+            q = {"text": rnd.choice(c["synonyms"] or [c["title"]])}
+        elif kind == 2:
+            q = {"text": c["title"].split()[1][:rnd.randint(3, 5)]}
+        else:
+            t = c["title"]
+            j = rnd.randrange(1, len(t) - 1)
+            q = {"text": t[:j] + t[j + 1:], "fuzzy": True}
+        autocode.append({**q, "topK": 10})
+        validate.append({"code": rnd.choice(codes) if rnd.random() < 0.9 else f"XX{rnd.randrange(10**4):04d}"})
+        picks = rnd.sample(concepts, 4)
+        export.append({"patient": {"name": f"Patient {i}", "gender": "female", "birthDate": "1980-01-01"},
+                       "conditions": [{"code": p["code"], "display": p["title"]} for p in picks[:3]],
+                       "procedures": [{"code": picks[3]["code"], "display": picks[3]["title"]}]})
+    imports = [bundle_bytes(import_entries, codes, 0.01, seed=i) for i in range(min(n, 20))]
+    return {"autocode": autocode, "validate": validate, "export_bundle": export, "import_bundle": imports}
+
+# ---------- micro ----------
+def _rss_mb(pid="self") -> tuple[float, float]:
+    """(VmRSS, VmHWM) in MiB from /proc; zeros where there is no /proc."""
+    vals = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    vals[line[:5]] = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return round(vals.get("VmRSS", 0.0), 1), round(vals.get("VmHWM", 0.0), 1)
+
+def _pss_mb(pid) -> float:
+    """Proportional set size: shared pages (a mapped snapshot) split across the processes mapping them."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            return round(next(int(l.split()[1]) for l in f if l.startswith("Pss:")) / 1024, 1)
+    except (OSError, StopIteration):
+        return 0.0
+
+def timed_ops(fn, items: list, seconds: float) -> dict:
+    samples, i = [], 0
+    stop = time.perf_counter() + seconds
+    while time.perf_counter() < stop:
+        t0 = time.perf_counter()
+        fn(items[i % len(items)])
+        samples.append((time.perf_counter() - t0) * 1000)
+        i += 1
+    return {"ops": len(samples), "ops_per_s": round(len(samples) / (sum(samples) / 1000)),
+            "latency_ms": percentiles(samples)}
+
+def micro(db_url: str, work: dict, seconds: float) -> dict:
+    rss0 = _rss_mb()[0]
+    t0 = time.perf_counter()
+    corpus = Corpus(ICDRepo(create_engine(db_url, future=True)))
+    corpus.refresh(force=True)
+    out = {"index_build": {"seconds": round(time.perf_counter() - t0, 2), "concepts": len(corpus.term),
+                           "rss_delta_mb": round(_rss_mb()[0] - rss0, 1)}}
+    exact = [q["text"] for q in work["autocode"] if not q.get("fuzzy")]
+    typos = [q["text"] for q in work["autocode"] if q.get("fuzzy")]
+    reqs = [ExportFHIRReq(**r) for r in work["export_bundle"]]
+
+    def import_bundle(raw: bytes):
+        async def run():
+            imp = BundleImporter(None, corpus.codes)
+            await imp.add_bundle(orjson.loads(raw))
+            return await imp.finish()
+        return asyncio.run(run())
+
+    out["term_search"] = timed_ops(lambda q: corpus.term.search(q, 10), exact, seconds)
+    out["fuzzy_search"] = timed_ops(lambda q: corpus.fuzzy.search(q, 10), typos, seconds)
+    out["validate_code"] = timed_ops(lambda v: validate_code(None, v["code"], corpus.codes), work["validate"], seconds)
+    out["bundle_dict"] = timed_ops(bundle_dict, reqs, seconds)
+    out["import_bundle"] = timed_ops(import_bundle, work["import_bundle"], seconds)
+    return out
+
+# ---------- http ----------
+def write_keys(workdir: str) -> tuple[str, str]:
+    priv, pub = os.path.join(workdir, "jwt_private.pem"), os.path.join(workdir, "jwt_public.pem")
+    if not os.path.exists(priv):
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        with open(priv, "wb") as f:
+            f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                      serialization.NoEncryption()))
+        with open(pub, "wb") as f:
+            f.write(key.public_key().public_bytes(serialization.Encoding.PEM,
+                                                  serialization.PublicFormat.SubjectPublicKeyInfo))
+    return priv, pub
+
+def start_api(args, es_url: str) -> subprocess.Popen:
+    priv, pub = write_keys(args.workdir)
+    env = {**os.environ, "DB_URL": args.db_url, "JWT_PRIVATE_KEY_PATH": priv, "JWT_PUBLIC_KEY_PATH": pub,
+           "SEARCH_BACKEND": "es" if args.search == "es-stub" else "memory", "ES_URL": es_url,
+           "REDIS_URL": "", "RATE_LIMIT_RPS": "0", "QUERY_CACHE_SIZE": str(args.query_cache),
+           "INDEX_REFRESH_SECONDS": "3600",
+           "SNAPSHOT_DIR": os.path.join(args.workdir, "snapshots") if args.snapshots else ""}
+    log = open(os.path.join(args.workdir, "api.log"), "ab")
+    cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(args.port),
+           "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"]
+    return subprocess.Popen(cmd, cwd=API_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+def _http(port: int, method: str, path: str, body: bytes = b"", headers: dict | None = None) -> tuple[int, bytes]:
+    req = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=body or None, method=method, headers=headers or {})
+    try:
+        with urllib.request.urlopen(req, timeout=10) as r:
+            return r.status, r.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+def wait_ready(port: int, workers: int, timeout: float = 600.0) -> None:
+    """Every worker warms up on its own; wait for a run of ready answers long enough to
+    have reached all of them."""
+    deadline, streak = time.monotonic() + timeout, 0
+    while streak < workers * 8:
+        if time.monotonic() > deadline:
+            raise SystemExit("API did not become ready (see api.log in --workdir)")
+        try:
+            streak = streak + 1 if _http(port, "GET", "/v1/health/ready")[0] == 200 else 0
+        except OSError:
+            streak = 0
+        if not streak:
+            time.sleep(0.2)
+
+def token(port: int) -> str:
+    form = urllib.parse.urlencode({"client_id": "demo-client-id", "client_secret": "demo-client-secret"}).encode()
+    status, body = _http(port, "POST", "/v1/auth/token", form, {"Content-Type": "application/x-www-form-urlencoded"})
+    if status != 200:
+        raise SystemExit(f"token request failed: {status} {body[:200]!r}")
+    return json.loads(body)["access_token"]
+
+def raw_requests(path: str, bodies: list, tok: str) -> list[bytes]:
+    out = []
+    for b in bodies:
+        data = b if isinstance(b, bytes) else orjson.dumps(b)
+        out.append(f"POST {path} HTTP/1.1\r\nHost: bench\r\nAuthorization: Bearer {tok}\r\n"
+                   f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+    return out
+
+async def drive(port: int, reqs: list[bytes], concurrency: int, seconds: float) -> dict:
+    """Closed loop like bench_async.load: `concurrency` keep-alive connections, each sending its
+    next request (round-robin over `reqs`) as soon as the previous answer is read."""
+    samples: list[float] = []
+    statuses: dict[str, int] = {}
+    stop = time.perf_counter() + seconds
+
+    async def worker(k: int):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        i = k
+        try:
+            while time.perf_counter() < stop:
+                t0 = time.perf_counter()
+                writer.write(reqs[i % len(reqs)])
+                i += concurrency
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = next(int(l.split(b":")[1]) for l in head.split(b"\r\n") if l.lower().startswith(b"content-length:"))
+                await reader.readexactly(length)
+                status = head[9:12].decode()
+                if status == "200":
+                    samples.append((time.perf_counter() - t0) * 1000)
+                else:
+                    statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            writer.close()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker(k) for k in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    return {"requests": len(samples), "errors": sum(statuses.values()), "error_statuses": statuses,
+            "rps": round(len(samples) / elapsed, 1), "latency_ms": percentiles(samples)}
+
+def worker_memory(pid: int) -> list[dict]:
+    """RSS / PSS of each uvicorn worker (children of the supervisor; the process itself with --workers 1)."""
+    kids = []
+    for d in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if not d.isdigit():
+            continue
+        try:
+            with open(f"/proc/{d}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{d}/cmdline", "rb") as f:
+                tracker = b"resource_tracker" in f.read()
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid and not tracker:
+            kids.append(int(d))
+    return [{"pid": p, "rss_mb": rss, "pss_mb": _pss_mb(p), "peak_rss_mb": peak}
+            for p in (kids or [pid]) for rss, peak in [_rss_mb(p)]]
+
+async def http(args, work: dict, tok: str, pid: int) -> dict:
+    paths = {"autocode": "/v1/coding/autocode", "validate": "/v1/coding/validate",
+             "export_bundle": "/v1/fhir/export/bundle", "import_bundle": "/v1/fhir/import/bundle"}
+    out = {}
+    for name in args.scenarios.split(","):
+        reqs = raw_requests(paths[name], work[name], tok)
+        await drive(args.port, reqs, min(4, args.workers * 2), args.warmup)
+        rows = {}
+        for c in [int(x) for x in args.concurrency.split(",")]:
+            rows[str(c)] = await drive(args.port, reqs, c, args.seconds)
+            r = rows[str(c)]
+            print(f"{name:<14} c={c:<4} {r['rps']:>9} rps  p50 {r['latency_ms']['p50']:>8} ms  "
+                  f"p95 {r['latency_ms']['p95']:>8} ms  p99 {r['latency_ms']['p99']:>8} ms  errors {r['errors']}")
+        out[name] = {"concurrency": rows, "workers": worker_memory(pid)}
+    return out
+
+# ---------- report ----------
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    worse = []
+    for name, old in baseline.get("http", {}).items():
+        for c, o in old["concurrency"].items():
+            n = report.get("http", {}).get(name, {}).get("concurrency", {}).get(c)
+            if n is None:
+                continue
+            if n["rps"] < o["rps"] * (1 - tolerance):
+                worse.append(f"{name} c={c}: {n['rps']} rps, was {o['rps']}")
+            if n["latency_ms"]["p95"] > o["latency_ms"]["p95"] * (1 + tolerance):
+                worse.append(f"{name} c={c}: p95 {n['latency_ms']['p95']} ms, was {o['latency_ms']['p95']}")
+    for name, o in baseline.get("micro", {}).items():
+        n = report.get("micro", {}).get(name)
+        if n and "ops_per_s" in o and n["ops_per_s"] < o["ops_per_s"] * (1 - tolerance):
+            worse.append(f"micro {name}: {n['ops_per_s']} ops/s, was {o['ops_per_s']}")
+    return worse
+
+def meta(args) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=API_DIR).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"commit": commit, "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "python": platform.python_version(),
+            "platform": platform.platform(), "cpus": os.cpu_count(),
+            "settings": {k: getattr(args, k) for k in ("concepts", "workers", "search", "es_latency_ms", "query_cache",
+                                                       "concurrency", "seconds", "import_entries", "db_url", "snapshots")}}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--concepts", type=int, default=10_000, help="synthetic corpus size (1k..1M)")
+    ap.add_argument("--db-url", default=None, help="default: SQLite file in --workdir; postgresql://... works too")
+    ap.add_argument("--workdir", default="data/bench")
+    ap.add_argument("--search", choices=("memory", "es-stub"), default="memory")
+    ap.add_argument("--es-latency-ms", type=float, default=5.0, help="es-stub answer delay")
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--concurrency", default="1,16,64")
+    ap.add_argument("--seconds", type=float, default=10.0, help="per scenario and concurrency level")
+    ap.add_argument("--warmup", type=float, default=2.0)
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS))
+    ap.add_argument("--queries", type=int, default=2000, help="distinct payloads per scenario")
+    ap.add_argument("--import-entries", type=int, default=100, help="resources per imported Bundle")
+    ap.add_argument("--query-cache", type=int, default=0, help="QUERY_CACHE_SIZE for the API (0 = off)")
+    ap.add_argument("--micro-seconds", type=float, default=2.0, help="per in-process timing; 0 skips them")
+    ap.add_argument("--snapshots", action=argparse.BooleanOptionalAction, default=True,
+                    help="workers map a shared index snapshot (SNAPSHOT_DIR in --workdir) instead of each building")
+    ap.add_argument("--skip-http", action="store_true")
+    ap.add_argument("--port", type=int, default=8193)
+    ap.add_argument("--es-port", type=int, default=8194)
+    ap.add_argument("--out", help="write the JSON report here (default: stdout)")
+    ap.add_argument("--baseline", help="earlier --out report to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression")
+    args = ap.parse_args()
+    os.makedirs(args.workdir, exist_ok=True)
+    args.workdir = os.path.abspath(args.workdir)
+    args.db_url = args.db_url or f"sqlite:///{os.path.join(args.workdir, f'bench-{args.concepts}.db')}"
+
+    report = {"meta": meta(args), "seed": seed(args.db_url, args.concepts)}
+    print(f"corpus: {report['seed']}")
+    work = workload(synthetic_concepts(args.concepts), args.queries, args.import_entries)
+    if args.micro_seconds > 0:
+        report["micro"] = micro(args.db_url, work, args.micro_seconds)
+        for name, m in report["micro"].items():
+            print(f"micro {name:<14} {m}")
+    if not args.skip_http:
+        es = None
+        if args.search == "es-stub":
+            es = multiprocessing.Process(target=fake_es, args=(args.es_port, args.es_latency_ms), daemon=True)
+            es.start()
+            asyncio.run(wait_up(args.es_port))
+        t0 = time.perf_counter()
+        api = start_api(args, f"http://127.0.0.1:{args.es_port}")
+        try:
+            wait_ready(args.port, args.workers)
+            report["startup"] = {"ready_s": round(time.perf_counter() - t0, 2), "workers": worker_memory(api.pid)}
+            print(f"startup: {report['startup']}")
+            report["http"] = asyncio.run(http(args, work, token(args.port), api.pid))
+        finally:
+            api.terminate()
+            api.wait(30)
+            if es is not None:
+                es.terminate()
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"report: {args.out}")
+    else:
+        print(json.dumps(report, indent=2))
+    if args.baseline:
+        with open(args.baseline) as f:
+            worse = compare(report, json.load(f), args.tolerance)
+        for w in worse:
+            print(f"REGRESSION {w}")
+        if worse:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Bulk row writer shared by the ingest scripts: COPY via a staging table on PostgreSQL, executemany elsewhere
+import io, time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import text
+
+def _copy_field(v: Any) -> str:
+    if v is None:
+        return "\\N"
+    return str(v).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+def _chunks(rows: Iterable[Sequence[Any]], size: int) -> Iterator[List[Sequence[Any]]]:
+    batch: List[Sequence[Any]] = []
+    for r in rows:
+        batch.append(r)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class BulkWriter:
+    def __init__(self, conn, batch_size: int = 5000):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.use_copy = conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg2"
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    def write(self, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]],
+              key: Optional[str] = None) -> int:
+        """Insert `rows` (tuples in `columns` order); with `key`, rows whose key exists are updated."""
+        t0 = time.perf_counter()
+        n = 0
+        for batch in _chunks(rows, self.batch_size):
+            (self._copy if self.use_copy else self._executemany)(table, columns, batch, key)
+            n += len(batch)
+        s = self.stats.setdefault(table, {"rows": 0, "seconds": 0.0})
+        s["rows"] += n
+        s["seconds"] += time.perf_counter() - t0
+        return n
+
+    def _conflict(self, columns: Sequence[str], key: Optional[str]) -> str:
+        if not key:
+            return ""
+        sets = ", ".join(f"{c}=EXCLUDED.{c}" for c in columns if c != key)
+        return f" ON CONFLICT ({key}) DO UPDATE SET {sets}" if sets else f" ON CONFLICT ({key}) DO NOTHING"
+
+    def _executemany(self, table: str, columns: Sequence[str], batch: List[Sequence[Any]],
+                     key: Optional[str]) -> None:
+        marks = ", ".join(f":{c}" for c in columns)
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({marks}){self._conflict(columns, key)}"
+        self.conn.execute(text(sql), [dict(zip(columns, r)) for r in batch])
+
+    def _copy(self, table: str, columns: Sequence[str], batch: List[Sequence[Any]],
+              key: Optional[str]) -> None:
+        cols = ", ".join(columns)
+        stage = f"_stage_{table}"
+        buf = io.StringIO("".join("\t".join(_copy_field(v) for v in r) + "\n" for r in batch))
+        cur = self.conn.connection.dbapi_connection.cursor()
+        try:
+            cur.execute(f"CREATE TEMP TABLE IF NOT EXISTS {stage} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+            cur.execute(f"TRUNCATE {stage}")
+            cur.copy_expert(f"COPY {stage} ({cols}) FROM STDIN", buf)
+            cur.execute(f"INSERT INTO {table} ({cols}) SELECT {cols} FROM {stage}{self._conflict(columns, key)}")
+        finally:
+            cur.close()
+
+    def report(self) -> str:
+        parts = []
+        for table, s in self.stats.items():
+            rate = s["rows"] / s["seconds"] if s["seconds"] else 0.0
+            parts.append(f"{table}: {int(s['rows'])} rows in {s['seconds']:.2f}s ({rate:,.0f} rows/s)")
+        return "; ".join(parts) or "no rows written"
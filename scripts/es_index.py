@@ -0,0 +1,95 @@
+# Versioned ICD indices behind an alias, shared by ingest_icd11_tm.py and reindex_es.py
+# Environment:
+#   ES_INDEX_REPLICAS=1     # replicas restored after the bulk load
+#   ES_INDEX_RETAIN=2       # previous versions kept for rollback (the live one is never deleted)
+import os, time
+from typing import List, Optional
+
+from elasticsearch import Elasticsearch, NotFoundError
+from app.services.textnorm import TRANSLIT_RULES  # type: ignore
+
+REPLICAS = int(os.getenv("ES_INDEX_REPLICAS", "1"))
+RETAIN   = int(os.getenv("ES_INDEX_RETAIN", "2"))
+
+# analyzers: tm_text (ASCII-folded), and on top of it tm_translit, tm_prefix (edge n-grams), tm_english
+_TRANSLIT_FILTERS = {f"tm_translit_{i}": {"type": "pattern_replace", "pattern": a, "replacement": b}
+                     for i, (a, b) in enumerate(TRANSLIT_RULES)}
+_TRANSLIT_FILTERS["tm_translit_repeat"] = {"type": "pattern_replace", "pattern": "(.)\\1+", "replacement": "$1"}
+
+ANALYSIS = {
+    "filter": {
+        **_TRANSLIT_FILTERS,
+        "tm_edge": {"type": "edge_ngram", "min_gram": 2, "max_gram": 20},
+        "tm_english_stem": {"type": "stemmer", "language": "light_english"},
+    },
+    "analyzer": {
+        "tm_text": {"tokenizer": "standard", "filter": ["lowercase", "asciifolding"]},
+        "tm_translit": {"tokenizer": "standard", "filter": ["lowercase", "asciifolding", *_TRANSLIT_FILTERS]},
+        "tm_prefix": {"tokenizer": "standard", "filter": ["lowercase", "asciifolding", "tm_edge"]},
+        "tm_english": {"tokenizer": "standard", "filter": ["lowercase", "asciifolding", "tm_english_stem"]},
+    },
+}
+
+def _text(analyzer: str = "tm_text") -> dict:
+    return {"type": "text", "analyzer": analyzer, "fields": {
+        "prefix": {"type": "text", "analyzer": "tm_prefix", "search_analyzer": "tm_text"},
+        "translit": {"type": "text", "analyzer": "tm_translit"},
+    }}
+
+MAPPINGS = {
+    "dynamic_templates": [
+        # synonyms_<lang>: one field per language captured in icd_synonym.lang
+        {"synonyms_by_lang": {"match": "synonyms_*", "match_mapping_type": "string", "mapping": _text()}},
+    ],
+    "properties": {
+        "code": {"type": "keyword"},
+        "title": _text(),
+        "synonyms": _text(),
+        "synonyms_en": _text("tm_english"),
+        "definition": {"type": "text", "analyzer": "tm_english"},
+        "linearization": {"type": "keyword"},
+    }
+}
+
+def new_index_name(alias: str) -> str:
+    return f"{alias}-{time.strftime('%Y%m%d%H%M%S', time.gmtime())}"
+
+def create_for_load(es: Elasticsearch, alias: str) -> str:
+    """Fresh versioned index tuned for bulk loading (no refresh, no replicas)."""
+    index = new_index_name(alias)
+    es.indices.create(index=index, mappings=MAPPINGS,
+                      settings={"index": {"refresh_interval": "-1", "number_of_replicas": 0},
+                                "analysis": ANALYSIS})
+    return index
+
+def finish_load(es: Elasticsearch, index: str) -> None:
+    es.indices.put_settings(index=index, settings={"index": {"refresh_interval": None,
+                                                              "number_of_replicas": REPLICAS}})
+    es.indices.refresh(index=index)
+
+def live_index(es: Elasticsearch, alias: str) -> Optional[str]:
+    """Index the alias points at, or None. A pre-alias concrete index named `alias` also counts."""
+    try:
+        return next(iter(es.indices.get_alias(name=alias)))
+    except NotFoundError:
+        pass
+    return alias if es.indices.exists(index=alias) else None
+
+def swap_alias(es: Elasticsearch, alias: str, index: str) -> None:
+    actions: List[dict] = []
+    if es.indices.exists_alias(name=alias):
+        actions += [{"remove": {"index": old, "alias": alias}} for old in es.indices.get_alias(name=alias)]
+    elif es.indices.exists(index=alias):
+        # deployments from before aliases have a real index with the alias name; drop it atomically
+        actions.append({"remove_index": {"index": alias}})
+    actions.append({"add": {"index": index, "alias": alias}})
+    es.indices.update_aliases(actions=actions)
+
+def gc_indices(es: Elasticsearch, alias: str, retain: int = RETAIN) -> List[str]:
+    """Delete versions of `alias` that are neither live nor among the `retain` newest others."""
+    versions = es.indices.get_alias(index=f"{alias}-*")
+    stale = sorted((name for name, meta in versions.items() if alias not in (meta.get("aliases") or {})),
+                   reverse=True)[retain:]
+    for name in stale:
+        es.indices.delete(index=name)
+    return stale
@@ -0,0 +1,54 @@
+# Resumable ingest state: a small JSON document plus an append-only JSONL of fetched entities
+import json, os
+from typing import Any, Dict, List
+
+class Checkpoint:
+    def __init__(self, path: str, key: Dict[str, Any]):
+        self.path = path
+        self.entities_path = path + ".entities.jsonl"
+        self.key = key
+        self.state: Dict[str, Any] = {}
+        self.entities: List[Dict[str, Any]] = []
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved.get("key") != self.key:
+            print("♻️ Checkpoint is for a different run configuration; starting fresh.")
+            self.clear()
+            return
+        self.state = saved.get("state") or {}
+        n = saved.get("entities", 0)
+        if os.path.exists(self.entities_path):
+            with open(self.entities_path, encoding="utf-8") as f:
+                for i, line in enumerate(f):
+                    if i >= n:
+                        break  # appended after the last state save; will be refetched
+                    self.entities.append(json.loads(line))
+        print(f"⏯️ Resuming from checkpoint: stage={self.state.get('stage')} entities={len(self.entities)}")
+
+    def add_entities(self, ents: List[Dict[str, Any]]) -> None:
+        if not ents:
+            return
+        with open(self.entities_path, "a", encoding="utf-8") as f:
+            for e in ents:
+                f.write(json.dumps(e, ensure_ascii=False) + "\n")
+        self.entities.extend(ents)
+
+    def save(self, **state: Any) -> None:
+        """Atomic replace; call after the entities the state refers to are appended."""
+        self.state = state
+        tmp = self.path + ".tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"key": self.key, "state": state, "entities": len(self.entities)}, f)
+        os.replace(tmp, self.path)
+
+    def clear(self) -> None:
+        for p in (self.path, self.entities_path):
+            if os.path.exists(p):
+                os.remove(p)
+        self.state, self.entities = {}, []
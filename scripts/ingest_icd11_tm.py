@@ -7,7 +7,7 @@
 # Environment variables used (set in .env and passed to 'worker' service):
 #   DB_URL=postgresql+psycopg2://saarthi:saarthi@db:5432/saarthi
 #   ES_URL=http://es:9200
-#   ES_INDEX_ICD=icd_tm
+#   ES_INDEX_ICD=icd_tm              # alias; full loads build icd_tm-<timestamp> and swap it (see es_index.py)
 #   ICD_API_BASE=https://id.who.int/icd/release/11
 #   ICD_RELEASE_ID=latest            # or '2024-01' etc.
 #   ICD_CLIENT_ID=...
@@ -15,15 +15,34 @@
 #   SMALL_PROBE=true                 # optional, limits probe to SA00–SA49 (faster test)
 #   ICD_SEARCH_URL=                  # optional WHO search endpoint for experiments
 #   TM_SEED_IDS_FILE=data/seeds/tm_entity_ids.txt   # optional manual seed URIs
-
+#   ICD_STRATEGY=seeds               # seeds | chapter | probe | auto (chapter -> probe -> seeds)
+#   ICD_TOKEN_URL=                   # override the WHO OAuth2 endpoint (e.g. scripts/who_stub_server.py)
+#   ICD_CONCURRENCY / ICD_RATE_PER_SEC / ICD_RATE_BURST / ICD_MAX_RETRIES / ICD_HTTP2  (see who_fetcher.py)
+#   INGEST_MODE=incremental          # incremental (write only the delta) | full (delete + reload everything)
+#   ICD_CHECKPOINT_FILE=data/ingest_checkpoint.json   # resume state; removed after a successful run
+#   ICD_CHECKPOINT_EVERY=200         # URIs fetched between checkpoint saves
+#   SNAPSHOT_DIR=data/snapshots      # index snapshot published for the API workers before the version bump
+
+import asyncio
+import hashlib
+import json
 import os
 import time
-from typing import Dict, Any, List, Iterable, Set, Optional
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Iterable, Set, Optional, Tuple
 
 import httpx
 from tqdm import tqdm
 from sqlalchemy import create_engine, text
 from elasticsearch import Elasticsearch, helpers
+from app.config import settings
+from app.migrations import migrate
+from app.services.corpus import Corpus, bump_version
+from app.services.icd_repo import ICDRepo
+from who_fetcher import WHOFetcher
+from ingest_checkpoint import Checkpoint
+from bulk_writer import BulkWriter
+import es_index
 
 # ---------- ENV ----------
 SEED_ONLY = os.getenv("SEED_ONLY", "0") == "1"
@@ -41,8 +60,13 @@ CLIENT_SECRET = os.getenv("ICD_CLIENT_SECRET")
 SMALL_PROBE   = os.getenv("SMALL_PROBE", "").lower() in {"1", "true", "yes", "y"}
 ICD_SEARCH_URL = os.getenv("ICD_SEARCH_URL", "").strip()
 SEED_IDS_FILE  = os.getenv("TM_SEED_IDS_FILE", "data/seeds/tm_entity_ids.txt").strip()
+STRATEGY       = os.getenv("ICD_STRATEGY", "seeds").lower()  # seeds | chapter | probe | auto
+
+TOKEN_URL     = os.getenv("ICD_TOKEN_URL", "https://icdaccessmanagement.who.int/connect/token")  # WHO OAuth2
 
-TOKEN_URL     = "https://icdaccessmanagement.who.int/connect/token"  # WHO OAuth2
+INGEST_MODE      = os.getenv("INGEST_MODE", "incremental").lower()  # incremental | full
+CHECKPOINT_FILE  = os.getenv("ICD_CHECKPOINT_FILE", "data/ingest_checkpoint.json")
+CHECKPOINT_EVERY = max(1, int(os.getenv("ICD_CHECKPOINT_EVERY", "200")))
 
 # ---------- AUTH ----------
 def fetch_token() -> str:
@@ -60,81 +84,71 @@ def fetch_token() -> str:
     print("✅ Token fetched successfully.")
     return token
 
-def hclient(token: str) -> httpx.Client:
-    # v2 API requires API-Version: v2
-    return httpx.Client(
-        timeout=40,
-        headers={
-            "Authorization": f"Bearer {token}",
-            "Accept": "application/json",
-            "API-Version": "v2",
-            # "Accept-Language": "en",  # optionally force English
-        },
-    )
-
-# ---------- HTTP HELPERS ----------
-def get_json(c: httpx.Client, url: str, params: Optional[dict] = None) -> Dict[str, Any]:
-    for attempt in range(5):
-        resp = c.get(url, params=params)
-        if resp.status_code == 429:
-            # Gentle backoff on rate limit
-            time.sleep(1.0 * (attempt + 1))
-            continue
-        resp.raise_for_status()
-        return resp.json()
-    resp.raise_for_status()
-    return {}
+def ent_uri(n: Dict[str, Any]) -> Optional[str]:
+    return (n.get("@id") or n.get("id") or n.get("uri") or n.get("url"))
 
 # ---------- MMS CHAPTER 26 TRAVERSAL ----------
-def fetch_mms_chapter_tm_entities(c: httpx.Client) -> List[Dict[str, Any]]:
+def _is_tm(ent: Dict[str, Any]) -> bool:
+    code = ent.get("theCode") or ent.get("code")
+    return isinstance(code, str) and code.startswith("S")
+
+def _push_children(node: Dict[str, Any], seen: Set[str], stack: List[str]) -> None:
+    for ch in node.get("child") or []:
+        uri = ch if isinstance(ch, str) else ent_uri(ch)
+        if uri and uri not in seen:
+            seen.add(uri)
+            stack.append(uri)
+
+async def fetch_mms_chapter_tm_entities(f: WHOFetcher, cp: Checkpoint) -> List[Dict[str, Any]]:
     """
     Traverse MMS Chapter 26 (Traditional Medicine Conditions) and collect entities
-    whose 'theCode' starts with 'S'.
+    whose 'theCode' starts with 'S'. Pending child URIs are fetched concurrently,
+    CHECKPOINT_EVERY at a time, and the visited set + stack saved after each batch.
     """
     base = f"{ICD_BASE}/{ICD_RELEASE}/mms"
     chapter_url = f"{base}/chapter/26"
     print(f"🔎 Targeting MMS; release={ICD_RELEASE}, base={ICD_BASE}")
     print(f"🔎 Traversing MMS Chapter 26: {chapter_url}")
 
-    try:
-        chapter = get_json(c, chapter_url)
-    except httpx.HTTPStatusError as e:
-        print(f"⚠️ MMS chapter fetch failed: {e.response.status_code}")
-        return []
-
-    results: List[Dict[str, Any]] = []
-    stack: List[Dict[str, Any]] = [chapter]
-    seen_urls: Set[str] = set()
-
-    def ent_uri(n: Dict[str, Any]) -> Optional[str]:
-        return (n.get("@id") or n.get("id") or n.get("uri") or n.get("url"))
-
-    with tqdm(total=0, unit="nodes", desc="🌿 Traversing Chapter 26", leave=False) as pbar:
+    if cp.state.get("stage") == "chapter":
+        seen: Set[str] = set(cp.state["visited"])
+        stack: List[str] = list(cp.state["stack"])
+    else:
+        try:
+            chapter = await f.get_json(chapter_url)
+        except httpx.HTTPStatusError as e:
+            print(f"⚠️ MMS chapter fetch failed: {e.response.status_code}")
+            return []
+        if not chapter:
+            print("⚠️ MMS chapter not found")
+            return []
+        seen = {u for u in [ent_uri(chapter)] if u}
+        stack = []
+        _push_children(chapter, seen, stack)
+        cp.add_entities([chapter] if _is_tm(chapter) else [])
+        cp.save(stage="chapter", visited=sorted(seen), stack=stack)
+
+    failed = 0
+    with tqdm(total=len(seen), initial=len(seen) - len(stack), unit="nodes",
+              desc="🌿 Traversing Chapter 26", leave=False) as pbar:
         while stack:
-            node = stack.pop()
-            uri = ent_uri(node)
-            # Resolve stub to full entity if we have a resolvable URI and haven’t seen it
-            if uri and uri not in seen_urls:
-                seen_urls.add(uri)
-                try:
-                    node = get_json(c, uri)
-                except httpx.HTTPStatusError:
-                    pass
-
-            # Collect S* codes (TM in MMS)
-            code = node.get("theCode") or node.get("code")
-            if isinstance(code, str) and code.startswith("S"):
-                results.append(node)
-
-            # Traverse children
-            for ch in node.get("child") or []:
-                stack.append(ch)
-
-            pbar.total = len(seen_urls)
-            pbar.update(0)
-
-    print(f"📄 Chapter traversal collected {len(results)} TM entities (S*).")
-    return results
+            batch, stack = stack[-CHECKPOINT_EVERY:], stack[:-CHECKPOINT_EVERY]
+            fetched = await f.fetch_many(batch, on_result=lambda u, e: pbar.update(1))
+            found: List[Dict[str, Any]] = []
+            for uri, ent in fetched:
+                if isinstance(ent, Exception):
+                    failed += 1
+                    print(f"⚠️ {uri}: {ent}")
+                elif ent:
+                    if _is_tm(ent):
+                        found.append(ent)
+                    _push_children(ent, seen, stack)
+            pbar.total = len(seen)
+            cp.add_entities(found)
+            cp.save(stage="chapter", visited=sorted(seen), stack=stack)
+
+    print(f"📄 Chapter traversal collected {len(cp.entities)} TM entities (S*); {failed} nodes failed.")
+    return cp.entities
 
 # ---------- MMS PROBE (SA..SJ) ----------
 def _gen_sa_sa49() -> Iterable[str]:
@@ -143,7 +157,7 @@ def _gen_sa_sa49() -> Iterable[str]:
         yield f"SA{i:02d}"
 
 def _gen_sa_sj_full() -> Iterable[str]:
-    # Larger probe space: SA00..SAZZ, SB..SJ similarly (broad; keep pace slow)
+    # Larger probe space: SA00..SAZZ, SB..SJ similarly (broad)
     alnum = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
     for first in "ABCDEFGHIJ":  # SA..SJ
         for c2 in alnum:
@@ -152,48 +166,35 @@ def _gen_sa_sj_full() -> Iterable[str]:
             for c3 in alnum:
                 yield f"S{first}{c2}{c3}"
 
-def fetch_mms_tm_entities(c: httpx.Client) -> List[Dict[str, Any]]:
+async def fetch_mms_tm_entities(f: WHOFetcher, cp: Checkpoint) -> List[Dict[str, Any]]:
     base = f"{ICD_BASE}/{ICD_RELEASE}/mms"
     print(f"🔎 Targeting MMS; release={ICD_RELEASE}, base={ICD_BASE}")
-    print(f"🔎 Scanning MMS for TM (S*) codes under: SA..SJ (broad probe)")
-
-    letters_first = list("ABCDEFGHIJ")  # SA..SJ
-    alnum = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
-
-    def generate_codes():
-        for L in letters_first:
-            for c2 in alnum:
-                yield f"S{L}{c2}"
-            for c2 in alnum:
-                for c3 in alnum:
-                    yield f"S{L}{c2}{c3}"
-
-    found = []
-    seen = set()
-    codes = list(generate_codes())
-
-    for i, code in enumerate(tqdm(codes, desc="🔍 Probing SA..SJ", mininterval=1.0)):
-        url = f"{base}/{code}"
-        try:
-            ent = get_json(c, url)
-            the_code = ent.get("theCode") or ent.get("code")
-            if isinstance(the_code, str) and the_code.startswith("S") and code not in seen:
-                found.append(ent)
-                seen.add(code)
-                if len(found) % 20 == 0:
-                    print(f"✅ Fetched {len(found)} entities so far...")
-        except httpx.HTTPStatusError as e:
-            if e.response.status_code == 404:
-                continue  # expected
-            elif e.response.status_code == 429:
-                print("⏳ Rate limit hit. Sleeping 2s.")
-                time.sleep(2)
-        except Exception as e:
-            print(f"⚠️ Unexpected error: {e}")
-        time.sleep(0.02)
+    print(f"🔎 Scanning MMS for TM (S*) codes under: {'SA00..SA49' if SMALL_PROBE else 'SA..SJ (broad probe)'}")
+
+    codes = list(_gen_sa_sa49() if SMALL_PROBE else _gen_sa_sj_full())
+    cursor = cp.state.get("cursor", 0) if cp.state.get("stage") == "probe" else 0
+    seen: Set[str] = {e.get("theCode") or e.get("code") for e in cp.entities}
+
+    with tqdm(total=len(codes), initial=cursor, desc="🔍 Probing SA..SJ", mininterval=1.0) as pbar:
+        while cursor < len(codes):
+            batch = codes[cursor:cursor + CHECKPOINT_EVERY]
+            fetched = await f.fetch_many([f"{base}/{code}" for code in batch], on_result=lambda u, e: pbar.update(1))
+            found: List[Dict[str, Any]] = []
+            for (url, ent), code in zip(fetched, batch):
+                if isinstance(ent, Exception):
+                    print(f"⚠️ Unexpected error for {code}: {ent}")
+                    continue
+                if not ent:
+                    continue  # 404 is expected for most of the probe space
+                if _is_tm(ent) and code not in seen:
+                    found.append(ent)
+                    seen.add(code)
+            cursor += len(batch)
+            cp.add_entities(found)
+            cp.save(stage="probe", cursor=cursor)
 
-    print(f"📄 Fetched {len(found)} raw MMS entities (S*).")
-    return found
+    print(f"📄 Fetched {len(cp.entities)} raw MMS entities (S*).")
+    return cp.entities
 
 
 # ---------- OPTIONAL: MANUAL SEEDS ----------
@@ -208,49 +209,54 @@ def load_seed_entity_ids() -> List[str]:
                 ids.append(u.replace("http://", "https://"))
     return ids
 
-def fetch_entities_from_seeds(c: httpx.Client, ids: List[str]) -> List[Dict[str, Any]]:
-    out: List[Dict[str, Any]] = []
-    for i, uri in enumerate(ids, 1):
-        try:
-            ent = get_json(c, uri)
-            print(f'✅ {i}/{len(ids)} OK: {uri}')
-            out.append(ent)
-        except httpx.HTTPStatusError as e:
-            code = e.response.status_code if e.response is not None else 'ERR'
-            print(f'❌ {i}/{len(ids)} {code}: {uri}')
-        if i % 50 == 0:
-            print(f"\t🌱 fetched {i}/{len(ids)} seeds...")
-        time.sleep(0.02)
-    print(f"🌱 Seed fallback fetched {len(out)} entities.")
-    return out
+async def fetch_entities_from_seeds(f: WHOFetcher, ids: List[str], cp: Checkpoint) -> List[Dict[str, Any]]:
+    cursor = cp.state.get("cursor", 0) if cp.state.get("stage") == "seeds" else 0
+    done = cursor
+
+    def report(uri: str, ent: Any):
+        nonlocal done
+        done += 1
+        if isinstance(ent, httpx.HTTPStatusError):
+            print(f'❌ {done}/{len(ids)} {ent.response.status_code}: {uri}')
+        elif isinstance(ent, Exception):
+            print(f'❌ {done}/{len(ids)} ERR: {uri}')
+        elif ent is None:
+            print(f'❌ {done}/{len(ids)} 404: {uri}')
+        else:
+            print(f'✅ {done}/{len(ids)} OK: {uri}')
+        if done % 50 == 0:
+            print(f"\t🌱 fetched {done}/{len(ids)} seeds...")
+
+    while cursor < len(ids):
+        batch = ids[cursor:cursor + CHECKPOINT_EVERY]
+        fetched = await f.fetch_many(batch, on_result=report)
+        cursor += len(batch)
+        cp.add_entities([ent for _, ent in fetched if isinstance(ent, dict)])
+        cp.save(stage="seeds", cursor=cursor)
+    print(f"🌱 Seed fallback fetched {len(cp.entities)} entities.")
+    return cp.entities
 
 
 # ---------- OPTIONAL: SEARCH (CONFIGURABLE) ----------
-def try_search_endpoint(c: httpx.Client) -> List[Dict[str, Any]]:
+async def try_search_endpoint(f: WHOFetcher) -> List[Dict[str, Any]]:
     if not ICD_SEARCH_URL:
         return []
     print(f"🔎 Trying configured search endpoint: {ICD_SEARCH_URL}")
     queries = ["Ayurveda", "Unani", "Siddha", "Traditional Medicine", "acupuncture", "dosha", "prakriti"]
     seen: Set[str] = set()
-    results: List[Dict[str, Any]] = []
+    uris: List[str] = []
     for q in queries:
         params = {"query": q, "useFlexisearch": True, "pageSize": 200}
         try:
-            data = get_json(c, ICD_SEARCH_URL, params=params)
-            items = data.get("destinationEntities") or data.get("items") or []
-            for it in items:
-                uri = it.get("@id") or it.get("id") or it.get("uri") or it.get("url")
-                if not uri or uri in seen:
-                    continue
-                seen.add(uri)
-                try:
-                    ent = get_json(c, uri)
-                    results.append(ent)
-                except httpx.HTTPStatusError:
-                    pass
+            data = await f.get_json(ICD_SEARCH_URL, params=params) or {}
         except httpx.HTTPStatusError:
-            pass
-        time.sleep(0.1)
+            continue
+        for it in data.get("destinationEntities") or data.get("items") or []:
+            uri = ent_uri(it)
+            if uri and uri not in seen:
+                seen.add(uri)
+                uris.append(uri)
+    results = [ent for _, ent in await f.fetch_many(uris) if isinstance(ent, dict)]
     print(f"🔎 Search fallback fetched {len(results)} entities.")
     return results
 
@@ -270,8 +276,12 @@ def normalize_concepts(entities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
             syn_terms = []
             for s in synonyms:
                 lbl = s.get("label") or s.get("@value")
+                lang = s.get("lang", "en")
+                if isinstance(lbl, dict):  # v2 API: {"@language": "en", "@value": "..."}
+                    lang = lbl.get("@language") or lang
+                    lbl = lbl.get("@value")
                 if lbl:
-                    syn_terms.append({"label": lbl, "lang": s.get("lang", "en")})
+                    syn_terms.append({"label": lbl, "lang": lang})
 
             concepts.append({
                 "id": ent_id.replace("http://", "https://"),
@@ -285,107 +295,177 @@ def normalize_concepts(entities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     return concepts
 
 # ---------- DB ----------
-def ensure_tables(engine):
-    with engine.begin() as cx:
-        cx.exec_driver_sql("""
-            CREATE TABLE IF NOT EXISTS icd_concept(
-              id TEXT PRIMARY KEY,
-              code TEXT,
-              title TEXT,
-              definition TEXT,
-              linearization TEXT,
-              last_updated TIMESTAMPTZ DEFAULT NOW()
-            );
-        """)
-        cx.exec_driver_sql("""
-            CREATE TABLE IF NOT EXISTS icd_synonym(
-              concept_id TEXT,
-              term TEXT,
-              lang TEXT,
-              weight REAL DEFAULT 1.0,
-              linearization TEXT
-            );
-        """)
-
-def upsert_to_db(concepts: List[Dict[str, Any]]):
+def content_hash(c: Dict[str, Any]) -> str:
+    """Fingerprint of everything we store for a concept; unchanged hash => row untouched."""
+    payload = [c["code"], c["title"], c["definition"], c["linearization"],
+               sorted((s["label"], s.get("lang", "en")) for s in c["synonyms"])]
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+def _insert_concepts(w: BulkWriter, concepts: List[Dict[str, Any]], stamp: str) -> None:
+    w.write("icd_concept", ("id", "code", "title", "definition", "linearization", "content_hash", "last_updated"),
+            ((c["id"], c["code"], c["title"], c["definition"], c["linearization"], content_hash(c), stamp)
+             for c in concepts), key="id")
+    w.write("icd_synonym", ("concept_id", "term", "lang", "weight", "linearization"),
+            ((c["id"], s["label"], s.get("lang", "en"), 1.0, c["linearization"])
+             for c in concepts for s in c["synonyms"]))
+
+def _delete_concepts(conn, ids: List[str], chunk: int = 500) -> None:
+    for i in range(0, len(ids), chunk):
+        part = ids[i:i + chunk]
+        marks = ",".join(f":i{j}" for j in range(len(part)))
+        params = {f"i{j}": v for j, v in enumerate(part)}
+        conn.exec_driver_sql(f"DELETE FROM icd_synonym WHERE concept_id IN ({marks})", params)
+        conn.exec_driver_sql(f"DELETE FROM icd_concept WHERE id IN ({marks})", params)
+
+def upsert_to_db(concepts: List[Dict[str, Any]]) -> bool:
     if not concepts:
         print("⚠️ No concepts to upsert. Skipping DB operations.")
-        return
+        return False
     eng = create_engine(DB_URL, future=True)
-    ensure_tables(eng)
+    migrate(eng)
+    concepts = list({c["id"]: c for c in concepts}.values())
     with eng.begin() as conn:
         conn.exec_driver_sql("DELETE FROM icd_synonym WHERE linearization LIKE 'mms:%'")
         conn.exec_driver_sql("DELETE FROM icd_concept  WHERE linearization LIKE 'mms:%'")
+        w = BulkWriter(conn)
+        _insert_concepts(w, concepts, _now())
+    print(f"✅ DB upserted {len(concepts)} TM concepts. {w.report()}")
+    return True
 
-        for c in concepts:
-            conn.execute(
-                text("""INSERT INTO icd_concept (id, code, title, definition, linearization)
-                        VALUES (:id, :code, :title, :definition, :lin)"""),
-                dict(
-                    id=c["id"],
-                    code=c["code"],
-                    title=c["title"],
-                    definition=c["definition"],
-                    lin=c["linearization"]
-                )
-            )
-            for syn in c["synonyms"]:
-                conn.execute(
-                    text("""INSERT INTO icd_synonym (concept_id, term, lang, weight, linearization)
-                            VALUES (:cid, :term, :lang, :w, :lin)"""),
-                    dict(
-                        cid=c["id"],
-                        term=syn["label"],
-                        lang=syn.get("lang", "en"),
-                        w=1.0,
-                        lin=c["linearization"]
-                    )
-                )
-    print(f"✅ DB upserted {len(concepts)} TM concepts.")
+def apply_delta_to_db(concepts: List[Dict[str, Any]]) -> Tuple[List[str], List[str]]:
+    """Write only added/changed/removed MMS concepts. Returns (upserted ids, deleted ids)."""
+    if not concepts:
+        print("⚠️ No concepts fetched. Skipping DB operations (refusing to treat everything as removed).")
+        return [], []
+    eng = create_engine(DB_URL, future=True)
+    migrate(eng)
+    incoming = {c["id"]: c for c in concepts}
+    with eng.begin() as conn:
+        existing = dict(conn.exec_driver_sql(
+            "SELECT id, content_hash FROM icd_concept WHERE linearization LIKE 'mms:%'").fetchall())
+        added = [c for i, c in incoming.items() if i not in existing]
+        changed = [c for i, c in incoming.items() if i in existing and existing[i] != content_hash(c)]
+        removed = [i for i in existing if i not in incoming]
+        _delete_concepts(conn, [c["id"] for c in changed] + removed)
+        w = BulkWriter(conn)
+        _insert_concepts(w, added + changed, _now())
+    print(f"✅ DB delta: {len(added)} added, {len(changed)} changed, {len(removed)} removed, "
+          f"{len(incoming) - len(added) - len(changed)} unchanged. {w.report()}")
+    return [c["id"] for c in added + changed], removed
 
 # ---------- ES ----------
-def bulk_actions(concepts: Iterable[Dict[str, Any]]) -> Iterable[Dict[str, Any]]:
+def _lang_key(lang: Optional[str]) -> str:
+    return "".join(ch for ch in (lang or "en").split("-")[0].lower() if ch.isalpha()) or "en"
+
+def bulk_actions(concepts: Iterable[Dict[str, Any]], index: str = ES_INDEX) -> Iterable[Dict[str, Any]]:
     for c in concepts:
-        yield {
-            "_index": ES_INDEX,
-            "_id": c["id"],
-            "_source": {
-                "code": c["code"],
-                "title": c["title"],
-                "definition": c["definition"],
-                "synonyms": [s["label"] for s in c["synonyms"]],
-                "linearization": c["linearization"],
-            },
+        src: Dict[str, Any] = {
+            "code": c["code"],
+            "title": c["title"],
+            "definition": c["definition"],
+            "synonyms": [s["label"] for s in c["synonyms"]],
+            "linearization": c["linearization"],
         }
+        for s in c["synonyms"]:  # synonyms_en, synonyms_hi, ... (see es_index.MAPPINGS)
+            src.setdefault(f"synonyms_{_lang_key(s.get('lang'))}", []).append(s["label"])
+        yield {"_index": index, "_id": c["id"], "_source": src}
 
 def index_to_es(concepts: List[Dict[str, Any]]):
     es = Elasticsearch(ES_URL)
-    if es.indices.exists(index=ES_INDEX):
-        es.indices.delete(index=ES_INDEX)
-    es.indices.create(index=ES_INDEX)
-    helpers.bulk(es, bulk_actions(concepts), stats_only=True, request_timeout=180)
-    print(f"📦 Indexed {len(concepts)} documents into ES index '{ES_INDEX}'.")
+    index = es_index.create_for_load(es, ES_INDEX)
+    helpers.bulk(es, bulk_actions(concepts, index), stats_only=True, request_timeout=180)
+    es_index.finish_load(es, index)
+    es_index.swap_alias(es, ES_INDEX, index)
+    print(f"📦 Indexed {len(concepts)} documents into '{index}'; alias '{ES_INDEX}' swapped.")
+    stale = es_index.gc_indices(es, ES_INDEX)
+    if stale:
+        print(f"🧹 Deleted old indices: {', '.join(stale)}")
+
+def index_delta_to_es(concepts: List[Dict[str, Any]], upserts: List[str], deletes: List[str]) -> bool:
+    """Returns True if anything was written."""
+    es = Elasticsearch(ES_URL)
+    if es_index.live_index(es, ES_INDEX) is None:
+        print(f"ℹ️ ES alias '{ES_INDEX}' missing; indexing everything.")
+        index_to_es(concepts)
+        return True
+    by_id = {c["id"]: c for c in concepts}
+    actions = list(bulk_actions(by_id[i] for i in upserts if i in by_id))
+    actions += [{"_op_type": "delete", "_index": ES_INDEX, "_id": i} for i in deletes]
+    if actions:
+        # deletes of docs ES never had are 404s, not failures
+        helpers.bulk(es, actions, stats_only=True, raise_on_error=False, request_timeout=180)
+    print(f"📦 ES delta: {len(upserts)} indexed, {len(deletes)} deleted in '{ES_INDEX}'.")
+    return bool(actions)
 
 # ---------- MAIN ----------
-def main():
-    print("🔐 Fetching ICD-11 API token...")
-    token = fetch_token()
-    client = hclient(token)
+STAGES = ["chapter", "probe", "seeds"]
+
+async def fetch_entities(token: str, cp: Checkpoint) -> List[Dict[str, Any]]:
+    resumed = cp.state.get("stage")
+    start = STAGES.index(resumed) if resumed in STAGES else 0
+    async with WHOFetcher(token) as f:
+        print(f"⚙️ concurrency={f.concurrency} rate={f.bucket.rate}/s http2={f.http2}")
+        t0 = time.perf_counter()
+        entities: List[Dict[str, Any]] = []
+        if STRATEGY in ("chapter", "auto") and start <= 0:
+            entities = await fetch_mms_chapter_tm_entities(f, cp)
+        if not entities and STRATEGY in ("probe", "auto") and start <= 1:
+            entities = await fetch_mms_tm_entities(f, cp)
+        if not entities and STRATEGY in ("seeds", "auto"):
+            seed_ids = load_seed_entity_ids()
+            if not seed_ids:
+                raise SystemExit("❌ No seed IDs found at data/seeds/tm_entity_ids.txt")
+            print(f"🌱 Using manual seed IDs: {len(seed_ids)}")
+            entities = await fetch_entities_from_seeds(f, seed_ids, cp)
+        if not entities and STRATEGY == "auto":
+            entities = await try_search_endpoint(f)
+            cp.add_entities(entities)
+        dt = time.perf_counter() - t0
+        print(f"⏱️ fetched {len(entities)} entities in {dt:.1f}s; {f.stats} ({f.stats['requests'] / max(dt, 1e-9):.1f} req/s)")
+        return entities
 
-    # --- SEEDS ONLY (temporary) ---
-    seed_ids = load_seed_entity_ids()
-    if not seed_ids:
-        raise SystemExit("❌ No seed IDs found at data/seeds/tm_entity_ids.txt")
-
-    print(f"🌱 Using manual seed IDs: {len(seed_ids)}")
-    all_entities = fetch_entities_from_seeds(client, seed_ids)
+def main():
+    cp = Checkpoint(CHECKPOINT_FILE, {"strategy": STRATEGY, "base": ICD_BASE, "release": ICD_RELEASE,
+                                      "small_probe": SMALL_PROBE, "mode": INGEST_MODE})
+    if cp.state.get("stage") in ("fetched", "written"):
+        all_entities = cp.entities
+    else:
+        print("🔐 Fetching ICD-11 API token...")
+        token = fetch_token()
+        all_entities = asyncio.run(fetch_entities(token, cp))
+        cp.save(stage="fetched")
 
     # Normalize + persist
     concepts = normalize_concepts(all_entities)
-    upsert_to_db(concepts)
-    index_to_es(concepts)
+    changed = False
+    try:
+        if INGEST_MODE == "full":
+            changed = upsert_to_db(concepts)
+            if changed:
+                index_to_es(concepts)
+        else:
+            if cp.state.get("stage") != "written":
+                upserts, deletes = apply_delta_to_db(concepts)
+                cp.save(stage="written", es_upserts=upserts, es_deletes=deletes)
+            changed = bool(cp.state["es_upserts"] or cp.state["es_deletes"])
+            if concepts:
+                changed = index_delta_to_es(concepts, cp.state["es_upserts"], cp.state["es_deletes"]) or changed
+    finally:
+        # API workers reload when the corpus version moves
+        if changed:
+            eng = create_engine(DB_URL, future=True)
+            try:
+                corpus = Corpus(ICDRepo(eng), snapshot_dir=settings.snapshot_dir, snapshot_keep=settings.snapshot_keep)
+                path = corpus.publish_next()
+                if path:
+                    print(f"📦 snapshot {path}")
+            finally:
+                bump_version(eng, "icd")
+    cp.clear()
 
 
 if __name__ == "__main__":
     main()
-
@@ -1,21 +1,31 @@
 # script to ingest NAMASTE mapping
 from sqlalchemy import create_engine, text
 from app.config import settings  # type: ignore
+from app.migrations import migrate  # type: ignore
+from app.services.corpus import bump_version  # type: ignore
+from app.services.namaste_repo import NamasteRepo  # type: ignore
+from bulk_writer import BulkWriter
 import csv, os, pathlib
 
+# CSV columns: namaste_term, icd_code, confidence, notes, and optionally namaste_code
 def main():
     csv_path = pathlib.Path("data/namaste_terms.csv")
     if not csv_path.exists():
         print("namaste_terms.csv not found; create data/namaste_terms.csv to ingest."); return
     eng = create_engine(settings.db_url, future=True)
+    migrate(eng)
     with eng.begin() as cx:
-        cx.exec_driver_sql("CREATE TABLE IF NOT EXISTS namaste_map(namaste_term TEXT, icd_code TEXT, confidence REAL, notes TEXT)")
+        cx.exec_driver_sql("DELETE FROM namaste_map")
         with csv_path.open() as f:
-            rdr = csv.DictReader(f)
-            for row in rdr:
-                cx.exec_driver_sql("INSERT INTO namaste_map(namaste_term,icd_code,confidence,notes) VALUES (:t,:c,:p,:n)",
-                    {"t":row["namaste_term"],"c":row["icd_code"],"p":float(row.get("confidence",0.9)),"n":row.get("notes","")})
-    print("NAMASTE mapping ingested.")
+            rows = ((r["namaste_term"], r.get("namaste_code") or None, r["icd_code"], float(r.get("confidence") or 0.9), r.get("notes",""))
+                    for r in csv.DictReader(f))
+            w = BulkWriter(cx)
+            w.write("namaste_map", ("namaste_term","namaste_code","icd_code","confidence","notes"), rows)
+    try:
+        NamasteRepo(eng, snapshot_dir=settings.snapshot_dir, snapshot_keep=settings.snapshot_keep).publish_next()
+    finally:
+        bump_version(eng, "namaste")
+    print(f"NAMASTE mapping ingested. {w.report()}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,11 @@
+# apply DB schema migrations (same as the API does with MIGRATE_ON_STARTUP=true)
+from sqlalchemy import create_engine
+from app.config import settings  # type: ignore
+from app.migrations import migrate  # type: ignore
+
+def main():
+    migrate(create_engine(settings.db_url, future=True))
+    print("Migrations applied.")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
-# reindex ES if needed
+# reindex ES if needed: make sure the ICD alias points at an index with the current mapping
 from elasticsearch import Elasticsearch
 import os
+import es_index
 INDEX = os.getenv("ES_INDEX_ICD", "icd_tm")
 ES_URL = os.getenv("ES_URL", "http://localhost:9200")
 
@@ -9,15 +10,14 @@ def main():
     if not es.ping():
         print("Elasticsearch not reachable; skipping.")
         return
-    es.indices.create(index=INDEX, ignore=400, mappings={
-        "properties":{
-            "code":{"type":"keyword"},
-            "title":{"type":"text"},
-            "synonyms":{"type":"text"},
-            "definition":{"type":"text"},
-            "linearization":{"type":"keyword"}
-        }})
-    print(f"Index ensured: {INDEX}")
+    live = es_index.live_index(es, INDEX)
+    if live is not None:
+        print(f"Index ensured: {INDEX} -> {live}")
+        return
+    index = es_index.create_for_load(es, INDEX)
+    es_index.finish_load(es, index)
+    es_index.swap_alias(es, INDEX, index)
+    print(f"Index ensured: {INDEX} -> {index} (empty; run scripts/ingest_icd11_tm.py to load)")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,134 @@
+# Async WHO ICD-API client used by the ingest strategies (seeds, chapter traversal, probe)
+# Environment:
+#   ICD_CONCURRENCY=8        # in-flight requests
+#   ICD_RATE_PER_SEC=10      # sustained request rate (token bucket refill)
+#   ICD_RATE_BURST=10        # bucket size
+#   ICD_MAX_RETRIES=5
+#   ICD_HTTP2=1              # set 0 to force HTTP/1.1
+import asyncio, datetime, email.utils, os, random, time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+try:
+    import h2  # noqa: F401  (httpx needs it for http2=True)
+    HAS_H2 = True
+except ImportError:
+    HAS_H2 = False
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Server said slow down: drain the bucket so every caller waits, not just the one that got 429."""
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+def retry_after_seconds(resp: httpx.Response) -> Optional[float]:
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        ts = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None  # malformed date: the caller falls back to its own backoff
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=datetime.timezone.utc)  # HTTP dates are GMT
+    return max(0.0, ts.timestamp() - time.time())
+
+class WHOFetcher:
+    def __init__(self, token: str, concurrency: Optional[int] = None, rate: Optional[float] = None,
+                 burst: Optional[int] = None, max_retries: Optional[int] = None, http2: Optional[bool] = None):
+        self.concurrency = concurrency or int(os.getenv("ICD_CONCURRENCY", "8"))
+        self.bucket = TokenBucket(rate or float(os.getenv("ICD_RATE_PER_SEC", "10")),
+                                  burst or int(os.getenv("ICD_RATE_BURST", "10")))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("ICD_MAX_RETRIES", "5"))
+        use_h2 = (os.getenv("ICD_HTTP2", "1") == "1") if http2 is None else http2
+        self.http2 = use_h2 and HAS_H2
+        self._sem = asyncio.Semaphore(self.concurrency)
+        self.stats = {"requests": 0, "retries": 0, "not_found": 0, "errors": 0}
+        # v2 API requires API-Version: v2
+        self.client = httpx.AsyncClient(
+            http2=self.http2,
+            timeout=40,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+            headers={
+                "Authorization": f"Bearer {token}",
+                "Accept": "application/json",
+                "API-Version": "v2",
+            },
+        )
+
+    async def __aenter__(self) -> "WHOFetcher":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.client.aclose()
+
+    async def get_json(self, url: str, params: Optional[dict] = None) -> Optional[Dict[str, Any]]:
+        """Entity JSON, or None on 404. Other failures raise after retries are exhausted."""
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            async with self._sem:
+                self.stats["requests"] += 1
+                try:
+                    resp = await self.client.get(url, params=params)
+                except httpx.TransportError:
+                    if attempt == self.max_retries:
+                        self.stats["errors"] += 1
+                        raise
+                    resp = None
+            if resp is not None:
+                if resp.status_code == 404:
+                    self.stats["not_found"] += 1
+                    return None
+                if resp.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    if resp.is_error:
+                        self.stats["errors"] += 1
+                    resp.raise_for_status()
+                    return resp.json()
+                delay = retry_after_seconds(resp)
+            else:
+                delay = None
+            if delay is None:
+                delay = min(30.0, 0.5 * 2 ** attempt) * (0.5 + random.random())
+            else:
+                self.bucket.pause(delay)
+            self.stats["retries"] += 1
+            await asyncio.sleep(delay)
+        return None
+
+    async def fetch_many(self, urls: Iterable[str],
+                         on_result: Optional[Callable[[str, Optional[Dict[str, Any]]], None]] = None,
+                         ) -> List[Tuple[str, Any]]:
+        """(url, entity | None | Exception) in input order; concurrency is bounded by the semaphore."""
+        async def one(u: str):
+            try:
+                ent = await self.get_json(u)
+            except Exception as e:  # keep going; the caller decides what an error means
+                ent = e
+            if on_result is not None:
+                on_result(u, ent)
+            return u, ent
+        return list(await asyncio.gather(*(one(u) for u in urls)))
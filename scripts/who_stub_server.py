@@ -0,0 +1,85 @@
+# Local stand-in for the WHO ICD-API, for exercising ingest without credentials or quota.
+#
+#   PYTHONPATH=api python scripts/who_stub_server.py --port 8099 --entities 500 --latency-ms 40 --p429 0.02
+#
+# then run ingest against it:
+#   ICD_API_BASE=http://127.0.0.1:8099/icd/release/11 ICD_TOKEN_URL=http://127.0.0.1:8099/connect/token \
+#   ICD_CLIENT_ID=stub ICD_CLIENT_SECRET=stub ICD_RELEASE_ID=2024-01 ICD_STRATEGY=chapter \
+#   PYTHONPATH=api python scripts/ingest_icd11_tm.py
+import argparse, asyncio, random
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+import uvicorn
+from bench_corpus import synthetic_concepts
+
+def build_app(n_entities: int, latency_ms: float, p429: float, retry_after: float) -> FastAPI:
+    app = FastAPI(title="WHO ICD-API stub")
+    concepts = {c["code"]: c for c in synthetic_concepts(n_entities)}
+    blocks: dict[str, list[str]] = {}
+    for code in concepts:
+        blocks.setdefault(code[:2], []).append(code)
+    stats = {"requests": 0, "throttled": 0}
+    app.state.stats = stats
+
+    def lang(v):
+        return {"@language": "en", "@value": v}
+
+    async def gate(request: Request):
+        stats["requests"] += 1
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        if p429 and random.random() < p429:
+            stats["throttled"] += 1
+            raise HTTPException(429, headers={"Retry-After": str(retry_after)})
+
+    @app.post("/connect/token")
+    async def token():
+        return {"access_token": "stub-token", "token_type": "Bearer", "expires_in": 3600}
+
+    @app.get("/icd/release/11/{release}/mms/chapter/26")
+    async def chapter(release: str, request: Request):
+        await gate(request)
+        base = str(request.base_url).rstrip("/")
+        return {"@id": f"{base}/icd/release/11/{release}/mms/chapter/26", "code": "26",
+                "title": lang("Supplementary Chapter Traditional Medicine Conditions"),
+                "child": [f"{base}/icd/release/11/{release}/mms/block/{b}" for b in sorted(blocks)]}
+
+    @app.get("/icd/release/11/{release}/mms/block/{block}")
+    async def block(release: str, block: str, request: Request):
+        await gate(request)
+        if block not in blocks:
+            raise HTTPException(404)
+        base = str(request.base_url).rstrip("/")
+        return {"@id": f"{base}/icd/release/11/{release}/mms/block/{block}", "title": lang(f"Block {block}"),
+                "child": [f"{base}/icd/release/11/{release}/mms/{c}" for c in blocks[block]]}
+
+    @app.get("/icd/release/11/{release}/mms/{code}")
+    async def entity(release: str, code: str, request: Request):
+        await gate(request)
+        c = concepts.get(code)
+        if c is None:
+            raise HTTPException(404)
+        base = str(request.base_url).rstrip("/")
+        return {"@id": f"{base}/icd/release/11/{release}/mms/{code}", "theCode": code,
+                "title": lang(c["title"]), "definition": lang(c["definition"]),
+                "synonym": [{"label": lang(s)} for s in c["synonyms"]]}
+
+    @app.get("/stats")
+    async def get_stats():
+        return JSONResponse(stats)
+
+    return app
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8099)
+    ap.add_argument("--entities", type=int, default=500)
+    ap.add_argument("--latency-ms", type=float, default=40.0)
+    ap.add_argument("--p429", type=float, default=0.0, help="probability of answering 429")
+    ap.add_argument("--retry-after", type=float, default=1.0)
+    args = ap.parse_args()
+    uvicorn.run(build_app(args.entities, args.latency_ms, args.p429, args.retry_after),
+                host="127.0.0.1", port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
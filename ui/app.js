@@ -45,6 +45,26 @@ async function autocode(){
   renderSuggestions(data.suggestions);
 }
 
+let completeSeq = 0;
+async function complete(){
+  if(!token) await login();
+  const q = document.getElementById('freeText').value.trim();
+  if(!q) return;
+  const seq = ++completeSeq;
+  const res = await fetch(`${API}/coding/complete?q=${encodeURIComponent(q)}&topK=8`, {
+    headers: {'Authorization':`Bearer ${token}`}
+  });
+  const data = await res.json();
+  if(seq !== completeSeq) return; // a newer keystroke already went out
+  // built as elements: code and display are data, never markup
+  document.getElementById('completions').replaceChildren(...(data.suggestions||[]).map(s=>{
+    const o = document.createElement('option');
+    o.value = s.display;
+    o.textContent = s.code;
+    return o;
+  }));
+}
+
 async function exportFHIR(){
   if(!token) await login();
   const req = {